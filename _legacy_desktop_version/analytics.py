@@ -0,0 +1,198 @@
+import math
+
+# ===========================
+# CHART SERIES HELPERS (no flet imports)
+# ===========================
+
+# Roughly how many horizontal pixels each plotted point gets
+PX_PER_POINT = 3
+MIN_POINT_BUDGET = 60
+DEFAULT_CHART_WIDTH = 800
+
+def point_budget(chart_width=None):
+    """Max number of points worth sending to a chart of the given pixel width."""
+    try:
+        width = float(chart_width) if chart_width else DEFAULT_CHART_WIDTH
+    except (TypeError, ValueError):
+        width = DEFAULT_CHART_WIDTH
+    return max(MIN_POINT_BUDGET, int(width / PX_PER_POINT))
+
+def best_so_far_indices(coords):
+    """Indices of the points that set a new best (lowest y). These are the PB markers."""
+    indices = []
+    best = None
+    for i, (_, y) in enumerate(coords):
+        if best is None or y < best:
+            best = y
+            indices.append(i)
+    return indices
+
+def downsample(coords, budget, keep=()):
+    """
+    Reduce a list of (x, y) points to roughly `budget` points using
+    Largest-Triangle-Three-Buckets. The first/last points, the global min/max
+    and any indices in `keep` are always retained.
+    Returns the input unchanged if it already fits the budget.
+    """
+    n = len(coords)
+    if budget < 3 or n <= budget:
+        return list(coords)
+
+    selected = set(_lttb_indices(coords, budget))
+
+    # Always keep the visual extremes and caller-pinned points (e.g. PBs)
+    ys = [y for _, y in coords]
+    selected.add(ys.index(min(ys)))
+    selected.add(ys.index(max(ys)))
+    selected.update(i for i in keep if 0 <= i < n)
+
+    return [coords[i] for i in sorted(selected)]
+
+def _lttb_indices(coords, budget):
+    n = len(coords)
+    indices = [0]
+    # Buckets exclude the first and last point
+    bucket_size = (n - 2) / (budget - 2)
+    a = 0
+
+    for i in range(budget - 2):
+        # Average of the next bucket (the "third" triangle vertex)
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        count = next_end - next_start
+        avg_x = sum(coords[j][0] for j in range(next_start, next_end)) / count
+        avg_y = sum(coords[j][1] for j in range(next_start, next_end)) / count
+
+        # Pick the point in this bucket forming the largest triangle
+        start = int(i * bucket_size) + 1
+        end = min(int((i + 1) * bucket_size) + 1, n - 1)
+        ax, ay = coords[a]
+        best_area = -1.0
+        best_idx = start
+        for j in range(start, end):
+            x, y = coords[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best_idx = j
+
+        indices.append(best_idx)
+        a = best_idx
+
+    indices.append(n - 1)
+    return indices
+
+# ===========================
+# GROUPING + TREND KERNEL
+# ===========================
+
+def group_chunks(values, group_size=1):
+    """
+    Turn a sequence of y values into (x, y) chart coords in one pass.
+    With group_size > 1 each point is the mean of a chunk, placed at the
+    chunk's starting index.
+    """
+    if group_size <= 1:
+        return list(enumerate(values))
+
+    coords = []
+    chunk_start = 0
+    chunk_sum = 0.0
+    chunk_len = 0
+    for i, val in enumerate(values):
+        if chunk_len == 0:
+            chunk_start = i
+        chunk_sum += val
+        chunk_len += 1
+        if chunk_len == group_size:
+            coords.append((chunk_start, chunk_sum / chunk_len))
+            chunk_sum = 0.0
+            chunk_len = 0
+    if chunk_len:
+        coords.append((chunk_start, chunk_sum / chunk_len))
+    return coords
+
+def linear_fit(coords):
+    """
+    Least-squares fit of y = m*x + b in a single pass over the coords.
+    Returns (slope, intercept), or None if the fit is undefined.
+    """
+    n = 0
+    sum_x = sum_y = sum_xy = sum_xx = 0.0
+    for x, y in coords:
+        n += 1
+        sum_x += x
+        sum_y += y
+        sum_xy += x * y
+        sum_xx += x * x
+    if n < 2:
+        return None
+    denom = n * sum_xx - sum_x * sum_x
+    if denom == 0:
+        return None
+    m = (n * sum_xy - sum_x * sum_y) / denom
+    b = (sum_y - m * sum_x) / n
+    return m, b
+
+class Welford:
+    """
+    Running mean and variance (Welford's update), numerically stable in one
+    pass. add()/remove() are O(1) and merge() combines two disjoint groups
+    (Chan et al.), so per-group stats can follow inserts and deletes.
+    """
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self, values=()):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        for v in values:
+            self.add(v)
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def remove(self, x):
+        if self.n <= 1:
+            self.n = 0
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        self.n -= 1
+        delta = x - self.mean
+        self.mean -= delta / self.n
+        self.m2 = max(0.0, self.m2 - delta * (x - self.mean))
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        return self
+
+    def variance(self):
+        """Sample variance, or None with fewer than two values."""
+        if self.n < 2:
+            return None
+        return self.m2 / (self.n - 1)
+
+    def std(self):
+        var = self.variance()
+        return None if var is None else math.sqrt(var)
+
+def trend_line(coords):
+    """Trend line endpoints spanning the given coords, or None."""
+    fitted = linear_fit(coords)
+    if fitted is None:
+        return None
+    m, b = fitted
+    start_x, end_x = coords[0][0], coords[-1][0]
+    return [(start_x, m * start_x + b), (end_x, m * end_x + b)]
@@ -0,0 +1,70 @@
+"""
+Import benchmark: runs a folder of logs through the app's ImportWorker and
+prints throughput, per-stage metrics and peak traced memory.
+
+    python benchmarks/import_pipeline.py [--files 300] [--runs 40] [--dir logs_dir]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database
+import importer
+import synth_logs
+
+def run_import(paths):
+    done = threading.Event()
+    result = {}
+
+    def on_finished(p):
+        result["progress"] = p
+        done.set()
+
+    job = importer.ImportJob(len(paths), on_finished=on_finished)
+    importer.ImportWorker().submit(job)
+    for path in paths:
+        job.add_file(os.path.basename(path), path, delete_after=False)
+    done.wait()
+    return result["progress"]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--runs", type=int, default=40)
+    parser.add_argument("--dir", help="Use existing .log/.log.gz files instead of synthetic ones")
+    parser.add_argument("--memory", action="store_true", help="Track peak memory (tracemalloc; much slower)")
+    args = parser.parse_args()
+
+    database.init_db()
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.dir:
+            paths = sorted(os.path.join(args.dir, n) for n in os.listdir(args.dir) if n.endswith((".log", ".gz")))
+        else:
+            paths = synth_logs.write_folder(tmp, args.files, args.runs)
+
+        if args.memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        p = run_import(paths)
+        elapsed = time.perf_counter() - started
+        peak = None
+        if args.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    print(f"{p.files_done} files, {p.runs_saved} runs in {elapsed:.2f}s "
+          f"({p.files_done / elapsed:.0f} files/s, {p.runs_saved / elapsed:.0f} runs/s)")
+    if peak is not None:
+        print(f"peak traced memory: {peak / 1024 / 1024:.1f} MB")
+    print(json.dumps(p.stages, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Startup benchmark: cold import cost of each module and the cost of building
+the analytics tabs eagerly (old startup) vs. only the visible one (current).
+
+    python benchmarks/startup.py [--runs 2000] [--repeat 5]
+
+Real time-to-first-frame needs a Flet client; run the app with
+MCSR_STARTUP_PROFILE=1 to have main() print it.
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COLD_IMPORTS = [
+    "database",
+    "flet",
+    "components.recent_runs",
+    "components.session_analytics",
+    "components.tower_analytics",
+    "components.height_analytics",
+    "main",
+]
+
+TOWERS = ["Small Boy", "Big Boy", "Tall Boy", "Cage", "Broken Cage", "M-85", "M-88", "T-Spin"]
+
+def cold_import_ms(module, repeat):
+    """Best-of-N import time in a fresh interpreter."""
+    code = ("import time; t = time.perf_counter(); import " + module +
+            "; print((time.perf_counter() - t) * 1000)")
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+        if out.returncode != 0:
+            return None
+        ms = float(out.stdout.strip().splitlines()[-1])
+        best = ms if best is None else min(best, ms)
+    return best
+
+def seed(count):
+    import database
+    rng = random.Random(1)
+    runs = []
+    base = time.mktime((2024, 1, 1, 12, 0, 0, 0, 0, -1))
+    for i in range(count):
+        ts = base + i * 90 + (i // 200) * 7200 # A new session every 200 runs
+        success = rng.random() < 0.4
+        runs.append({
+            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)),
+            'time': round(rng.uniform(15, 60), 2),
+            'expl': f"{rng.randint(3, 6)}+{rng.randint(0, 2)}",
+            'tower': rng.choice(TOWERS),
+            'type': rng.choice(["Front", "Back", "Diagonal"]),
+            'height': rng.choice([83, 84, 85, 86, 87, 88]),
+            'is_success': success,
+            'fail_reason': None if success else "Death",
+            'session_id': f"bench_{i // 200}.log",
+        })
+    database.save_runs(runs)
+
+def build_ms(class_paths, repeat):
+    """Construct each component and build() its tree; best-of-N total."""
+    import importlib
+    classes = [getattr(importlib.import_module(m), c) for m, c in class_paths]
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for cls in classes:
+            cls().build()
+        ms = (time.perf_counter() - t) * 1000
+        best = ms if best is None else min(best, ms)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("Cold import (best of %d):" % args.repeat)
+    for module in COLD_IMPORTS:
+        ms = cold_import_ms(module, args.repeat)
+        print(f"  {module:32} {'failed' if ms is None else f'{ms:8.1f} ms'}")
+
+    seed(args.runs)
+    sessions = [("components.session_analytics", "SessionAnalytics")]
+    all_tabs = sessions + [
+        ("components.tower_analytics", "TowerAnalytics"),
+        ("components.height_analytics", "HeightAnalytics"),
+    ]
+    eager = build_ms(all_tabs, args.repeat)
+    lazy = build_ms(sessions, args.repeat)
+    print(f"\nTab construction with {args.runs} runs (best of {args.repeat}):")
+    print(f"  eager (all three tabs)   {eager:8.1f} ms")
+    print(f"  lazy (visible tab only)  {lazy:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Synthetic Minecraft log files for the import benchmarks.
+
+    python benchmarks/synth_logs.py <out_dir> [--files 200] [--runs 40] [--idle-share 0.6]
+"""
+import argparse
+import gzip
+import os
+import random
+
+TOWERS = ["Small Boy", "Big Boy", "Tall Boy", "Cage", "Broken Cage", "M-85", "M-88", "T-Spin"]
+TYPES = ["Front", "Back", "Diagonal"]
+
+NOISE = [
+    "[Render thread/INFO]: Loaded 7 advancements",
+    "[Server thread/INFO]: Saving chunks for level 'ServerLevel[New World]'/minecraft:overworld",
+    "[Render thread/WARN]: Received passengers for unknown entity",
+    "[Worker-Main-3/INFO]: Reloading ResourceManager: Default, Fabric Mods",
+    "[Render thread/INFO]: [CHAT] Welcome back!",
+]
+
+class _Clock:
+    def __init__(self, rng):
+        self.rng = rng
+        self.seconds = 8 * 3600 + rng.randint(0, 3600)
+
+    def tick(self, lo=0, hi=2):
+        self.seconds = (self.seconds + self.rng.randint(lo, hi)) % 86400
+        s = self.seconds
+        return f"[{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}]"
+
+def make_log(rng, runs=40, noise_per_run=30, practice=True):
+    """Text of one log file; practice=False gives a file without any tower runs."""
+    clock = _Clock(rng)
+    lines = []
+    for _ in range(runs if practice else 0):
+        for _ in range(noise_per_run):
+            lines.append(f"{clock.tick()} {rng.choice(NOISE)}")
+        lines.append(f"{clock.tick()} [Render thread/INFO]: [CHAT] Pearled to 0 64 0 ({rng.uniform(20, 60):.2f} Blocks)")
+        if rng.random() < 0.6:
+            lines.append(f"{clock.tick(5, 20)} [Render thread/INFO]: [CHAT] {rng.uniform(5, 12):.2f}s 1st Bed Placed")
+            lines.append(f"{clock.tick(5, 30)} [Render thread/INFO]: [CHAT] Dragon Killed!")
+            lines.append(f"{clock.tick()} [Render thread/INFO]: [CHAT] Time: {rng.uniform(15, 60):.2f}s")
+            lines.append(f"{clock.tick()} [Render thread/INFO]: [CHAT] Explosives: {rng.randint(3, 6)}+{rng.randint(0, 2)}")
+            lines.append(f"{clock.tick()} [Render thread/INFO]: [CHAT] Tower: {rng.choice(TOWERS)}")
+            lines.append(f"{clock.tick()} [Render thread/INFO]: [CHAT] Type: {rng.choice(TYPES)}")
+            lines.append(f"{clock.tick()} [Render thread/INFO]: [CHAT] Standing Height: {rng.randint(80, 90)}")
+        else:
+            lines.append(f"{clock.tick(5, 40)} [Render thread/INFO]: [CHAT] Player was slain by Ender Dragon")
+    if not practice:
+        for _ in range(runs * noise_per_run):
+            lines.append(f"{clock.tick()} {rng.choice(NOISE)}")
+    return "\n".join(lines) + "\n"
+
+def write_folder(out_dir, files=200, runs=40, idle_share=0.6, seed=1):
+    """Writes gzipped dated logs; `idle_share` of them contain no practice runs. Returns the paths."""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(files):
+        name = f"2024-{1 + i // 28 % 12:02d}-{1 + i % 28:02d}-{1 + i // 336}.log.gz"
+        text = make_log(rng, runs=runs, practice=rng.random() >= idle_share)
+        path = os.path.join(out_dir, name)
+        with open(path, "wb") as fh:
+            fh.write(gzip.compress(text.encode("utf-8"), compresslevel=6))
+        paths.append(path)
+    return paths
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("out_dir")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=40)
+    parser.add_argument("--idle-share", type=float, default=0.6)
+    args = parser.parse_args()
+    print(len(write_folder(args.out_dir, args.files, args.runs, args.idle_share)), "files written")
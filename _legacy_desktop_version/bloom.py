@@ -0,0 +1,43 @@
+# ===========================
+# BLOOM FILTER OVER 64-BIT KEYS (no flet imports)
+# ===========================
+# "Definitely not present" answers let bulk imports skip index lookups for
+# new runs; "maybe present" answers still go to the database.
+
+BITS_PER_KEY = 16 # ~0.25% false positives with 4 probes
+NUM_PROBES = 4
+_MASK64 = (1 << 64) - 1
+
+class BloomFilter:
+    def __init__(self, capacity):
+        self.capacity = max(1024, int(capacity))
+        self.num_bits = self.capacity * BITS_PER_KEY
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def add(self, key):
+        # Double hashing from the two halves of an already well-mixed 64-bit key
+        key &= _MASK64
+        h1 = key & 0xFFFFFFFF
+        h2 = (key >> 32) | 1
+        n = self.num_bits
+        bits = self.bits
+        for i in range(NUM_PROBES):
+            pos = (h1 + i * h2) % n
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def might_contain(self, key):
+        key &= _MASK64
+        h1 = key & 0xFFFFFFFF
+        h2 = (key >> 32) | 1
+        n = self.num_bits
+        bits = self.bits
+        for i in range(NUM_PROBES):
+            pos = (h1 + i * h2) % n
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def has_room(self, extra):
+        return self.count + extra <= self.capacity
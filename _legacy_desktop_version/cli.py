@@ -0,0 +1,283 @@
+"""
+Headless importer / stats reporter (never imports flet).
+
+    python cli.py import <logs_dir> [<logs_dir> ...] --db runs.db [--workers N] [--instances]
+    python cli.py watch <instance_logs_dir> [...] --db runs.db [--interval 1.0]
+    python cli.py stats --db runs.db [--format table|json] [--section towers|heights|sessions|days|all]
+    python cli.py sql-report --db runs.db [--slow-ms 20] [--format table|json]
+
+import/stats also take --trace-sql [MS] to print a SQL timing report to stderr.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import database
+import engine
+import sqltrace
+
+LOG_SUFFIXES = (".log", ".log.gz")
+MERGED_BATCH_RUNS = 5000 # Runs per transaction when storing merged instance streams
+
+def find_log_files(path):
+    """All .log / .log.gz files under a directory (or the file itself)."""
+    if os.path.isfile(path):
+        return [path]
+    found = []
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.endswith(LOG_SUFFIXES):
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+def _parse_path(path, instance=None):
+    # Runs in a worker process: parse only, the parent owns the database
+    with open(path, "rb") as fh:
+        content = fh.read()
+    return engine.parse_file_content(os.path.basename(path), content, instance)
+
+def _log_size(path):
+    """Uncompressed size of a log (a .gz trailer records it, mod 4 GiB)."""
+    size = os.path.getsize(path)
+    if path.endswith(".gz") and size >= 4:
+        with open(path, "rb") as fh:
+            fh.seek(-4, os.SEEK_END)
+            return int.from_bytes(fh.read(4), "little")
+    return size
+
+def import_logs(paths, workers=None, instances=None):
+    """
+    Parse files on all cores and store the runs. Returns a summary dict.
+    Files are spread over the workers; a single large log is split into
+    ranges that are parsed in parallel instead (engine.parse_file_chunked).
+    instances: {path: instance id} for side-by-side game instances. Their
+    runs are tagged, and each instance's stream is merged by time with the
+    others before storing.
+    """
+    started = time.perf_counter()
+    totals = {"files": 0, "files_skipped": 0, "runs_parsed": 0, "runs_saved": 0}
+    by_instance = {}
+
+    def store(path, runs):
+        totals["files"] += 1
+        if runs is None:
+            totals["files_skipped"] += 1 # Pre-scan: no practice runs in the file
+            return
+        totals["runs_parsed"] += len(runs)
+        if instances is None:
+            totals["runs_saved"] += database.save_runs(runs)
+        else:
+            by_instance.setdefault(instances[path], []).append(runs)
+
+    instance_of = (instances or {}).get
+    large = {p for p in paths if _log_size(p) >= engine.PARALLEL_MIN_BYTES}
+    small = [p for p in paths if p not in large]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, runs in zip(small, pool.map(_parse_path, small, map(instance_of, small), chunksize=4)):
+            store(path, runs)
+        for path in sorted(large):
+            with open(path, "rb") as fh:
+                content = fh.read()
+            store(path, engine.parse_file_chunked(os.path.basename(path), content, pool, instance=instance_of(path)))
+
+    if by_instance:
+        merged = engine.merge_instance_runs([engine.instance_stream(files) for files in by_instance.values()])
+        while True:
+            batch = list(islice(merged, MERGED_BATCH_RUNS))
+            if not batch:
+                break
+            totals["runs_saved"] += database.save_runs(batch)
+
+    elapsed = time.perf_counter() - started
+    return {
+        **totals,
+        "total_rows": database.get_row_count(),
+        "seconds": round(elapsed, 3),
+        "runs_per_sec": round(totals["runs_parsed"] / elapsed, 1) if elapsed > 0 else None,
+    }
+
+def watch_instances(log_dirs, interval=1.0, should_stop=None):
+    """
+    Follow each instance's latest.log and store new runs in timestamp order
+    across instances (engine.InstanceMerger). Runs until interrupted or
+    should_stop() returns True. Returns how many runs were stored.
+    """
+    merger = engine.InstanceMerger(database.save_run)
+    tails = {}
+    for log_dir in log_dirs:
+        instance = engine.instance_id(log_dir)
+        merger.add_instance(instance)
+        tails[instance] = {"path": os.path.join(log_dir, "latest.log"), "pos": 0, "partial": b""}
+
+    saved = 0
+    try:
+        while True:
+            for instance, tail in tails.items():
+                try:
+                    size = os.path.getsize(tail["path"])
+                except OSError:
+                    continue # Instance not started yet
+                if size < tail["pos"]:
+                    # The game rotated latest.log: a new log, new parser state
+                    merger.add_instance(instance)
+                    tail["pos"] = 0
+                    tail["partial"] = b""
+                if size == tail["pos"]:
+                    continue
+                with open(tail["path"], "rb") as fh:
+                    fh.seek(tail["pos"])
+                    data = fh.read(size - tail["pos"])
+                tail["pos"] += len(data)
+                lines = (tail["partial"] + data).split(b"\n")
+                tail["partial"] = lines.pop() # Incomplete last line
+                merger.feed(instance, [line.decode("utf-8", errors="ignore").rstrip("\r") for line in lines])
+            new = merger.drain(now=database.to_epoch(datetime.now()))
+            if new:
+                saved += new
+                print(f"{saved} runs stored", file=sys.stderr)
+            if should_stop is not None and should_stop():
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    return saved + merger.drain(final=True)
+
+def collect_stats(section="all"):
+    """The same aggregates the tower, height and session views show."""
+    stats = {}
+    if section in ("towers", "all"):
+        towers = database.get_tower_summary()
+        stats["towers"] = [
+            {"tower": name, **data}
+            for name, data in sorted(towers.items(), key=lambda x: x[1]['total'], reverse=True)
+        ]
+    if section in ("heights", "all"):
+        stats["heights"] = database.get_height_summary()
+    if section in ("sessions", "all"):
+        stats["sessions"] = database.get_session_index()
+    if section in ("days", "all"):
+        stats["days"] = database.get_daily_rollup()
+    return stats
+
+def _format_table(rows):
+    if not rows:
+        return "(no data)"
+    cols = list(rows[0].keys())
+
+    def fmt(v):
+        return f"{v:.2f}" if isinstance(v, float) else str(v)
+
+    cells = [[fmt(r.get(c)) for c in cols] for r in rows]
+    widths = [max(len(c), *(len(row[i]) for row in cells)) for i, c in enumerate(cols)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(cols, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    lines.extend("  ".join(v.ljust(w) for v, w in zip(row, widths)) for row in cells)
+    return "\n".join(lines)
+
+def print_stats(stats, fmt="table", out=sys.stdout):
+    if fmt == "json":
+        json.dump(stats, out, indent=2)
+        out.write("\n")
+        return
+    for name, rows in stats.items():
+        out.write(f"== {name.upper()} ==\n{_format_table(rows)}\n\n")
+
+def run_app_queries():
+    """The reads the app issues on startup and when opening each view."""
+    database.get_row_count()
+    database.get_recent_runs()
+    database.get_pbs_map()
+    collect_stats()
+    for tower in list(database.get_tower_summary())[:5]:
+        database.get_runs_by_tower(tower)
+    for row in database.get_height_summary()[:5]:
+        database.get_runs_by_height(row["height"])
+    for session in database.get_session_index()[:5]:
+        database.get_runs_by_session(session["id"], session["type"])
+
+def print_sql_report(tracer, fmt="table", out=sys.stderr):
+    report = tracer.report()
+    if fmt == "json":
+        json.dump(report, out, indent=2)
+        out.write("\n")
+    else:
+        out.write(sqltrace.format_report(report) + "\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MCSR Practice Tracker headless tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="Import directories of .log/.log.gz files")
+    p_import.add_argument("paths", nargs="+", metavar="path", help="Logs directory or a single log file")
+    p_import.add_argument("--instances", action="store_true",
+                          help="Each path is one game instance's logs folder: tag runs and merge the instances by time")
+    p_import.add_argument("--db", required=True, help="SQLite database file to write")
+    p_import.add_argument("--workers", type=int, default=None, help="Parser processes (default: all cores)")
+    p_import.add_argument("--stats", choices=["table", "json"], help="Print stats after importing")
+    p_import.add_argument("--trace-sql", type=float, nargs="?", const=sqltrace.DEFAULT_SLOW_MS, metavar="MS",
+                          help="Report SQL timings to stderr, capturing plans of statements slower than MS")
+
+    p_watch = sub.add_parser("watch", help="Follow the latest.log of one or more game instances")
+    p_watch.add_argument("log_dirs", nargs="+", metavar="logs_dir", help="An instance's logs folder")
+    p_watch.add_argument("--db", required=True, help="SQLite database file to write")
+    p_watch.add_argument("--interval", type=float, default=1.0, help="Seconds between polls")
+
+    p_stats = sub.add_parser("stats", help="Print tower/height/session aggregates")
+    p_stats.add_argument("--db", required=True, help="SQLite database file to read")
+    p_stats.add_argument("--format", choices=["table", "json"], default="table")
+    p_stats.add_argument("--section", choices=["towers", "heights", "sessions", "days", "all"], default="all")
+    p_stats.add_argument("--trace-sql", type=float, nargs="?", const=sqltrace.DEFAULT_SLOW_MS, metavar="MS",
+                         help="Report SQL timings to stderr, capturing plans of statements slower than MS")
+
+    p_sql = sub.add_parser("sql-report", help="Run the app's queries against a database and report SQL timings and plans")
+    p_sql.add_argument("--db", required=True, help="SQLite database file to read")
+    p_sql.add_argument("--slow-ms", type=float, default=sqltrace.DEFAULT_SLOW_MS,
+                       help="Capture EXPLAIN QUERY PLAN for statements at least this slow (0 = all)")
+    p_sql.add_argument("--format", choices=["table", "json"], default="table")
+
+    args = parser.parse_args(argv)
+    tracer = None
+    if args.command == "sql-report":
+        tracer = database.enable_sql_trace(args.slow_ms)
+    elif getattr(args, "trace_sql", None) is not None:
+        tracer = database.enable_sql_trace(args.trace_sql)
+    database.init_db(args.db)
+
+    if args.command == "import":
+        instances = {} if args.instances else None
+        paths = []
+        for path in args.paths:
+            found = find_log_files(path)
+            if instances is not None:
+                instances.update((p, engine.instance_id(path)) for p in found)
+            paths.extend(found)
+        if not paths:
+            print(f"No log files found in {', '.join(args.paths)}", file=sys.stderr)
+            return 1
+        summary = import_logs(paths, workers=args.workers, instances=instances)
+        print(json.dumps(summary), file=sys.stderr)
+        if args.stats:
+            print_stats(collect_stats(), args.stats)
+    elif args.command == "watch":
+        names = ", ".join(engine.instance_id(d) for d in args.log_dirs)
+        print(f"Watching {names} (Ctrl+C to stop)", file=sys.stderr)
+        saved = watch_instances(args.log_dirs, args.interval)
+        print(f"{saved} runs stored", file=sys.stderr)
+    elif args.command == "stats":
+        print_stats(collect_stats(args.section), args.format)
+    elif args.command == "sql-report":
+        run_app_queries()
+        print_sql_report(tracer, args.format, out=sys.stdout)
+        return 0
+
+    if tracer is not None:
+        print_sql_report(tracer)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
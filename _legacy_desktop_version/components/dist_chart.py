@@ -0,0 +1,68 @@
+import flet as ft
+import distribution
+
+# ===========================
+# DISTRIBUTION CHART (histogram + p10 / median / p90)
+# ===========================
+
+MAX_AXIS_LABELS = 8
+
+def build(time_summary, expl_summary):
+    """Side-by-side explosive and time histograms for the "Distribution" chart mode."""
+    return ft.Row([
+        _histogram(expl_summary, "Explosives", "", ft.colors.CYAN_400),
+        _histogram(time_summary, "Time", "s", ft.colors.PURPLE_400),
+    ], expand=True, spacing=20)
+
+def _fmt(value, unit):
+    if value is None:
+        return "-"
+    return f"{value:.1f}{unit}" if unit else f"{round(value, 1):g}"
+
+def _histogram(summary, title, unit, color):
+    if not summary or not summary["count"]:
+        return ft.Container(ft.Text(f"No {title.lower()} data", color="grey"), expand=True, alignment=ft.alignment.center)
+
+    q = summary["quantiles"]
+    # Bars holding the median / outer quantiles stand out
+    def holds(start, end, v):
+        return v is not None and (start is None or v >= start) and (end is None or v < end)
+
+    points = distribution.bars(summary)
+    step = max(1, len(points) // MAX_AXIS_LABELS)
+    groups = []
+    labels = []
+    for x, (start, end, count) in enumerate(points):
+        if holds(start, end, q[0.5]):
+            rod_color = ft.colors.AMBER_400
+        elif holds(start, end, q[0.1]) or holds(start, end, q[0.9]):
+            rod_color = color
+        else:
+            rod_color = ft.colors.with_opacity(0.6, color)
+        if start is None:
+            span = tick = f"<{_fmt(end, unit)}"
+        elif end is None:
+            span = tick = f"≥{_fmt(start, unit)}"
+        else:
+            tick = _fmt(start, unit)
+            span = tick if end - start == 1 else f"{tick}–{_fmt(end, unit)}"
+        groups.append(ft.BarChartGroup(x=x, bar_rods=[
+            ft.BarChartRod(from_y=0, to_y=count, width=max(2, 200 // max(len(points), 1)), color=rod_color,
+                           border_radius=0, tooltip=f"{span}: {count}")
+        ]))
+        if x % step == 0:
+            labels.append(ft.ChartAxisLabel(value=x, label=ft.Text(tick, size=10, color="grey")))
+
+    caption = (f"{title} • p10 {_fmt(q[0.1], unit)} • median {_fmt(q[0.5], unit)} • "
+               f"p90 {_fmt(q[0.9], unit)} • n={summary['count']}")
+    return ft.Column([
+        ft.Text(caption, size=12, color="grey"),
+        ft.BarChart(
+            bar_groups=groups,
+            border=ft.border.all(1, ft.colors.GREY_800),
+            left_axis=ft.ChartAxis(labels_size=30),
+            bottom_axis=ft.ChartAxis(labels=labels, labels_size=20),
+            tooltip_bgcolor=ft.colors.GREY_800,
+            expand=True
+        ),
+    ], expand=True)
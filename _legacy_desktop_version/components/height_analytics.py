@@ -1,5 +1,10 @@
 import flet as ft
 import database
+import perf
+import analytics
+import distribution
+import rolling
+from components import dist_chart
 
 class HeightAnalytics(ft.UserControl):
     def __init__(self):
@@ -19,14 +24,18 @@ class HeightAnalytics(ft.UserControl):
         self.hide_failures = False
         self.show_trend = False
         self.group_size = 1
+        self.overlay_stat = "None"
+        self.overlay_window = rolling.DEFAULT_WINDOW
         self.height_list = [] # Sorted heights for navigation
         
         self.main_container = ft.Container(expand=True)
 
+    @perf.timed()
     def build(self):
         self._build_list()
         return self.main_container
 
+    @perf.timed()
     def show_list(self):
         self._build_list()
         self.update()
@@ -35,34 +44,11 @@ class HeightAnalytics(ft.UserControl):
         self.view_mode = "list"
         self.current_height = None
         
-        # Get stats: (height, count, min_time, min_expl)
-        raw_stats = database.get_height_stats()
-        
-        height_data = []
-        for h, count, best_time, best_expl in raw_stats:
-            runs = database.get_runs_by_height(h)
-            
-            avg_time = 0
-            avg_expl = 0
-            
-            valid_time_runs = [r for r in runs if r[2] > 0]
-            if valid_time_runs:
-                avg_time = sum(r[2] for r in valid_time_runs) / len(valid_time_runs)
-                
-            if runs:
-                avg_expl = sum(r[4] for r in runs) / len(runs)
-                
-            height_data.append({
-                "height": h,
-                "count": count,
-                "best_time": best_time,
-                "avg_time": avg_time,
-                "best_expl": best_expl,
-                "avg_expl": avg_expl
-            })
+        # Get stats: one grouped query for every height
+        height_data = database.get_height_summary()
 
         # Sort Logic
-        col_keys = ["height", "count", "best_expl", "avg_expl", "best_time", "avg_time"]
+        col_keys = ["height", "count", "best_expl", "avg_expl", "best_time", "avg_time", "std_expl", "std_time"]
         
         # Sync index with option if changed via dropdown
         if hasattr(self, '_last_sort_from_dropdown') and self._last_sort_from_dropdown:
@@ -70,11 +56,15 @@ class HeightAnalytics(ft.UserControl):
             elif self.list_sort_option == "Most Runs": self.list_sort_column_index = 1
             elif self.list_sort_option == "Best Expl": self.list_sort_column_index = 2
             elif self.list_sort_option == "Best Time": self.list_sort_column_index = 4
+            elif self.list_sort_option == "Consistent Expl": self.list_sort_column_index = 6
+            elif self.list_sort_option == "Consistent Time": self.list_sort_column_index = 7
             self._last_sort_from_dropdown = False
             self.list_sort_ascending = (self.list_sort_option != "Most Runs")
 
         key = col_keys[self.list_sort_column_index]
-        height_data.sort(key=lambda x: x[key], reverse=not self.list_sort_ascending)
+        # SD is None below two runs; those rows go last
+        missing = float("inf") if self.list_sort_ascending else float("-inf")
+        height_data.sort(key=lambda x: missing if x[key] is None else x[key], reverse=not self.list_sort_ascending)
         
         self.height_list = [d['height'] for d in height_data]
 
@@ -88,6 +78,8 @@ class HeightAnalytics(ft.UserControl):
                     ft.DataCell(ft.Text(f"{d['avg_expl']:.1f}")),
                     ft.DataCell(ft.Text(f"{d['best_time']:.2f}s", color=ft.colors.AMBER_400 if d['best_time'] > 0 else "grey")),
                     ft.DataCell(ft.Text(f"{d['avg_time']:.2f}s")),
+                    ft.DataCell(ft.Text(f"{d['std_expl']:.2f}" if d['std_expl'] is not None else "-", color="grey")),
+                    ft.DataCell(ft.Text(f"{d['std_time']:.2f}s" if d['std_time'] is not None else "-", color="grey")),
                 ],
                 on_select_changed=lambda e, h=d['height']: self.show_detail(h)
             ))
@@ -100,6 +92,8 @@ class HeightAnalytics(ft.UserControl):
                 ft.DataColumn(ft.Text("Avg Expl"), on_sort=self.on_list_sort, numeric=True),
                 ft.DataColumn(ft.Text("Best Time"), on_sort=self.on_list_sort, numeric=True),
                 ft.DataColumn(ft.Text("Avg Time"), on_sort=self.on_list_sort, numeric=True),
+                ft.DataColumn(ft.Text("Expl SD"), on_sort=self.on_list_sort, numeric=True),
+                ft.DataColumn(ft.Text("Time SD"), on_sort=self.on_list_sort, numeric=True),
             ],
             rows=rows,
             sort_column_index=self.list_sort_column_index,
@@ -118,6 +112,8 @@ class HeightAnalytics(ft.UserControl):
                 ft.dropdown.Option("Most Runs"),
                 ft.dropdown.Option("Best Expl"),
                 ft.dropdown.Option("Best Time"),
+                ft.dropdown.Option("Consistent Expl"),
+                ft.dropdown.Option("Consistent Time"),
             ],
             on_change=self.on_list_sort_dropdown_change, content_padding=5
         )
@@ -145,7 +141,7 @@ class HeightAnalytics(ft.UserControl):
         self.list_sort_ascending = e.ascending
         
         # Update dropdown value to match if possible
-        col_to_opt = {0: "Height", 1: "Most Runs", 2: "Best Expl", 4: "Best Time"}
+        col_to_opt = {0: "Height", 1: "Most Runs", 2: "Best Expl", 4: "Best Time", 6: "Consistent Expl", 7: "Consistent Time"}
         if e.column_index in col_to_opt:
             self.list_sort_option = col_to_opt[e.column_index]
             
@@ -157,20 +153,23 @@ class HeightAnalytics(ft.UserControl):
         self._last_sort_from_dropdown = True
         self.show_list()
 
+    @perf.timed()
     def show_detail(self, height):
         self.view_mode = "detail"
         self.current_height = height
         self.all_runs = database.get_runs_by_height(height)
         
-        # Populate filter sets
-        self.active_types = set(r[6] for r in self.all_runs if r[6] and r[6] != "Unknown")
-        self.active_towers = set(r[5] for r in self.all_runs if r[5] and r[5] != "Unknown")
+        # Populate filter sets (tower/type ids, run[14]/run[15]; 0/None is 'Unknown')
+        self.tower_labels = {r[14]: r[5] for r in self.all_runs}
+        self.type_labels = {r[15]: r[6] for r in self.all_runs}
+        self.active_types = set(i for i in self.type_labels if i)
+        self.active_towers = set(i for i in self.tower_labels if i)
         
         # Build relationship maps for propagation
         self.tower_to_types = {}
         self.type_to_towers = {}
         for r in self.all_runs:
-            t, rt = r[5], r[6]
+            t, rt = r[14], r[15]
             if t not in self.tower_to_types: self.tower_to_types[t] = set()
             self.tower_to_types[t].add(rt)
             if rt not in self.type_to_towers: self.type_to_towers[rt] = set()
@@ -215,6 +214,7 @@ class HeightAnalytics(ft.UserControl):
             segments=[
                 ft.Segment(value="expl", label=ft.Text("Explosives")),
                 ft.Segment(value="time", label=ft.Text("Time")),
+                ft.Segment(value="dist", label=ft.Text("Distribution")),
             ],
             on_change=self.on_chart_mode_change
         )
@@ -232,6 +232,16 @@ class HeightAnalytics(ft.UserControl):
             text_size=12, content_padding=5, keyboard_type=ft.KeyboardType.NUMBER,
             on_submit=self.on_group_submit, on_blur=self.on_group_submit
         )
+        self.overlay_dropdown = ft.Dropdown(
+            width=100, text_size=12, label="Rolling", value=self.overlay_stat,
+            options=[ft.dropdown.Option("None")] + [ft.dropdown.Option(name) for name in rolling.OVERLAYS],
+            on_change=self.on_overlay_change, content_padding=5
+        )
+        self.window_input = ft.TextField(
+            label="Window", value=str(self.overlay_window), width=60, 
+            text_size=12, content_padding=5, keyboard_type=ft.KeyboardType.NUMBER,
+            on_submit=self.on_window_submit, on_blur=self.on_window_submit
+        )
         self.detail_sort_dropdown = ft.Dropdown(
             width=100, text_size=12, value=self.detail_sort_option,
             options=[
@@ -246,6 +256,8 @@ class HeightAnalytics(ft.UserControl):
         controls_row = ft.Row([
             self.chart_toggle, ft.Container(width=10),
             self.trend_button, self.group_input,
+            ft.Container(width=10),
+            self.overlay_dropdown, self.window_input,
             ft.Container(expand=True),
             self.detail_sort_dropdown
         ])
@@ -299,19 +311,19 @@ class HeightAnalytics(ft.UserControl):
 
     def _build_type_filters(self):
         controls = []
-        all_types = sorted(list(self.type_to_towers.keys()))
+        all_types = sorted(self.type_to_towers.keys(), key=lambda i: str(self.type_labels[i]))
         for t in all_types:
             is_active = t in self.active_types
-            btn = self._make_filter_chip(t, is_active, lambda e, x=t: self.toggle_type(x))
+            btn = self._make_filter_chip(str(self.type_labels[t]), is_active, lambda e, x=t: self.toggle_type(x))
             controls.append(btn)
         self.filter_container_types.controls = controls
         
     def _build_tower_filters(self):
         controls = []
-        all_towers = sorted(list(self.tower_to_types.keys()))
+        all_towers = sorted(self.tower_to_types.keys(), key=lambda i: str(self.tower_labels[i]))
         for t in all_towers:
             is_active = t in self.active_towers
-            btn = self._make_filter_chip(t, is_active, lambda e, x=t: self.toggle_tower(x))
+            btn = self._make_filter_chip(str(self.tower_labels[t]), is_active, lambda e, x=t: self.toggle_tower(x))
             controls.append(btn)
         self.filter_container_towers.controls = controls
 
@@ -381,8 +393,22 @@ class HeightAnalytics(ft.UserControl):
             self.group_size = 1; e.control.value="1"; e.control.update()
         self._refresh_detail_content(); self.update()
 
+    def on_overlay_change(self, e):
+        self.overlay_stat = e.control.value
+        self._refresh_detail_content(); self.update()
+
+    def on_window_submit(self, e):
+        try:
+            val = int(e.control.value)
+            if val < 2: val = 2
+            self.overlay_window = val
+        except:
+            self.overlay_window = rolling.DEFAULT_WINDOW; e.control.value = str(self.overlay_window); e.control.update()
+        self._refresh_detail_content(); self.update()
+
+    @perf.timed()
     def _refresh_detail_content(self):
-        filtered_runs = [r for r in self.all_runs if r[6] in self.active_types and r[5] in self.active_towers]
+        filtered_runs = [r for r in self.all_runs if r[15] in self.active_types and r[14] in self.active_towers]
         success_count = len(filtered_runs)
         avg_expl_val = 0; avg_time_val = 0; best_expl_val = 0; best_time_val = 0
         if success_count > 0:
@@ -392,6 +418,14 @@ class HeightAnalytics(ft.UserControl):
             if valid_time_runs:
                 avg_time_val = sum(r[2] for r in valid_time_runs) / len(valid_time_runs)
                 best_time_val = min(r[2] for r in valid_time_runs)
+
+        # Running per-(height, tower, type) moments over the selected filters
+        spread = database.get_consistency("height_tower_type", [
+            (self.current_height, tower_id, type_id)
+            for tower_id in self.active_towers for type_id in self.active_types
+        ])
+        std_expl, std_time = spread['std_expl'], spread['std_time']
+        fmt_sd = lambda v, unit="": f"±{v:.1f}{unit}" if v is not None else "-"
             
         self.stats_container.controls = [
             ft.Column([ft.Text("Suc. Runs", color="grey"), ft.Text(f"{success_count}", size=20, weight="bold")], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
@@ -399,18 +433,23 @@ class HeightAnalytics(ft.UserControl):
             ft.Row([
                 ft.Column([ft.Text("Best Expl", color="grey", size=12), ft.Text(f"{best_expl_val}", size=16, weight="bold", color=ft.colors.CYAN_400)], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
                 ft.Column([ft.Text("Avg Expl", color="grey", size=12), ft.Text(f"{avg_expl_val:.2f}", size=16, weight="bold")], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                ft.Column([ft.Text("Expl SD", color="grey", size=12), ft.Text(fmt_sd(std_expl), size=16, weight="bold")], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
             ], spacing=20),
             ft.VerticalDivider(width=20, color="grey"),
             ft.Row([
                  ft.Column([ft.Text("Best Time", color="grey", size=12), ft.Text(f"{best_time_val:.2f}s", size=16, weight="bold", color=ft.colors.AMBER_400)], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
                 ft.Column([ft.Text("Avg Time", color="grey", size=12), ft.Text(f"{avg_time_val:.2f}s", size=16, weight="bold")], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                ft.Column([ft.Text("Time SD", color="grey", size=12), ft.Text(fmt_sd(std_time, "s"), size=16, weight="bold")], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
             ], spacing=20),
         ]
         self._build_chart(filtered_runs)
         self._build_run_list(filtered_runs)
         
     def _build_chart(self, successes):
-        chart_data_source = sorted(successes, key=lambda x: x[1])
+        if self.chart_mode == "dist":
+            self._build_dist_chart(successes)
+            return
+        chart_data_source = sorted(successes, key=lambda x: x[16])
         y_values = []
         if self.chart_mode == "expl":
             y_values = [r[4] for r in chart_data_source if r[4] > 0]
@@ -419,34 +458,41 @@ class HeightAnalytics(ft.UserControl):
             y_values = [r[2] for r in chart_data_source]
             y_title = "Time (s)"; chart_color = ft.colors.PURPLE_400
             
-        points = []
-        final_y_values = [] 
-        if self.group_size > 1:
-            for i in range(0, len(y_values), self.group_size):
-                chunk = y_values[i : i + self.group_size]
-                if chunk:
-                    avg = sum(chunk) / len(chunk)
-                    points.append(ft.LineChartDataPoint(x=i, y=avg))
-                    final_y_values.append((i, avg))
-        else:
-            for i, val in enumerate(y_values):
-                points.append(ft.LineChartDataPoint(x=i, y=val))
-                final_y_values.append((i, val))
+        final_y_values = analytics.group_chunks(y_values, self.group_size)
+
+        # Downsample only what gets drawn (trend line + PBs use the full series)
+        budget = analytics.point_budget(self.page.width if self.page else None)
+        display_values = analytics.downsample(final_y_values, budget, keep=analytics.best_so_far_indices(final_y_values))
+        points = [ft.LineChartDataPoint(x=x, y=y) for x, y in display_values]
                 
         data_series = [ft.LineChartData(data_points=points, stroke_width=2, color=chart_color, curved=True, stroke_cap_round=True, below_line_bgcolor=ft.colors.with_opacity(0.1, chart_color))]
         
-        if self.show_trend and len(final_y_values) > 1:
-            n = len(final_y_values); sum_x = sum(x for x, y in final_y_values); sum_y = sum(y for x, y in final_y_values); sum_xy = sum(x*y for x, y in final_y_values); sum_xx = sum(x*x for x, y in final_y_values); denom = (n * sum_xx - sum_x * sum_x)
-            if denom != 0:
-                m = (n * sum_xy - sum_x * sum_y) / denom; b = (sum_y - m * sum_x) / n; start_x = final_y_values[0][0]; end_x = final_y_values[-1][0]
-                data_series.append(ft.LineChartData(data_points=[ft.LineChartDataPoint(x=start_x, y=m*start_x + b), ft.LineChartDataPoint(x=end_x, y=m*end_x + b)], stroke_width=2, color=ft.colors.WHITE54, dash_pattern=[5, 5], curved=False))
+        trend = analytics.trend_line(final_y_values) if self.show_trend else None
+        if trend:
+            data_series.append(ft.LineChartData(data_points=[ft.LineChartDataPoint(x=x, y=y) for x, y in trend], stroke_width=2, color=ft.colors.WHITE54, dash_pattern=[5, 5], curved=False))
+
+        # Rolling-window overlay (computed on the ungrouped series)
+        overlay = rolling.rolling_series(y_values, self.overlay_window, self.overlay_stat)
+        if overlay:
+            overlay = analytics.downsample(overlay, budget)
+            data_series.append(ft.LineChartData(data_points=[ft.LineChartDataPoint(x=x, y=y) for x, y in overlay], stroke_width=2, color=ft.colors.AMBER_400, curved=True))
 
         self.chart_container.content = ft.LineChart(data_series=data_series, border=ft.border.all(1, ft.colors.GREY_800), left_axis=ft.ChartAxis(labels_size=30, title=ft.Text(y_title, size=10)), bottom_axis=ft.ChartAxis(title=ft.Text(f"Runs", size=10), labels_size=0), tooltip_bgcolor=ft.colors.GREY_800, expand=True)
 
+    def _build_dist_chart(self, successes):
+        if self.active_towers == {t for t in self.tower_labels if t} and self.active_types == {t for t in self.type_labels if t}:
+            # Nothing filtered out: the cached per-height distribution
+            group = database.get_distributions()["height"].get(self.current_height) or {}
+            time_summary, expl_summary = group.get("time"), group.get("expl")
+        else:
+            time_summary = distribution.summarize([r[2] for r in successes if r[2] > 0], distribution.BIN_WIDTHS["time"])
+            expl_summary = distribution.summarize([r[4] for r in successes if r[4] > 0], distribution.BIN_WIDTHS["expl"])
+        self.chart_container.content = dist_chart.build(time_summary, expl_summary)
+
     def _build_run_list(self, runs):
         sorted_runs = list(runs)
-        if self.detail_sort_option == "Newest": sorted_runs.sort(key=lambda x: (x[1], x[0]), reverse=True)
-        elif self.detail_sort_option == "Oldest": sorted_runs.sort(key=lambda x: (x[1], x[0]), reverse=False)
+        if self.detail_sort_option == "Newest": sorted_runs.sort(key=lambda x: (x[16], x[0]), reverse=True)
+        elif self.detail_sort_option == "Oldest": sorted_runs.sort(key=lambda x: (x[16], x[0]), reverse=False)
         elif self.detail_sort_option == "Best Expl": sorted_runs.sort(key=lambda x: x[4], reverse=False)
         elif self.detail_sort_option == "Best Time": sorted_runs.sort(key=lambda x: x[2] if x[2] > 0 else 999, reverse=False)
 
@@ -1,11 +1,12 @@
 import flet as ft
 import database
+import perf
 import config
-from datetime import datetime
+import analytics
 
 def get_view(page, on_run_click=None):
     # Load persisted state
-    cfg = config.load_config(page)
+    cfg = config.get_config(page)
     init_chart_mode = cfg.get("chart_mode", "expl")
     init_hide_fails = cfg.get("hide_fails", False)
 
@@ -38,8 +39,8 @@ def get_view(page, on_run_click=None):
     # --- Controls ---
     def on_chart_change(e):
         new_mode = list(e.control.selected)[0]
-        config.save_config(page, {"chart_mode": new_mode})
-        update_table(outer_column)
+        cfg.update({"chart_mode": new_mode})
+        update_chart(outer_column)
 
     chart_mode_segment = ft.SegmentedButton(
         selected={init_chart_mode},
@@ -54,14 +55,14 @@ def get_view(page, on_run_click=None):
     group_input = ft.TextField(
         label="Group", value="1", width=80, text_size=12,
         keyboard_type=ft.KeyboardType.NUMBER,
-        on_submit=lambda e: update_table(outer_column)
+        on_submit=lambda e: update_chart(outer_column)
     )
 
     def on_trend_click(e):
         trend_button.selected = not trend_button.selected
-        config.save_config(page, {"show_trend": trend_button.selected})
+        cfg.update({"show_trend": trend_button.selected})
         trend_button.update()
-        update_table(outer_column)
+        update_chart(outer_column)
 
     trend_button = ft.IconButton(
         icon=ft.icons.TIMELINE,
@@ -75,9 +76,9 @@ def get_view(page, on_run_click=None):
 
     def on_fail_click(e):
         fail_button.selected = not fail_button.selected
-        config.save_config(page, {"hide_fails": fail_button.selected})
+        cfg.update({"hide_fails": fail_button.selected})
         fail_button.update()
-        update_table(outer_column)
+        update_rows(outer_column)
 
     fail_button = ft.IconButton(
         icon=ft.icons.FILTER_ALT_OFF,
@@ -114,6 +115,12 @@ def get_view(page, on_run_click=None):
     outer_column.trend_ref = trend_button
     outer_column.fail_ref = fail_button
     outer_column.on_run_click_callback = on_run_click
+
+    # Keyed row cache: run id -> _CachedRow, reused across refreshes
+    outer_column.row_cache = {}
+    outer_column.runs_cache = []
+    outer_column.pb_map_cache = {}
+    outer_column.data_generation = None
     
     return outer_column, outer_column
 
@@ -122,18 +129,11 @@ def toggle_icon_button(e, main_control):
     e.control.update()
     update_table(main_control)
 
-def set_width(main_control, width):
-    main_control.current_width = width
-    update_table(main_control)
+# Base font size per column (Expl, Time, Bed, Tower, Type, Y, Date), scaled with panel width
+BASE_FONT_SIZES = [13, 13, 12, 11, 11, 11, 10]
+VISIBLE_ROWS = 50
 
-def update_table(main_control):
-    table = main_control.table_ref
-    chart_container = main_control.chart_ref
-    chart_mode = list(main_control.chart_mode_ref.selected)[0]
-    hide_fails = main_control.fail_ref.selected
-    show_trend = main_control.trend_ref.selected
-    
-    # Calculate Scale
+def _get_scale(main_control):
     current_w = getattr(main_control, 'current_width', 450)
     # Less aggressive scaling: maxing out around 1.4x at 800px width
     # 450px -> 1.0
@@ -143,54 +143,51 @@ def update_table(main_control):
     
     if scale < 1.0: scale = 1.0
     if scale > 1.4: scale = 1.4
-    
-    # Font Sizes
-    s_expl = 13 * scale
-    s_time = 13 * scale
-    s_bed = 12 * scale
-    s_other = 11 * scale
-    s_date = 10 * scale
-    
-    try:
-        group_size = int(main_control.group_ref.value)
-        if group_size < 1: group_size = 1
-    except:
-        group_size = 1
+    return scale
 
-    all_runs = database.get_recent_runs(limit=100) # Get more to allow for filtering
-    
-    # --- TABLE LOGIC ---
-    new_rows = []
-    pb_map = database.get_pbs_map()
-    
-    # We display the last 50 *visible* runs
-    visible_count = 0
-    for run in all_runs:
-        if visible_count >= 50: break
-        
-        is_success = bool(run[9])
-        if hide_fails and not is_success:
-            continue
-            
-        visible_count += 1
-        ts_str = run[1]
+def set_width(main_control, width):
+    """Width changes only rescale fonts on the existing row controls."""
+    main_control.current_width = width
+    if not main_control.row_cache:
+        return
+    scale = _get_scale(main_control)
+    for cached in main_control.row_cache.values():
+        cached.apply_scale(scale)
+    main_control.table_ref.update()
+
+@perf.timed()
+def update_table(main_control):
+    """Full refresh: re-query only if the data changed, then diff rows and redraw the chart."""
+    _fetch_runs(main_control)
+    update_rows(main_control)
+    update_chart(main_control)
+
+def _fetch_runs(main_control):
+    generation = database.get_generation()
+    if generation == main_control.data_generation:
+        return False
+    main_control.runs_cache = database.get_recent_runs(limit=100) # Get more to allow for filtering
+    main_control.pb_map_cache = database.get_pbs_map()
+    main_control.data_generation = generation
+    return True
+
+class _CachedRow:
+    """A DataRow plus its Text controls, built once per run."""
+    __slots__ = ("run", "row", "texts")
+
+    def __init__(self, run, scale, on_click):
+        self.run = run
         time_val = run[2]
         expl_str = run[3]
-        total_expl = run[4]
         tower = run[5]
         r_type = run[6]
         height = run[7]
         bed = run[8]
+        is_success = bool(run[9])
 
-        try:
-            dt = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-            date_display = dt.strftime("%m/%d %H:%M")
-        except:
-            date_display = ts_str
+        date_display = database.format_timestamp(run[16], "%m/%d %H:%M")
 
-        row_color = "white"
         if not is_success:
-            row_color = ft.colors.RED_400
             # Show fail reason in Expl column
             fail_reason = run[10] if run[10] else "Fail"
             expl_display = fail_reason
@@ -206,33 +203,98 @@ def update_table(main_control):
             tower_display = tower
             type_display = r_type
             height_display = str(height) if height > 0 else "-"
-            
-            key = (tower, r_type)
-            if key in pb_map and total_expl == pb_map[key]:
-                row_color = ft.colors.YELLOW_400
-
-        def on_row_click(e, t=tower, rt=r_type):
-            if hasattr(main_control, 'on_run_click_callback') and main_control.on_run_click_callback:
-                if t != "Unknown":
-                    main_control.on_run_click_callback(t, rt)
-
-        new_rows.append(
-            ft.DataRow(
-                on_select_changed=on_row_click,
-                cells=[
-                    ft.DataCell(ft.Text(expl_display, color=row_color, weight="bold", size=s_expl, no_wrap=True, overflow=ft.TextOverflow.ELLIPSIS)),
-                    ft.DataCell(ft.Text(time_display, color=row_color, size=s_time, no_wrap=True)),
-                    ft.DataCell(ft.Text(bed_display, size=s_bed, color=ft.colors.ORANGE_300 if bed else "grey", no_wrap=True)),
-                    ft.DataCell(ft.Text(tower_display, size=s_other, no_wrap=True, overflow=ft.TextOverflow.ELLIPSIS)),
-                    ft.DataCell(ft.Text(type_display, size=s_other, no_wrap=True, overflow=ft.TextOverflow.ELLIPSIS)),
-                    ft.DataCell(ft.Text(height_display, size=s_other, no_wrap=True)),
-                    ft.DataCell(ft.Text(date_display, size=s_date, color="grey", no_wrap=True)),
-                ]
-            )
+
+        row_color = "white" if is_success else ft.colors.RED_400
+        self.texts = [
+            ft.Text(expl_display, color=row_color, weight="bold", no_wrap=True, overflow=ft.TextOverflow.ELLIPSIS),
+            ft.Text(time_display, color=row_color, no_wrap=True),
+            ft.Text(bed_display, color=ft.colors.ORANGE_300 if bed else "grey", no_wrap=True),
+            ft.Text(tower_display, no_wrap=True, overflow=ft.TextOverflow.ELLIPSIS),
+            ft.Text(type_display, no_wrap=True, overflow=ft.TextOverflow.ELLIPSIS),
+            ft.Text(height_display, no_wrap=True),
+            ft.Text(date_display, color="grey", no_wrap=True),
+        ]
+        self.apply_scale(scale)
+        self.row = ft.DataRow(
+            cells=[ft.DataCell(t) for t in self.texts],
+            on_select_changed=on_click,
+            data=(tower, r_type)
         )
-    table.rows = new_rows
+
+    def apply_scale(self, scale):
+        for text, base in zip(self.texts, BASE_FONT_SIZES):
+            text.size = base * scale
+
+    def apply_pb(self, pb_map):
+        """Highlight the row if it matches the current PB for its tower/type."""
+        run = self.run
+        if not run[9]:
+            return
+        is_pb = pb_map.get((run[14], run[15])) == run[4]
+        color = ft.colors.YELLOW_400 if is_pb else "white"
+        for text in self.texts[:2]:
+            if text.color != color:
+                text.color = color
+
+@perf.timed()
+def update_rows(main_control):
+    """Diff the visible runs against the row cache; only new runs get new controls."""
+    table = main_control.table_ref
+    hide_fails = main_control.fail_ref.selected
+    cache = main_control.row_cache
+    pb_map = main_control.pb_map_cache
+    scale = _get_scale(main_control)
+
+    if main_control.data_generation is None:
+        _fetch_runs(main_control)
+
+    if not hasattr(main_control, 'row_click_handler'):
+        def on_row_click(e):
+            t, rt = e.control.data
+            if getattr(main_control, 'on_run_click_callback', None) and t != "Unknown":
+                main_control.on_run_click_callback(t, rt)
+        main_control.row_click_handler = on_row_click
+
+    # We display the last 50 *visible* runs
+    rows = []
+    live_ids = set()
+    for run in main_control.runs_cache:
+        if len(rows) >= VISIBLE_ROWS: break
+        if hide_fails and not run[9]:
+            continue
+
+        cached = cache.get(run[0])
+        if cached is None or cached.run != run: # ids can be reused after a clear
+            cached = _CachedRow(run, scale, main_control.row_click_handler)
+            cache[run[0]] = cached
+        cached.apply_pb(pb_map)
+        live_ids.add(run[0])
+        rows.append(cached.row)
+
+    # Drop rows for runs that fell out of the window
+    for run_id in [k for k in cache if k not in live_ids]:
+        del cache[run_id]
+
+    table.rows = rows
     table.update()
 
+@perf.timed()
+def update_chart(main_control):
+    chart_container = main_control.chart_ref
+    chart_mode = list(main_control.chart_mode_ref.selected)[0]
+    show_trend = main_control.trend_ref.selected
+    current_w = getattr(main_control, 'current_width', 450)
+
+    try:
+        group_size = int(main_control.group_ref.value)
+        if group_size < 1: group_size = 1
+    except:
+        group_size = 1
+
+    if main_control.data_generation is None:
+        _fetch_runs(main_control)
+    all_runs = main_control.runs_cache
+
     # --- CHART LOGIC ---
     # Process successes for the graph
     chart_data_source = [r for r in reversed(all_runs) if r[9]]
@@ -247,19 +309,12 @@ def update_table(main_control):
         chart_color = ft.colors.PURPLE_400
         title_text = "Time"
 
-    points = []
-    final_coords = []
-    if group_size > 1:
-        for i in range(0, len(y_values), group_size):
-            chunk = y_values[i : i + group_size]
-            if chunk:
-                avg = sum(chunk) / len(chunk)
-                points.append(ft.LineChartDataPoint(x=i, y=avg))
-                final_coords.append((i, avg))
-    else:
-        for i, val in enumerate(y_values):
-            points.append(ft.LineChartDataPoint(x=i, y=val))
-            final_coords.append((i, val))
+    final_coords = analytics.group_chunks(y_values, group_size)
+
+    # Downsample only what gets drawn (trend line + PBs use the full series)
+    budget = analytics.point_budget(current_w)
+    display_coords = analytics.downsample(final_coords, budget, keep=analytics.best_so_far_indices(final_coords))
+    points = [ft.LineChartDataPoint(x=x, y=y) for x, y in display_coords]
 
     data_series = [
         ft.LineChartData(
@@ -273,17 +328,12 @@ def update_table(main_control):
     ]
 
     # Trend Line
-    if show_trend and len(final_coords) > 1:
-        n = len(final_coords)
-        sum_x = sum(x for x, y in final_coords); sum_y = sum(y for x, y in final_coords); sum_xy = sum(x*y for x, y in final_coords); sum_xx = sum(x*x for x, y in final_coords)
-        denom = (n * sum_xx - sum_x * sum_x)
-        if denom != 0:
-            m = (n * sum_xy - sum_x * sum_y) / denom; b = (sum_y - m * sum_x) / n
-            start_x, end_x = final_coords[0][0], final_coords[-1][0]
-            data_series.append(ft.LineChartData(
-                data_points=[ft.LineChartDataPoint(x=start_x, y=m*start_x+b), ft.LineChartDataPoint(x=end_x, y=m*end_x+b)],
-                stroke_width=1, color=ft.colors.WHITE54, dash_pattern=[5, 5]
-            ))
+    trend = analytics.trend_line(final_coords) if show_trend else None
+    if trend:
+        data_series.append(ft.LineChartData(
+            data_points=[ft.LineChartDataPoint(x=x, y=y) for x, y in trend],
+            stroke_width=1, color=ft.colors.WHITE54, dash_pattern=[5, 5]
+        ))
 
     chart = ft.LineChart(
         data_series=data_series,
@@ -1,7 +1,9 @@
 import flet as ft
 import database
+import perf
 import config
-from datetime import datetime, timedelta
+import analytics
+import rolling
 
 class SessionAnalytics(ft.UserControl):
     def __init__(self):
@@ -20,6 +22,8 @@ class SessionAnalytics(ft.UserControl):
         self.hide_failures = False
         self.hide_world_loads = False 
         self.group_size = 1
+        self.overlay_stat = "None"
+        self.overlay_window = rolling.DEFAULT_WINDOW
         self.sort_option = "Newest" 
         
         # List View State
@@ -27,12 +31,12 @@ class SessionAnalytics(ft.UserControl):
 
     def did_mount(self):
         # Load persisted state after mount so page is available
-        cfg = config.load_config(self.page)
-        self.show_splits_only = cfg.get("show_splits_only", False)
+        self.show_splits_only = config.get_config(self.page).get("show_splits_only", False)
         self.splits_button.selected = self.show_splits_only
         self._build_list_view()
         self.update()
 
+    @perf.timed()
     def build(self):
         self._build_list_view()
         return self.main_container
@@ -52,14 +56,9 @@ class SessionAnalytics(ft.UserControl):
             # Map index back to original list for clicking
             original_index = self.session_list.index(sess)
             
-            # Duration
-            try:
-                start = datetime.strptime(sess['start_time'], "%Y-%m-%d %H:%M:%S")
-                end = datetime.strptime(sess['end_time'], "%Y-%m-%d %H:%M:%S")
-                duration = end - start
-                dur_str = str(duration).split('.')[0]
-            except:
-                dur_str = "0:00:00"
+            # Duration (wall clock span) and active play time
+            dur_str = _format_duration(sess.get('duration', 0))
+            active_str = _format_duration(sess.get('active_time', 0))
 
             total = sess['count']
             success = sess['success_count']
@@ -78,7 +77,7 @@ class SessionAnalytics(ft.UserControl):
                         ft.Icon(icon, color=icon_color, size=20),
                         ft.Column([
                             ft.Text(sess['id'], weight="bold", size=14, width=280, no_wrap=True),
-                            ft.Text(f"{sess['start_time']} • {dur_str}", size=11, color="grey")
+                            ft.Text(f"{sess['start_time']} • {dur_str} • {active_str} active", size=11, color="grey")
                         ], spacing=2),
                     ]),
                     
@@ -134,17 +133,19 @@ class SessionAnalytics(ft.UserControl):
         self.splits_button.selected = self.show_splits_only
         
         # Persist
-        config.save_config(self.page, {"show_splits_only": self.show_splits_only})
+        config.get_config(self.page).update({"show_splits_only": self.show_splits_only})
         
         self.splits_button.update()
         self._build_list_view()
         self.update()
 
+    @perf.timed()
     def refresh_list(self):
         self._build_list_view()
         self.update()
 
     # --- DETAIL VIEW (Unchanged Logic, just re-stating for completeness) ---
+    @perf.timed()
     def load_session_detail(self, index):
         if index < 0 or index >= len(self.session_list):
             return
@@ -204,6 +205,22 @@ class SessionAnalytics(ft.UserControl):
             keyboard_type=ft.KeyboardType.NUMBER, on_submit=self.on_group_submit, on_blur=self.on_group_submit
         )
 
+        self.overlay_dropdown = ft.Dropdown(
+            width=100,
+            text_size=12,
+            label="Rolling",
+            value=self.overlay_stat,
+            options=[ft.dropdown.Option("None")] + [ft.dropdown.Option(name) for name in rolling.OVERLAYS] + [ft.dropdown.Option(rolling.RATE)],
+            on_change=self.on_overlay_change,
+            content_padding=5,
+            height=35
+        )
+
+        self.window_input = ft.TextField(
+            label="Window", value=str(self.overlay_window), width=60, text_size=12, content_padding=5,
+            keyboard_type=ft.KeyboardType.NUMBER, on_submit=self.on_window_submit, on_blur=self.on_window_submit
+        )
+
         self.sort_dropdown = ft.Dropdown(
             width=120,
             text_size=12,
@@ -240,7 +257,7 @@ class SessionAnalytics(ft.UserControl):
         )
 
         controls_row = ft.Row([
-            ft.Row([self.chart_toggle, self.trend_button, self.group_input], alignment=ft.MainAxisAlignment.START, spacing=15),
+            ft.Row([self.chart_toggle, self.trend_button, self.group_input, self.overlay_dropdown, self.window_input], alignment=ft.MainAxisAlignment.START, spacing=15),
             ft.Container(expand=True),
             ft.Row([
                 ft.Text("Sort:", size=12, color="grey"),
@@ -327,7 +344,25 @@ class SessionAnalytics(ft.UserControl):
         self._refresh_detail_content()
         self.update()
 
+    def on_overlay_change(self, e):
+        self.overlay_stat = e.control.value
+        self._refresh_detail_content()
+        self.update()
+
+    def on_window_submit(self, e):
+        try:
+            val = int(e.control.value)
+            if val < 2: val = 2
+            self.overlay_window = val
+        except:
+            self.overlay_window = rolling.DEFAULT_WINDOW
+            e.control.value = str(self.overlay_window)
+            e.control.update()
+        self._refresh_detail_content()
+        self.update()
+
     # --- REFRESH LOGIC (Same as before) ---
+    @perf.timed()
     def _refresh_detail_content(self):
         active_runs = list(self.detail_runs)
         if self.hide_world_loads:
@@ -344,48 +379,41 @@ class SessionAnalytics(ft.UserControl):
         heights = [r[7] for r in active_runs if r[7] > 0]
         avg_height = sum(heights) / len(heights) if heights else 0
         
-        # Session Time Calc (Smart)
-        time_sorted_runs = sorted(active_runs, key=lambda x: x[1])
-        session_time_seconds = 0
-        if time_sorted_runs:
-            current_chunk_start = datetime.strptime(time_sorted_runs[0][1], "%Y-%m-%d %H:%M:%S")
-            current_chunk_end = current_chunk_start + timedelta(seconds=time_sorted_runs[0][2])
-            
-            for i in range(1, len(time_sorted_runs)):
-                run_start = datetime.strptime(time_sorted_runs[i][1], "%Y-%m-%d %H:%M:%S")
-                run_duration = time_sorted_runs[i][2]
-                run_end = run_start + timedelta(seconds=run_duration)
-                gap = (run_start - current_chunk_end).total_seconds()
-                
-                if gap > 1800:
-                    chunk_duration = (current_chunk_end - current_chunk_start).total_seconds()
-                    session_time_seconds += chunk_duration
-                    current_chunk_start = run_start
-                    current_chunk_end = run_end
-                else:
-                    if run_end > current_chunk_end:
-                        current_chunk_end = run_end
-            
-            chunk_duration = (current_chunk_end - current_chunk_start).total_seconds()
-            session_time_seconds += chunk_duration
+        # Session Time Calc (Smart): merged in SQL, cached per (session, hide_world_loads)
+        time_sorted_runs = sorted(active_runs, key=lambda x: x[16])
+        session_time_seconds = database.get_session_active_time(
+            self.session_data['id'], self.session_data['type'], self.hide_world_loads
+        )
+
+        # Last window vs. the window before it
+        latest_rate, prev_rate = rolling.window_comparison([r[9] for r in time_sorted_runs], self.overlay_window, rolling.RATE)
+        if latest_rate is None:
+            recent_str = "-"
+        elif prev_rate is None:
+            recent_str = f"{latest_rate:.1f}%"
+        else:
+            recent_str = f"{latest_rate:.1f}% ({latest_rate - prev_rate:+.1f})"
 
-        m, s = divmod(session_time_seconds, 60)
-        h, m = divmod(m, 60)
-        dur_str = f"{int(h)}:{int(m):02d}:{int(s):02d}"
+        dur_str = _format_duration(session_time_seconds)
+        spread = database.get_consistency(self.session_data['type'], [self.session_data['id']])
+        std_time = spread['std_time']
 
         self.stats_container.controls = [
             self._stat_card("Total Runs", str(total_runs), ft.colors.WHITE),
             self._stat_card("Success Rate", f"{success_rate:.1f}%", ft.colors.GREEN_400 if success_rate > 50 else ft.colors.ORANGE_400),
             self._stat_card("Death Rate", f"{death_rate:.1f}%", ft.colors.RED_400),
+            self._stat_card(f"Last {self.overlay_window} Success", recent_str, ft.colors.GREEN_400 if prev_rate is None or latest_rate >= prev_rate else ft.colors.ORANGE_400),
             self._stat_card("Avg Height", f"{int(avg_height)}", ft.colors.CYAN_400),
+            self._stat_card("Time SD", f"±{std_time:.1f}s" if std_time is not None else "-", ft.colors.PURPLE_200),
             self._stat_card("Session Time", dur_str, ft.colors.GREY_400),
         ]
 
         # Chart
-        chart_data_source = sorted(successes, key=lambda x: x[1])
+        chart_data_source = sorted(successes, key=lambda x: x[16])
         y_values = []
         if self.chart_mode == "expl":
-            y_values = [r[4] for r in chart_data_source if r[4] > 0]
+            chart_data_source = [r for r in chart_data_source if r[4] > 0]
+            y_values = [r[4] for r in chart_data_source]
             chart_color = ft.colors.CYAN_400
             y_title = "Explosives"
         else:
@@ -393,20 +421,12 @@ class SessionAnalytics(ft.UserControl):
             chart_color = ft.colors.PURPLE_400
             y_title = "Time (s)"
 
-        points = []
-        final_coords = []
-        
-        if self.group_size > 1:
-            for i in range(0, len(y_values), self.group_size):
-                chunk = y_values[i : i + self.group_size]
-                if chunk:
-                    avg = sum(chunk) / len(chunk)
-                    points.append(ft.LineChartDataPoint(x=i, y=avg))
-                    final_coords.append((i, avg))
-        else:
-            for i, val in enumerate(y_values):
-                points.append(ft.LineChartDataPoint(x=i, y=val))
-                final_coords.append((i, val))
+        final_coords = analytics.group_chunks(y_values, self.group_size)
+
+        # Downsample only what gets drawn (trend line + PBs use the full series)
+        budget = analytics.point_budget(self.page.width if self.page else None)
+        display_coords = analytics.downsample(final_coords, budget, keep=analytics.best_so_far_indices(final_coords))
+        points = [ft.LineChartDataPoint(x=x, y=y) for x, y in display_coords]
 
         data_series = [
             ft.LineChartData(
@@ -419,26 +439,38 @@ class SessionAnalytics(ft.UserControl):
             )
         ]
 
-        if self.show_trend and len(final_coords) > 1:
-            n = len(final_coords)
-            sum_x = sum(x for x, y in final_coords)
-            sum_y = sum(y for x, y in final_coords)
-            sum_xy = sum(x*y for x, y in final_coords)
-            sum_xx = sum(x*x for x, y in final_coords)
-            denom = (n * sum_xx - sum_x * sum_x)
-            if denom != 0:
-                m = (n * sum_xy - sum_x * sum_y) / denom
-                b = (sum_y - m * sum_x) / n
-                start_x, end_x = final_coords[0][0], final_coords[-1][0]
-                data_series.append(ft.LineChartData(
-                    data_points=[ft.LineChartDataPoint(x=start_x, y=m*start_x+b), ft.LineChartDataPoint(x=end_x, y=m*end_x+b)],
-                    stroke_width=1, color=ft.colors.WHITE54, dash_pattern=[5, 5]
-                ))
+        trend = analytics.trend_line(final_coords) if self.show_trend else None
+        if trend:
+            data_series.append(ft.LineChartData(
+                data_points=[ft.LineChartDataPoint(x=x, y=y) for x, y in trend],
+                stroke_width=1, color=ft.colors.WHITE54, dash_pattern=[5, 5]
+            ))
+
+        # Rolling-window overlay (computed on the ungrouped series)
+        right_axis = None
+        if self.overlay_stat == rolling.RATE:
+            # Success rate over all attempts, scaled onto the value range with its own % axis
+            overlay = rolling.rate_series([(r[0], r[9]) for r in time_sorted_runs], [r[0] for r in chart_data_source], self.overlay_window)
+            lo, hi = rolling.rate_scale(y_values)
+            overlay = rolling.scale_rates(overlay, lo, hi)
+            right_axis = ft.ChartAxis(labels_size=40, labels=[
+                ft.ChartAxisLabel(value=y, label=ft.Text(f"{pct}%", size=10, color=ft.colors.AMBER_400))
+                for y, pct in rolling.rate_ticks(lo, hi)
+            ])
+        else:
+            overlay = rolling.rolling_series(y_values, self.overlay_window, self.overlay_stat)
+        if overlay:
+            overlay = analytics.downsample(overlay, budget)
+            data_series.append(ft.LineChartData(
+                data_points=[ft.LineChartDataPoint(x=x, y=y) for x, y in overlay],
+                stroke_width=2, color=ft.colors.AMBER_400, curved=True
+            ))
 
         chart = ft.LineChart(
             data_series=data_series,
             border=ft.border.all(1, ft.colors.GREY_800),
             left_axis=ft.ChartAxis(labels_size=30, title=ft.Text(y_title, size=10)),
+            right_axis=right_axis,
             bottom_axis=ft.ChartAxis(labels_size=0),
             tooltip_bgcolor=ft.colors.GREY_800,
             expand=True
@@ -451,9 +483,9 @@ class SessionAnalytics(ft.UserControl):
             table_runs = [r for r in table_runs if r[9]]
 
         if self.sort_option == "Newest":
-            table_runs.sort(key=lambda x: (x[1], x[0]), reverse=True)
+            table_runs.sort(key=lambda x: (x[16], x[0]), reverse=True)
         elif self.sort_option == "Oldest":
-            table_runs.sort(key=lambda x: (x[1], x[0]), reverse=False)
+            table_runs.sort(key=lambda x: (x[16], x[0]), reverse=False)
         elif self.sort_option == "Time":
             table_runs.sort(key=lambda x: (not x[9], x[2])) 
         elif self.sort_option == "Expl":
@@ -501,4 +533,9 @@ class SessionAnalytics(ft.UserControl):
 
     def show_list(self):
         self._build_list_view()
-        self.update()
\ No newline at end of file
+        self.update()
+
+def _format_duration(seconds):
+    m, s = divmod(int(seconds or 0), 60)
+    h, m = divmod(m, 60)
+    return f"{h}:{m:02d}:{s:02d}"
@@ -1,6 +1,11 @@
 import flet as ft
 import database
+import perf
 import config
+import analytics
+import distribution
+import rolling
+from components import dist_chart
 
 class TowerAnalytics(ft.UserControl):
     def __init__(self):
@@ -17,20 +22,23 @@ class TowerAnalytics(ft.UserControl):
         self.hide_failures = False
         self.show_trend = False
         self.group_size = 1 # Default 1 means no grouping
+        self.overlay_stat = "None" # Rolling-window overlay (see rolling.OVERLAYS)
+        self.overlay_window = rolling.DEFAULT_WINDOW
         self.tower_names = [] # Sorted names for navigation
         
         self.main_container = ft.Container(expand=True)
 
     def did_mount(self):
         # Load persisted state
-        cfg = config.load_config(self.page)
-        self.chart_mode = cfg.get("chart_mode", "expl")
+        self.chart_mode = config.get_config(self.page).get("chart_mode", "expl")
         self.update()
 
+    @perf.timed()
     def build(self):
         self._build_grid()
         return self.main_container
 
+    @perf.timed()
     def show_grid(self):
         self._build_grid()
         self.update()
@@ -39,39 +47,8 @@ class TowerAnalytics(ft.UserControl):
         self.view_mode = "grid"
         self.current_tower = None
         
-        basic_stats = database.get_tower_stats()
-        tower_data = {}
-
-        for t_name, _, _ in basic_stats:
-            runs = database.get_runs_by_tower(t_name)
-            total_count = len(runs)
-            success_runs = [r for r in runs if r[9]] # is_success=1
-            success_count = len(success_runs)
-            
-            if success_count == 0:
-                continue
-
-            # Calculate Stats
-            # Calculate Stats
-            avg_expl = sum(r[4] for r in success_runs) / success_count
-            
-            valid_time_runs = [r for r in success_runs if r[2] > 0]
-            if valid_time_runs:
-                avg_time = sum(r[2] for r in valid_time_runs) / len(valid_time_runs)
-                best_time = min(r[2] for r in valid_time_runs)
-            else:
-                avg_time = 0
-                best_time = 0
-            
-            best_expl = min(r[4] for r in success_runs)
-            
-            tower_data[t_name] = {
-                'total': success_count, # Re-purposed as successful count
-                'avg_expl': avg_expl,
-                'avg_time': avg_time,
-                'best_expl': best_expl,
-                'best_time': best_time
-            }
+        # One grouped query instead of fetching every tower's runs
+        tower_data = database.get_tower_summary()
 
         stats_list = []
         for t_name, data in tower_data.items():
@@ -84,6 +61,11 @@ class TowerAnalytics(ft.UserControl):
             stats_list.sort(key=lambda x: x[1]['best_time'], reverse=False)
         elif self.grid_sort_option == "Best Avg Expl":
             stats_list.sort(key=lambda x: x[1]['avg_expl'], reverse=False)
+        elif self.grid_sort_option == "Consistent Time":
+            # Lowest spread first; towers with fewer than two runs last
+            stats_list.sort(key=lambda x: (x[1]['std_time'] is None, x[1]['std_time'] or 0))
+        elif self.grid_sort_option == "Consistent Expl":
+            stats_list.sort(key=lambda x: (x[1]['std_expl'] is None, x[1]['std_expl'] or 0))
         elif self.grid_sort_option == "Alphabetical":
             stats_list.sort(key=lambda x: x[0], reverse=False)
             
@@ -106,6 +88,7 @@ class TowerAnalytics(ft.UserControl):
                         ft.Container(height=5),
                         ft.Text("Avg Expl", size=12, color="grey"),
                         ft.Text(f"{data['avg_expl']:.1f}", size=18, weight="bold"),
+                        ft.Text(_fmt_sd(data['std_expl']), size=11, color="grey"),
                     ], spacing=2, horizontal_alignment=ft.CrossAxisAlignment.CENTER),
                     
                     ft.VerticalDivider(width=10, color="grey"),
@@ -117,6 +100,7 @@ class TowerAnalytics(ft.UserControl):
                         ft.Container(height=5),
                         ft.Text("Avg Time", size=12, color="grey"),
                         ft.Text(f"{data.get('avg_time', 0):.1f}s", size=18, weight="bold"),
+                        ft.Text(_fmt_sd(data['std_time'], "s"), size=11, color="grey"),
                     ], spacing=2, horizontal_alignment=ft.CrossAxisAlignment.CENTER),
                 ], alignment=ft.MainAxisAlignment.SPACE_EVENLY, expand=True),
                 
@@ -151,6 +135,8 @@ class TowerAnalytics(ft.UserControl):
                 ft.dropdown.Option("Most Runs"),
                 ft.dropdown.Option("Best Time"),
                 ft.dropdown.Option("Best Avg Expl"),
+                ft.dropdown.Option("Consistent Time"),
+                ft.dropdown.Option("Consistent Expl"),
                 ft.dropdown.Option("Alphabetical"),
             ],
             on_change=self.on_grid_sort_change,
@@ -175,14 +161,18 @@ class TowerAnalytics(ft.UserControl):
         self.grid_sort_option = e.control.value
         self.show_grid()
 
+    @perf.timed()
     def show_detail(self, tower_name, initial_filter_type=None):
         self.view_mode = "detail"
         self.current_tower = tower_name
         self.all_runs = database.get_runs_by_tower(tower_name)
         
-        unique_types = sorted(list(set(r[6] for r in self.all_runs if r[6] and r[6] != "Unknown")))
-        if initial_filter_type and initial_filter_type in unique_types:
-            self.active_types = {initial_filter_type}
+        # Filters work on type ids (run[15]); 0/None is 'Unknown'
+        self.type_labels = {r[15]: r[6] for r in self.all_runs if r[15]}
+        unique_types = sorted(self.type_labels, key=self.type_labels.get)
+        initial_id = next((i for i, name in self.type_labels.items() if name == initial_filter_type), None)
+        if initial_id is not None:
+            self.active_types = {initial_id}
         else:
             self.active_types = set(unique_types)
         
@@ -217,6 +207,7 @@ class TowerAnalytics(ft.UserControl):
             segments=[
                 ft.Segment(value="expl", label=ft.Text("Explosives")),
                 ft.Segment(value="time", label=ft.Text("Time")),
+                ft.Segment(value="dist", label=ft.Text("Distribution")),
             ],
             on_change=self.on_chart_mode_change
         )
@@ -243,6 +234,27 @@ class TowerAnalytics(ft.UserControl):
             on_blur=self.on_group_submit
         )
 
+        self.overlay_dropdown = ft.Dropdown(
+            width=100,
+            text_size=12,
+            label="Rolling",
+            value=self.overlay_stat,
+            options=[ft.dropdown.Option("None")] + [ft.dropdown.Option(name) for name in rolling.OVERLAYS] + [ft.dropdown.Option(rolling.RATE)],
+            on_change=self.on_overlay_change,
+            content_padding=5
+        )
+
+        self.window_input = ft.TextField(
+            label="Window", 
+            value=str(self.overlay_window), 
+            width=60, 
+            text_size=12,
+            content_padding=5,
+            keyboard_type=ft.KeyboardType.NUMBER,
+            on_submit=self.on_window_submit,
+            on_blur=self.on_window_submit
+        )
+
         self.detail_sort_dropdown = ft.Dropdown(
             width=100,
             text_size=12,
@@ -267,6 +279,9 @@ class TowerAnalytics(ft.UserControl):
             ft.Container(width=10),
             self.trend_button,
             self.group_input,
+            ft.Container(width=10),
+            self.overlay_dropdown,
+            self.window_input,
             ft.Container(expand=True),
             self.detail_sort_dropdown
         ], alignment=ft.MainAxisAlignment.START)
@@ -313,13 +328,14 @@ class TowerAnalytics(ft.UserControl):
             border_color = ft.colors.BLUE_700 if is_active else ft.colors.GREY_700
             
             btn = ft.Container(
-                content=ft.Text(t_type, size=12, color="white" if is_active else "grey"),
+                content=ft.Text(self.type_labels[t_type], size=12, color="white" if is_active else "grey"),
                 padding=8,
                 border_radius=15,
                 bgcolor=bg_color,
                 border=ft.border.all(1, border_color),
                 ink=True,
-                on_click=lambda e, t=t_type: self.toggle_filter(t)
+                on_click=lambda e, t=t_type: self.toggle_filter(t),
+                data=t_type
             )
             controls.append(btn)
         self.filter_row.controls = controls
@@ -330,7 +346,7 @@ class TowerAnalytics(ft.UserControl):
         else:
             self.active_types.add(t_type)
         current_buttons = self.filter_row.controls
-        all_types_in_ui = [btn.content.value for btn in current_buttons]
+        all_types_in_ui = [btn.data for btn in current_buttons]
         self._build_filter_controls(all_types_in_ui)
         self.filter_row.update()
         self._refresh_detail_content()
@@ -338,8 +354,9 @@ class TowerAnalytics(ft.UserControl):
 
     def on_chart_mode_change(self, e):
         self.chart_mode = list(e.control.selected)[0]
-        # Persist
-        config.save_config(self.page, {"chart_mode": self.chart_mode})
+        # Persist (the key is shared with the recent-runs chart, which has no distribution mode)
+        if self.chart_mode != "dist":
+            config.get_config(self.page).update({"chart_mode": self.chart_mode})
         
         self._refresh_detail_content()
         self.update()
@@ -354,7 +371,7 @@ class TowerAnalytics(ft.UserControl):
         self.trend_button.selected = self.show_trend
         
         # Persist
-        config.save_config(self.page, {"show_trend": self.show_trend})
+        config.get_config(self.page).update({"show_trend": self.show_trend})
         
         self.trend_button.update()
         self._refresh_detail_content()
@@ -372,9 +389,27 @@ class TowerAnalytics(ft.UserControl):
         self._refresh_detail_content()
         self.update()
 
+    def on_overlay_change(self, e):
+        self.overlay_stat = e.control.value
+        self._refresh_detail_content()
+        self.update()
+
+    def on_window_submit(self, e):
+        try:
+            val = int(e.control.value)
+            if val < 2: val = 2
+            self.overlay_window = val
+        except:
+            self.overlay_window = rolling.DEFAULT_WINDOW
+            e.control.value = str(self.overlay_window)
+            e.control.update()
+        self._refresh_detail_content()
+        self.update()
+
     # --- REFRESH LOGIC ---
+    @perf.timed()
     def _refresh_detail_content(self):
-        filtered_runs = [r for r in self.all_runs if r[6] in self.active_types]
+        filtered_runs = [r for r in self.all_runs if r[15] in self.active_types]
         
         # Stats Calculation
         total = len(filtered_runs)
@@ -394,6 +429,16 @@ class TowerAnalytics(ft.UserControl):
             if valid_time_runs:
                 avg_time_val = sum(r[2] for r in valid_time_runs) / len(valid_time_runs)
                 best_time_val = min(r[2] for r in valid_time_runs)
+
+        # Percentiles come from the stored sketches rather than the filtered rows
+        tower_id = self.all_runs[0][14] if self.all_runs else None
+        if self.active_types == set(self.type_labels):
+            time_q = database.get_time_quantiles("tower", [tower_id])
+        else:
+            time_q = database.get_time_quantiles("tower_type", [(tower_id, t) for t in self.active_types])
+        fmt_q = lambda v: f"{v:.2f}s" if v is not None else "-"
+        # Standard deviations from the running per-(tower, type) moments
+        spread = database.get_consistency("tower_type", [(tower_id, t) for t in self.active_types])
             
         self.stats_container.controls = [
              ft.Column([
@@ -412,6 +457,10 @@ class TowerAnalytics(ft.UserControl):
                     ft.Text("Avg Expl", color="grey", size=12),
                     ft.Text(f"{avg_expl_val:.2f}", size=16, weight="bold"),
                 ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                ft.Column([
+                    ft.Text("Expl SD", color="grey", size=12),
+                    ft.Text(_fmt_sd(spread['std_expl']), size=16, weight="bold"),
+                ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
             ], spacing=20),
             
             ft.VerticalDivider(width=20, color="grey"),
@@ -425,103 +474,34 @@ class TowerAnalytics(ft.UserControl):
                     ft.Text("Avg Time", color="grey", size=12),
                     ft.Text(f"{avg_time_val:.2f}s", size=16, weight="bold"),
                 ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                ft.Column([
+                    ft.Text("Median Time", color="grey", size=12),
+                    ft.Text(fmt_q(time_q[0.5]), size=16, weight="bold"),
+                ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                ft.Column([
+                    ft.Text("p90 Time", color="grey", size=12),
+                    ft.Text(fmt_q(time_q[0.9]), size=16, weight="bold"),
+                ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                ft.Column([
+                    ft.Text("Time SD", color="grey", size=12),
+                    ft.Text(_fmt_sd(spread['std_time'], "s"), size=16, weight="bold"),
+                ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
             ], spacing=20),
         ]
 
         # --- CHART LOGIC ---
-        # Sort chronologically for chart
-        chart_data_source = sorted(successes, key=lambda x: x[1])
-        
-        # Extract Y values (Explosives or Time)
-        # FILTER: Ignore 0 explosives to avoid the bug/noise
-        y_values = []
-        if self.chart_mode == "expl":
-            y_values = [r[4] for r in chart_data_source if r[4] > 0]
-            y_title = "Explosives"
-            chart_color = ft.colors.CYAN_400
+        if self.chart_mode == "dist":
+            self._build_dist_chart()
         else:
-            y_values = [r[2] for r in chart_data_source]
-            y_title = "Time (s)"
-            chart_color = ft.colors.PURPLE_400
-
-        # Apply Grouping
-        points = []
-        final_y_values = [] # For Trend Line calculation
-        
-        if self.group_size > 1:
-            for i in range(0, len(y_values), self.group_size):
-                chunk = y_values[i : i + self.group_size]
-                if chunk:
-                    avg = sum(chunk) / len(chunk)
-                    points.append(ft.LineChartDataPoint(x=i, y=avg))
-                    final_y_values.append((i, avg))
-        else:
-            for i, val in enumerate(y_values):
-                points.append(ft.LineChartDataPoint(x=i, y=val))
-                final_y_values.append((i, val))
-
-        data_series = [
-            ft.LineChartData(
-                data_points=points,
-                stroke_width=2,
-                color=chart_color,
-                curved=True,
-                stroke_cap_round=True,
-                below_line_bgcolor=ft.colors.with_opacity(0.1, chart_color),
-            )
-        ]
-
-        # Calculate Trend Line (Linear Regression)
-        if self.show_trend and len(final_y_values) > 1:
-            # simple linear regression: y = mx + b
-            # x values are the index (or grouped index)
-            n = len(final_y_values)
-            sum_x = sum(x for x, y in final_y_values)
-            sum_y = sum(y for x, y in final_y_values)
-            sum_xy = sum(x*y for x, y in final_y_values)
-            sum_xx = sum(x*x for x, y in final_y_values)
-            
-            denominator = (n * sum_xx - sum_x * sum_x)
-            if denominator != 0:
-                m = (n * sum_xy - sum_x * sum_y) / denominator
-                b = (sum_y - m * sum_x) / n
-                
-                # Create line from first X to last X
-                start_x = final_y_values[0][0]
-                end_x = final_y_values[-1][0]
-                
-                trend_points = [
-                    ft.LineChartDataPoint(x=start_x, y=m*start_x + b),
-                    ft.LineChartDataPoint(x=end_x, y=m*end_x + b)
-                ]
-                
-                data_series.append(
-                    ft.LineChartData(
-                        data_points=trend_points,
-                        stroke_width=2,
-                        color=ft.colors.WHITE54,
-                        dash_pattern=[5, 5],
-                        curved=False
-                    )
-                )
-
-        chart = ft.LineChart(
-            data_series=data_series,
-            border=ft.border.all(1, ft.colors.GREY_800),
-            left_axis=ft.ChartAxis(labels_size=30, title=ft.Text(y_title, size=10)),
-            bottom_axis=ft.ChartAxis(title=ft.Text(f"Runs (Grouped by {self.group_size})" if self.group_size > 1 else "Runs", size=10), labels_size=0),
-            tooltip_bgcolor=ft.colors.GREY_800,
-            expand=True
-        )
-        self.chart_container.content = chart
+            self._build_chart(successes, filtered_runs)
 
         # --- LIST LOGIC ---
         # Sort for List View
         sorted_runs = list(filtered_runs)
         if self.detail_sort_option == "Newest":
-            sorted_runs.sort(key=lambda x: (x[1], x[0]), reverse=True)
+            sorted_runs.sort(key=lambda x: (x[16], x[0]), reverse=True)
         elif self.detail_sort_option == "Oldest":
-            sorted_runs.sort(key=lambda x: (x[1], x[0]), reverse=False)
+            sorted_runs.sort(key=lambda x: (x[16], x[0]), reverse=False)
         elif self.detail_sort_option == "Best Expl":
             sorted_runs.sort(key=lambda x: x[4] if x[9] else 999, reverse=False)
         elif self.detail_sort_option == "Best Time":
@@ -572,4 +552,110 @@ class TowerAnalytics(ft.UserControl):
             )
             list_rows.append(row)
         
-        self.list_container.controls = list_rows
\ No newline at end of file
+        self.list_container.controls = list_rows
+
+    def _build_chart(self, successes, attempts):
+        # Sort chronologically for chart
+        chart_data_source = sorted(successes, key=lambda x: x[16])
+        
+        # Extract Y values (Explosives or Time)
+        # FILTER: Ignore 0 explosives to avoid the bug/noise
+        y_values = []
+        if self.chart_mode == "expl":
+            chart_data_source = [r for r in chart_data_source if r[4] > 0]
+            y_values = [r[4] for r in chart_data_source]
+            y_title = "Explosives"
+            chart_color = ft.colors.CYAN_400
+        else:
+            y_values = [r[2] for r in chart_data_source]
+            y_title = "Time (s)"
+            chart_color = ft.colors.PURPLE_400
+
+        # Apply Grouping (x = index, or chunk start when grouped)
+        final_y_values = analytics.group_chunks(y_values, self.group_size)
+
+        # Downsample only what gets drawn (trend line + PBs use the full series)
+        budget = analytics.point_budget(self.page.width if self.page else None)
+        pb_indices = analytics.best_so_far_indices(final_y_values)
+        display_values = analytics.downsample(final_y_values, budget, keep=pb_indices)
+        points = [ft.LineChartDataPoint(x=x, y=y) for x, y in display_values]
+
+        data_series = [
+            ft.LineChartData(
+                data_points=points,
+                stroke_width=2,
+                color=chart_color,
+                curved=True,
+                stroke_cap_round=True,
+                below_line_bgcolor=ft.colors.with_opacity(0.1, chart_color),
+            )
+        ]
+
+        # Calculate Trend Line (Linear Regression)
+        trend = analytics.trend_line(final_y_values) if self.show_trend else None
+        if trend:
+            data_series.append(
+                ft.LineChartData(
+                    data_points=[ft.LineChartDataPoint(x=x, y=y) for x, y in trend],
+                    stroke_width=2,
+                    color=ft.colors.WHITE54,
+                    dash_pattern=[5, 5],
+                    curved=False
+                )
+            )
+
+        # Rolling-window overlay (computed on the ungrouped series)
+        right_axis = None
+        if self.overlay_stat == rolling.RATE:
+            # Success rate over all attempts, scaled onto the value range with its own % axis
+            attempts = sorted(attempts, key=lambda x: x[16])
+            overlay = rolling.rate_series([(r[0], r[9]) for r in attempts], [r[0] for r in chart_data_source], self.overlay_window)
+            lo, hi = rolling.rate_scale(y_values)
+            overlay = rolling.scale_rates(overlay, lo, hi)
+            right_axis = ft.ChartAxis(labels_size=40, labels=[
+                ft.ChartAxisLabel(value=y, label=ft.Text(f"{pct}%", size=10, color=ft.colors.AMBER_400))
+                for y, pct in rolling.rate_ticks(lo, hi)
+            ])
+        else:
+            overlay = rolling.rolling_series(y_values, self.overlay_window, self.overlay_stat)
+        if overlay:
+            overlay = analytics.downsample(overlay, budget)
+            data_series.append(
+                ft.LineChartData(
+                    data_points=[ft.LineChartDataPoint(x=x, y=y) for x, y in overlay],
+                    stroke_width=2,
+                    color=ft.colors.AMBER_400,
+                    curved=True
+                )
+            )
+
+        chart = ft.LineChart(
+            data_series=data_series,
+            border=ft.border.all(1, ft.colors.GREY_800),
+            left_axis=ft.ChartAxis(labels_size=30, title=ft.Text(y_title, size=10)),
+            right_axis=right_axis,
+            bottom_axis=ft.ChartAxis(title=ft.Text(f"Runs (Grouped by {self.group_size})" if self.group_size > 1 else "Runs", size=10), labels_size=0),
+            tooltip_bgcolor=ft.colors.GREY_800,
+            expand=True
+        )
+        self.chart_container.content = chart
+
+    def _build_dist_chart(self):
+        """Histograms from the cached per-tower / per-(tower, type) distributions."""
+        tower_id = self.all_runs[0][14] if self.all_runs else None
+        dists = database.get_distributions()
+        if self.active_types == set(self.type_labels):
+            group = dists["tower"].get(tower_id)
+        else:
+            # Fixed bins add up across the selected types
+            parts = [dists["tower_type"].get((tower_id, t)) for t in self.active_types]
+            parts = [p for p in parts if p]
+            group = {
+                "time": distribution.merge([p["time"] for p in parts]),
+                "expl": distribution.merge([p["expl"] for p in parts]),
+            }
+        group = group or {}
+        self.chart_container.content = dist_chart.build(group.get("time"), group.get("expl"))
+
+def _fmt_sd(value, unit=""):
+    return f"±{value:.1f}{unit}" if value is not None else "-"
@@ -1,4 +1,6 @@
 import json
+import threading
+import weakref
 
 # In-memory DB path (no filesystem in browser)
 DB_PATH = ":memory:"
@@ -21,18 +23,130 @@ DEFAULT_CONFIG = {
     "show_trend": False,
 }
 
+# Seconds to wait for more changes before writing config back to client storage
+CONFIG_WRITE_DELAY = 0.5
+
+STORAGE_KEY = "mcsr_config"
+
+# ===========================
+# PER-PAGE CONFIG CACHE
+# ===========================
+# client_storage is a round trip to the browser, so each page loads its
+# config once and serves reads from memory. Changes are written back after
+# CONFIG_WRITE_DELAY (coalescing bursts) or on flush(), e.g. when the tab is hidden.
+# The cache is keyed weakly by page and only holds a weak reference back to
+# it; subscribers usually close over the page's controls, so the entry is also
+# dropped explicitly when the page closes (discard_config).
+
+class PageConfig:
+    def __init__(self, page):
+        self._page = weakref.ref(page)
+        self._values = None
+        self._pending = False
+        self._timer = None
+        self._lock = threading.Lock()
+        self._subscribers = [] # (keys or None, callback)
+
+    @property
+    def page(self):
+        return self._page()
+
+    def _ensure_loaded(self):
+        if self._values is None:
+            values = dict(DEFAULT_CONFIG)
+            try:
+                raw = self.page.client_storage.get(STORAGE_KEY)
+                if raw:
+                    values.update(json.loads(raw))
+            except:
+                pass
+            self._values = values
+        return self._values
+
+    def get(self, key, default=None):
+        return self._ensure_loaded().get(key, default)
+
+    def as_dict(self):
+        return dict(self._ensure_loaded())
+
+    def update(self, changes):
+        """Apply changes in memory, notify subscribers and schedule a write."""
+        values = self._ensure_loaded()
+        changed = {k: v for k, v in changes.items() if values.get(k) != v}
+        if not changed:
+            return changed
+        with self._lock:
+            values.update(changed)
+            self._pending = True
+            if self._timer is None:
+                self._timer = threading.Timer(CONFIG_WRITE_DELAY, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        for keys, callback in list(self._subscribers):
+            if keys is None or keys & changed.keys():
+                try:
+                    callback(changed)
+                except Exception as e:
+                    print(f"Config subscriber error: {e}")
+        return changed
+
+    def subscribe(self, callback, keys=None):
+        """
+        Call callback(changed_dict) after updates touching any of `keys` (all keys if None).
+        Returns a function that unsubscribes.
+        """
+        entry = (frozenset(keys) if keys is not None else None, callback)
+        self._subscribers.append(entry)
+
+        def unsubscribe():
+            if entry in self._subscribers:
+                self._subscribers.remove(entry)
+        return unsubscribe
+
+    def flush(self):
+        """Write pending changes to client storage now."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return False
+            self._pending = False
+            data = json.dumps(self._values)
+        page = self.page
+        if page is None:
+            return False
+        try:
+            page.client_storage.set(STORAGE_KEY, data)
+            return True
+        except Exception as e:
+            print(f"Config save error: {e}")
+            return False
+
+_page_configs = weakref.WeakKeyDictionary()
+
+def get_config(page):
+    """The PageConfig for this page (created on first use)."""
+    cfg = _page_configs.get(page)
+    if cfg is None:
+        cfg = _page_configs[page] = PageConfig(page)
+    return cfg
+
+def discard_config(page):
+    """Forget a closed page's config: cancel its pending write and drop its subscribers."""
+    cfg = _page_configs.pop(page, None)
+    if cfg is not None:
+        with cfg._lock:
+            if cfg._timer is not None:
+                cfg._timer.cancel()
+                cfg._timer = None
+            cfg._pending = False
+        cfg._subscribers.clear()
+
 def load_config(page):
-    """Load config from browser's localStorage via page.client_storage."""
-    try:
-        raw = page.client_storage.get("mcsr_config")
-        if raw:
-            return {**DEFAULT_CONFIG, **json.loads(raw)}
-    except:
-        pass
-    return dict(DEFAULT_CONFIG)
+    """Current config as a dict (served from the page's cache)."""
+    return get_config(page).as_dict()
 
 def save_config(page, new_config):
-    """Save config to browser's localStorage via page.client_storage."""
-    current = load_config(page)
-    current.update(new_config)
-    page.client_storage.set("mcsr_config", json.dumps(current))
\ No newline at end of file
+    """Merge values into the config; written to localStorage shortly after."""
+    get_config(page).update(new_config)
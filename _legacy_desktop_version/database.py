@@ -1,55 +1,570 @@
+import os
 import sqlite3
+import sys
 import json
+import threading
+import time
+import functools
+import contextvars
+import hashlib
+from contextlib import contextmanager
+from datetime import date, datetime
 
-# Single persistent in-memory connection (no threading in browser)
-_conn = None
+import perf
+# analytics, bloom, distribution, sqltrace and tdigest are imported where
+# they're first needed, so importing database (app startup) stays cheap
+
+# A gap longer than this between runs splits a session into separate play chunks
+SESSION_GAP_SECONDS = 1800
+DAY_SECONDS = 86400
+
+# Set by enable_sql_trace(); while set, _get_conn() returns a timing wrapper
+_tracer = None
+
+# ===========================
+# PER-SESSION DATABASES
+# ===========================
+# The web server hosts every browser session in one process, so each session
+# gets its own in-memory database. The current session is, in order:
+#   1. a key bound with `with database.session(key):` (worker threads),
+#   2. whatever the app's resolver returns (the Flet page running the handler),
+#   3. DEFAULT_SESSION (CLI, scripts).
+# Page databases are only created by init_db(); once closed or evicted, code
+# still bound to the key gets SessionClosedError instead of a fresh empty
+# database (which the persister would then save over the browser's data).
+# DEFAULT_SESSION is created on first use. Every public read and write holds
+# the session's lock for the whole call: the import writer thread shares the
+# connection with UI reads, which must not run inside its open transaction or
+# see half of a batch. Sessions whose page has disconnected are closed oldest-first
+# once all databases exceed the budget, after their close hooks have run.
+
+DEFAULT_SESSION = "default"
+MEMORY_BUDGET_BYTES = int(os.getenv("MCSR_DB_MEMORY_MB", "256")) * 1024 * 1024
+
+class SessionClosedError(RuntimeError):
+    """The bound session's database was closed or evicted (or never initialized)."""
+
+class _SessionDB:
+    def __init__(self, key, conn):
+        self.key = key
+        self.conn = conn
+        self.lock = threading.RLock()
+        # Bumped on every write so derived results (e.g. session active time) can be cached
+        self.generation = 0
+        self.active_time_cache = {}
+        self.distribution_cache = None
+        # Streaming time quantiles; built on first use (see get_time_quantiles)
+        self.sketches = None
+        # Running mean / variance per group; built on first use (see get_consistency)
+        self.moments = None
+        # Fingerprints known to be stored; built on first insert (see _insert_runs)
+        self.bloom = None
+        self.towers = _Dimension("towers")
+        self.run_types = _Dimension("run_types")
+        self.last_used = time.monotonic()
+        self.attached = True
+        # Run before the database is closed or evicted (see add_close_hook)
+        self.close_hooks = []
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_bound_key = contextvars.ContextVar("mcsr_db_session", default=None)
+_session_resolver = None
+
+def set_session_resolver(func):
+    """func() returns the current session key (or None) when nothing is bound explicitly."""
+    global _session_resolver
+    _session_resolver = func
+
+@contextmanager
+def session(key):
+    """Route database calls in this block (and thread) to the given session."""
+    token = _bound_key.set(key)
+    try:
+        yield
+    finally:
+        _bound_key.reset(token)
+
+def current_session_key():
+    key = _bound_key.get()
+    if key is None and _session_resolver is not None:
+        try:
+            key = _session_resolver()
+        except Exception:
+            key = None
+    return key or DEFAULT_SESSION
+
+def _current(create=False):
+    key = current_session_key()
+    db = _sessions.get(key)
+    if db is None:
+        if not create and key != DEFAULT_SESSION:
+            raise SessionClosedError(f"No open database for session {key}")
+        with _sessions_lock:
+            db = _sessions.get(key)
+            if db is None:
+                conn = sqlite3.connect(":memory:", check_same_thread=False)
+                _init_schema(conn)
+                db = _sessions[key] = _SessionDB(key, conn)
+        _evict_detached()
+    db.last_used = time.monotonic()
+    return db
 
 def _get_conn():
-    """Get or create the in-memory SQLite connection."""
-    global _conn
-    if _conn is None:
-        _conn = sqlite3.connect(":memory:", check_same_thread=False)
-        _init_schema(_conn)
-    return _conn
+    """Get or create the current session's in-memory SQLite connection."""
+    conn = _current().conn
+    if _tracer is not None:
+        return _tracer.wrap(conn)
+    return conn
+
+def _serialized(func):
+    """Hold the session's lock for the whole call (transactions span several statements)."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _current().lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+def attach_session(key):
+    """A page (re)connected. Returns False if its database was evicted and needs reloading."""
+    db = _sessions.get(key)
+    if db is None:
+        return False
+    db.attached = True
+    db.last_used = time.monotonic()
+    return True
+
+def detach_session(key):
+    """A page disconnected; its database may be evicted under memory pressure."""
+    db = _sessions.get(key)
+    if db is not None:
+        db.attached = False
+        db.last_used = time.monotonic()
+    _evict_detached()
+
+def add_close_hook(key, func):
+    """Call func() before the session's database is closed or evicted (e.g. flush its pending save)."""
+    db = _sessions.get(key)
+    if db is not None:
+        db.close_hooks.append(func)
+
+def close_session(key):
+    """Drop a session's database (its page is gone for good)."""
+    db = _sessions.get(key)
+    if db is None:
+        return
+    _run_close_hooks(db)
+    with _sessions_lock:
+        if _sessions.get(key) is not db:
+            return
+        _sessions.pop(key)
+    _close(db)
+
+def _run_close_hooks(db):
+    hooks, db.close_hooks = db.close_hooks, []
+    for hook in hooks:
+        try:
+            hook()
+        except Exception as e:
+            print(f"Session close hook error ({db.key}): {e}")
+
+def _close(db):
+    with db.lock:
+        if _tracer is not None:
+            _tracer.forget(db.conn)
+        db.conn.close()
+
+def _db_bytes(conn):
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+def _evict_detached():
+    victims = []
+    with _sessions_lock:
+        sizes = {key: _db_bytes(db.conn) for key, db in _sessions.items()}
+        total = sum(sizes.values())
+        if total <= MEMORY_BUDGET_BYTES:
+            return
+        for db in sorted((d for d in _sessions.values() if not d.attached), key=lambda d: d.last_used):
+            if total <= MEMORY_BUDGET_BYTES:
+                break
+            total -= sizes[db.key]
+            victims.append(db)
+    for db in victims:
+        # Hooks use the database (final save), so it stays registered until they're done
+        _run_close_hooks(db)
+        with _sessions_lock:
+            if _sessions.get(db.key) is not db or db.attached:
+                continue # Closed meanwhile, or its page came back
+            _sessions.pop(db.key)
+        _close(db)
+        print(f"Evicted idle session database {db.key}")
+
+def session_stats():
+    """One dict per open session database (for diagnostics)."""
+    now = time.monotonic()
+    with _sessions_lock:
+        return [
+            {"key": db.key, "attached": db.attached, "bytes": _db_bytes(db.conn),
+             "idle_s": round(now - db.last_used, 1), "generation": db.generation}
+            for db in _sessions.values()
+        ]
+
+def enable_sql_trace(slow_ms=None):
+    """Time every statement and capture query plans of slow ones. Returns the tracer."""
+    import sqltrace
+    global _tracer
+    if slow_ms is None:
+        slow_ms = sqltrace.DEFAULT_SLOW_MS
+    if _tracer is None:
+        _tracer = sqltrace.SqlTracer(slow_ms)
+    _tracer.slow_ms = slow_ms
+    return _tracer
+
+def disable_sql_trace():
+    global _tracer
+    if _tracer is not None:
+        _tracer.detach()
+        _tracer = None
+
+def get_sql_tracer():
+    """The active SqlTracer, or None when tracing is off."""
+    return _tracer
+
+# ===========================
+# SCHEMA
+# ===========================
+# Tower and type names live in small dimension tables; attempts rows carry
+# their integer ids. Times are integers too: `epoch` (see TIMESTAMPS below)
+# and `time_ms`/`bed_ms` in milliseconds. The `runs` view joins the names
+# back in and derives the text timestamp and seconds, so run rows keep the
+# original column order ([1] timestamp, [2] time_sec, [5] tower, [6] type,
+# [8] bed_time) and add the raw values at the end:
+#   [14] tower_id, [15] type_id, [16] epoch, [17] time_ms, [18] bed_ms, [19] instance
+# `instance` names the game instance a run came from when several were
+# imported side by side (None for a single one).
+
+UNKNOWN_ID = 0 # Reserved id of the 'Unknown' tower/type in both tables
+
+RUN_COLUMNS = ["id", "timestamp", "time_sec", "explosives", "total_explosives", "tower", "type", "height", "bed_time", "is_success", "fail_reason", "session_id", "split_tag", "fingerprint", "instance"]
+# Browser-storage snapshot rows: attempts columns, with names instead of ids
+_STORAGE_COLUMNS = ["id", "epoch", "time_ms", "explosives", "total_explosives", "tower", "type", "height", "bed_ms", "is_success", "fail_reason", "session_id", "split_tag", "fingerprint", "instance"]
+
+_DIMENSION_SCHEMA = '''CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+)'''
+
+_ATTEMPTS_SCHEMA = '''CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    epoch INTEGER,
+    time_ms INTEGER,
+    explosives TEXT,
+    total_explosives INTEGER,
+    tower_id INTEGER REFERENCES towers(id),
+    type_id INTEGER REFERENCES run_types(id),
+    height INTEGER,
+    bed_ms INTEGER,
+    is_success INTEGER, 
+    fail_reason TEXT,
+    session_id TEXT,
+    split_tag TEXT,
+    fingerprint INTEGER UNIQUE,
+    instance TEXT
+)'''
+
+# One row per calendar day (`day` = epoch of its midnight), kept current by
+# every insert so calendar views read one row per day instead of every run.
+# Active time uses the session rule (SESSION_GAP_SECONDS) within the day; the
+# day's last play chunk and latest run start are kept so new runs can extend it.
+_DAILY_ROLLUP_SCHEMA = '''CREATE TABLE IF NOT EXISTS daily_rollup (
+    day INTEGER PRIMARY KEY,
+    runs INTEGER NOT NULL,
+    successes INTEGER NOT NULL,
+    best_time_ms INTEGER,
+    best_expl INTEGER,
+    active_ms INTEGER NOT NULL,
+    chunk_start_ms INTEGER,
+    chunk_end_ms INTEGER,
+    last_start_ms INTEGER
+)'''
+
+_RUNS_VIEW = '''CREATE VIEW IF NOT EXISTS runs AS
+    SELECT a.id, datetime(a.epoch, 'unixepoch') AS timestamp, a.time_ms / 1000.0 AS time_sec,
+           a.explosives, a.total_explosives, t.name AS tower, rt.name AS type, a.height,
+           a.bed_ms / 1000.0 AS bed_time, a.is_success, a.fail_reason, a.session_id, a.split_tag,
+           a.fingerprint, a.tower_id, a.type_id, a.epoch, a.time_ms, a.bed_ms, a.instance
+    FROM attempts a
+    LEFT JOIN towers t ON t.id = a.tower_id
+    LEFT JOIN run_types rt ON rt.id = a.type_id'''
 
 def _init_schema(conn):
-    """Create the attempts table if it doesn't exist."""
+    """Create the tables and the runs view if they don't exist, migrating older layouts."""
     with conn:
-        conn.execute('''CREATE TABLE IF NOT EXISTS attempts (
-            id INTEGER PRIMARY KEY,
-            timestamp TEXT,
-            time_sec REAL,
-            explosives TEXT,
-            total_explosives INTEGER,
-            tower TEXT,
-            type TEXT,
-            height INTEGER,
-            bed_time REAL,
-            is_success INTEGER, 
-            fail_reason TEXT,
-            session_id TEXT,
-            split_tag TEXT,
-            fingerprint TEXT UNIQUE
-        )''')
-
-def init_db():
-    """Initialize the database (creates table in memory)."""
-    _get_conn()
+        for table in ("towers", "run_types"):
+            conn.execute(_DIMENSION_SCHEMA.format(table=table))
+            conn.execute(f"INSERT OR IGNORE INTO {table} (id, name) VALUES (?, 'Unknown')", (UNKNOWN_ID,))
+        conn.execute(_ATTEMPTS_SCHEMA)
+    _migrate_attempts(conn)
+    with conn:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_attempts_tower ON attempts (tower_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_attempts_epoch ON attempts (epoch)")
+        conn.execute(_RUNS_VIEW)
+        # Rollups from before the chunk columns are rebuilt below
+        rollup_columns = {row[1] for row in conn.execute("PRAGMA table_info(daily_rollup)")}
+        if rollup_columns and "last_start_ms" not in rollup_columns:
+            conn.execute("DROP TABLE daily_rollup")
+        conn.execute(_DAILY_ROLLUP_SCHEMA)
+        # Databases from before the rollup table
+        if conn.execute("SELECT 1 FROM daily_rollup LIMIT 1").fetchone() is None:
+            _refresh_rollup(conn)
+
+def _migrate_attempts(conn):
+    """
+    Rebuild attempts tables from older layouts: text timestamps and seconds,
+    tower/type text columns, or text fingerprints (hashed here).
+    Tables from before instances just gain the column.
+    """
+    columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(attempts)")}
+    if "instance" not in columns:
+        with conn:
+            conn.execute("ALTER TABLE attempts ADD COLUMN instance TEXT")
+            conn.execute("DROP VIEW IF EXISTS runs")
+        columns["instance"] = "TEXT"
+    text_fingerprints = columns.get("fingerprint", "").upper() == "TEXT"
+    text_times = "timestamp" in columns
+    text_dimensions = "tower" in columns
+    if not (text_fingerprints or text_times or text_dimensions):
+        return
+    conn.create_function("fingerprint64", 1, _hash_key, deterministic=True)
+    if text_times:
+        epoch = "CAST(strftime('%s', o.timestamp) AS INTEGER)"
+        time_ms = "CAST(ROUND(o.time_sec * 1000) AS INTEGER)"
+        bed_ms = "CAST(ROUND(o.bed_time * 1000) AS INTEGER)"
+    else:
+        epoch, time_ms, bed_ms = "o.epoch", "o.time_ms", "o.bed_ms"
+    tower_id, type_id = ("t.id", "rt.id") if text_dimensions else ("o.tower_id", "o.type_id")
+    fingerprint = "fingerprint64(o.fingerprint)" if text_fingerprints else "o.fingerprint"
+    with conn:
+        # Columns can't change type in place, so rebuild the table
+        conn.execute("DROP VIEW IF EXISTS runs")
+        conn.execute("DROP INDEX IF EXISTS idx_attempts_tower")
+        conn.execute("DROP INDEX IF EXISTS idx_attempts_epoch")
+        conn.execute("ALTER TABLE attempts RENAME TO attempts_old")
+        joins = ""
+        if text_dimensions:
+            conn.execute("INSERT OR IGNORE INTO towers (name) SELECT DISTINCT tower FROM attempts_old WHERE tower IS NOT NULL")
+            conn.execute("INSERT OR IGNORE INTO run_types (name) SELECT DISTINCT type FROM attempts_old WHERE type IS NOT NULL")
+            joins = "LEFT JOIN towers t ON t.name = o.tower LEFT JOIN run_types rt ON rt.name = o.type"
+        conn.execute(_ATTEMPTS_SCHEMA)
+        conn.execute(f'''
+            INSERT INTO attempts
+            SELECT o.id, {epoch}, {time_ms}, o.explosives, o.total_explosives, {tower_id}, {type_id}, o.height,
+                   {bed_ms}, o.is_success, o.fail_reason, o.session_id, o.split_tag, {fingerprint}, o.instance
+            FROM attempts_old o {joins}
+        ''')
+        conn.execute("DROP TABLE attempts_old")
+    # stderr: the CLI prints JSON on stdout
+    print("Migrated runs to the integer time/tower/type layout.", file=sys.stderr)
+
+class _Dimension:
+    """In-memory mirror of one dimension table: name <-> id, loaded on first use."""
+    def __init__(self, table):
+        self.table = table
+        self.ids = None
+        self.names = None
+
+    def _load(self, conn):
+        rows = conn.execute(f"SELECT id, name FROM {self.table}").fetchall()
+        self.names = dict(rows)
+        self.ids = {name: i for i, name in rows}
+
+    def intern(self, conn, name):
+        """Id for a name, adding it to the table if new (call inside a write transaction)."""
+        if name is None:
+            return None
+        if self.ids is None:
+            self._load(conn)
+        dim_id = self.ids.get(name)
+        if dim_id is None:
+            conn.execute(f"INSERT OR IGNORE INTO {self.table} (name) VALUES (?)", (name,))
+            dim_id = conn.execute(f"SELECT id FROM {self.table} WHERE name = ?", (name,)).fetchone()[0]
+            self.ids[name] = dim_id
+            self.names[dim_id] = name
+        return dim_id
+
+    def lookup(self, conn, name):
+        """Id for a name, or None if no run has used it."""
+        if self.ids is None:
+            self._load(conn)
+        return self.ids.get(name)
+
+    def name(self, conn, dim_id):
+        if self.names is None or (dim_id is not None and dim_id not in self.names):
+            self._load(conn)
+        return self.names.get(dim_id)
+
+    def reset(self):
+        self.ids = None
+        self.names = None
+
+# ===========================
+# TIMESTAMPS
+# ===========================
+# Log lines carry local wall-clock times without a zone, so `epoch` counts
+# seconds from 1970-01-01 00:00:00 as if that wall clock were UTC. SQLite's
+# datetime(epoch, 'unixepoch') then gives back exactly the text the app used
+# to store, and differences are plain integer subtraction.
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def day_epoch(day):
+    """Epoch of midnight at the start of a date (or datetime's date)."""
+    return (day.toordinal() - _EPOCH_ORDINAL) * 86400
+
+def parse_timestamp(text):
+    """'YYYY-MM-DD HH:MM:SS' (or just the date) -> epoch, or None."""
+    try:
+        dt = datetime.fromisoformat(text)
+    except (TypeError, ValueError):
+        return None
+    return day_epoch(dt) + dt.hour * 3600 + dt.minute * 60 + dt.second
+
+def to_epoch(value):
+    """Epoch from an epoch, date, datetime or timestamp text; None stays None."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime):
+        return day_epoch(value) + value.hour * 3600 + value.minute * 60 + value.second
+    if isinstance(value, date):
+        return day_epoch(value)
+    epoch = parse_timestamp(value)
+    if epoch is None:
+        raise ValueError(f"Not a date or timestamp: {value!r}")
+    return epoch
+
+def format_timestamp(epoch, fmt=TIMESTAMP_FORMAT):
+    if epoch is None:
+        return ""
+    return time.strftime(fmt, time.gmtime(epoch))
+
+def to_ms(seconds):
+    return None if seconds is None else round(float(seconds) * 1000)
+
+def _run_times(data):
+    """(epoch, time_ms, bed_ms) of a run dict, from the parser's integers or legacy text/seconds keys."""
+    epoch = data.get('epoch')
+    if epoch is None:
+        epoch = parse_timestamp(data.get('timestamp'))
+    time_ms = data['time_ms'] if 'time_ms' in data else to_ms(data.get('time', 0))
+    bed_ms = data['bed_ms'] if 'bed_ms' in data else to_ms(data.get('bed_time'))
+    return epoch, time_ms, bed_ms
+
+# ===========================
+# FINGERPRINTS + DEDUP
+# ===========================
+# A run is identified by "<session>_<timestamp>_<time>", stored as a signed
+# 64-bit hash of that text (fits SQLite's INTEGER). Inserts consult a
+# per-session bloom filter first: fingerprints it has never seen skip the
+# index lookup, the rest are checked in one IN (...) query per chunk.
+
+LOOKUP_CHUNK = 500 # Fingerprints per IN (...) lookup
+
+def _hash_key(key):
+    if key is None:
+        return None
+    digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+def run_fingerprint(data):
+    """64-bit dedup key of a run dict (as produced by the parser)."""
+    # Same key text as when runs carried text timestamps and float seconds,
+    # so existing rows and backups still dedup
+    timestamp = data.get('timestamp') or format_timestamp(data['epoch'])
+    time_ms = data.get('time_ms')
+    run_time = time_ms / 1000 if time_ms is not None else data.get('time', 0)
+    return _hash_key(f"{data.get('session_id', 'live')}_{timestamp}_{run_time}")
+
+def _get_bloom(conn, db, incoming):
+    """The session's filter, (re)built with room for `incoming` more keys."""
+    # Past capacity the false-positive rate climbs, so rebuild bigger
+    if db.bloom is None or not db.bloom.has_room(incoming):
+        import bloom
+        count = conn.execute("SELECT COUNT(*) FROM attempts").fetchone()[0]
+        db.bloom = bloom.BloomFilter(capacity=2 * (count + incoming))
+        for (fp,) in conn.execute("SELECT fingerprint FROM attempts WHERE fingerprint IS NOT NULL"):
+            db.bloom.add(fp)
+    return db.bloom
+
+@perf.timed()
+def init_db(path=None):
+    """
+    Initialize the current session's database (creates table in memory).
+    path: optional SQLite file to use instead (e.g. for the headless CLI).
+    Tracing starts here if MCSR_SQL_TRACE is set (its value, if numeric, is the slow threshold in ms).
+    """
+    trace_env = os.getenv("MCSR_SQL_TRACE")
+    if trace_env and _tracer is None:
+        try:
+            enable_sql_trace(float(trace_env))
+        except ValueError:
+            enable_sql_trace()
+    # The one place a page's database is created
+    db = _current(create=True)
+    with db.lock:
+        if path is not None and path != ":memory:":
+            if _tracer is not None:
+                _tracer.forget(db.conn)
+            db.conn.close()
+            db.conn = sqlite3.connect(path, check_same_thread=False)
+            _init_schema(db.conn)
+            db.bloom = None
+            db.sketches = None
+            db.moments = None
+            db.towers.reset()
+            db.run_types.reset()
+            _bump_generation()
+
+def get_generation():
+    """Counter that changes whenever the current session's stored runs change."""
+    return _current().generation
+
+def _bump_generation():
+    _current().generation += 1
 
 # ===========================
 # PERSISTENCE (Browser Storage)
 # ===========================
 
+@perf.timed()
+@_serialized
 def save_to_storage(page):
-    """Serialize all rows to JSON and save to browser storage."""
+    """
+    Serialize all rows to JSON and save to browser storage. Returns bytes written.
+    The app calls this through persistence.PersistScheduler rather than directly.
+    """
     try:
         conn = _get_conn()
-        rows = conn.execute("SELECT * FROM attempts").fetchall()
+        # Names rather than ids, so snapshots don't depend on the dimension tables
+        rows = conn.execute(f"SELECT {', '.join(_STORAGE_COLUMNS)} FROM runs").fetchall()
         data = json.dumps(rows)
         page.client_storage.set("mcsr_db", data)
+        written = len(data.encode("utf-8"))
+        sketches = _sketches_to_storage(conn, _current(), len(rows))
+        if sketches is not None:
+            page.client_storage.set("mcsr_sketches", sketches)
+            written += len(sketches.encode("utf-8"))
+        return written
     except Exception as e:
         print(f"Save to storage error: {e}")
+        return 0
 
+@perf.timed()
+@_serialized
 def load_from_storage(page):
     """Load data from browser storage into in-memory SQLite."""
     try:
@@ -57,19 +572,40 @@ def load_from_storage(page):
         if raw:
             rows = json.loads(raw)
             conn = _get_conn()
+            db = _current()
             with conn:
                 for row in rows:
+                    # Saved before 64-bit fingerprints: hash the key text
+                    if isinstance(row[13], str):
+                        row[13] = _hash_key(row[13])
+                    # Saved before integer times: text timestamp, seconds
+                    if isinstance(row[1], str):
+                        row[1] = parse_timestamp(row[1])
+                        row[2] = to_ms(row[2])
+                        row[8] = to_ms(row[8])
+                    # Saved before instances
+                    if len(row) < len(_STORAGE_COLUMNS):
+                        row.append(None)
+                    row[5] = db.towers.intern(conn, row[5])
+                    row[6] = db.run_types.intern(conn, row[6])
                     try:
                         conn.execute(
-                            "INSERT OR IGNORE INTO attempts VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                            "INSERT OR IGNORE INTO attempts VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
                             tuple(row)
                         )
                     except Exception:
                         pass
+                _refresh_rollup(conn)
+                db.sketches = _sketches_from_storage(conn, db, page.client_storage.get("mcsr_sketches"))
+            db.bloom = None
+            db.moments = None
+            _bump_generation()
             print(f"Loaded {len(rows)} rows from browser storage.")
     except Exception as e:
         print(f"Load from storage error: {e}")
 
+@perf.timed()
+@_serialized
 def get_row_count():
     """Get the total number of rows in the database."""
     conn = _get_conn()
@@ -80,40 +616,42 @@ def get_row_count():
 # EXPORT / IMPORT (User-facing backup)
 # ===========================
 
+@perf.timed()
+@_serialized
 def export_json():
     """Return all data as a JSON string for user download."""
     conn = _get_conn()
     # Explicitly select columns to ensure stable order
-    cols = ["id", "timestamp", "time_sec", "explosives", "total_explosives", "tower", "type", "height", "bed_time", "is_success", "fail_reason", "session_id", "split_tag", "fingerprint"]
-    query = f"SELECT {', '.join(cols)} FROM attempts ORDER BY timestamp ASC, id ASC"
+    query = f"SELECT {', '.join(RUN_COLUMNS)} FROM runs ORDER BY epoch ASC, id ASC"
     rows = conn.execute(query).fetchall()
-    return json.dumps([dict(zip(cols, row)) for row in rows], indent=2)
+    return json.dumps([dict(zip(RUN_COLUMNS, row)) for row in rows], indent=2)
 
+@perf.timed()
+@_serialized
 def import_json(data_str):
     """Import data from a JSON backup string. Maps compatible keys."""
     try:
         records = json.loads(data_str)
         conn = _get_conn()
-        count = 0
+        runs = []
+        for rec in records:
+            # Map column names to save_run expected keys
+            runs.append({
+                'timestamp': rec.get('timestamp'),
+                'time': rec.get('time_sec') if 'time_sec' in rec else rec.get('time', 0),
+                'expl': rec.get('explosives') if 'explosives' in rec else rec.get('expl', '?'),
+                'tower': rec.get('tower', 'Unknown'),
+                'type': rec.get('type') if 'type' in rec else rec.get('run_type', 'Unknown'),
+                'height': rec.get('height', 0),
+                'bed_time': rec.get('bed_time'),
+                'is_success': bool(rec.get('is_success', False)),
+                'fail_reason': rec.get('fail_reason'),
+                'session_id': rec.get('session_id'),
+                'split_tag': rec.get('split_tag'),
+                'instance': rec.get('instance')
+            })
         with conn:
-            for rec in records:
-                # Map column names to save_run expected keys
-                mapped_data = {
-                    'timestamp': rec.get('timestamp'),
-                    'time': rec.get('time_sec') if 'time_sec' in rec else rec.get('time', 0),
-                    'expl': rec.get('explosives') if 'explosives' in rec else rec.get('expl', '?'),
-                    'tower': rec.get('tower', 'Unknown'),
-                    'type': rec.get('type') if 'type' in rec else rec.get('run_type', 'Unknown'),
-                    'height': rec.get('height', 0),
-                    'bed_time': rec.get('bed_time'),
-                    'is_success': bool(rec.get('is_success', False)),
-                    'fail_reason': rec.get('fail_reason'),
-                    'session_id': rec.get('session_id'),
-                    'split_tag': rec.get('split_tag')
-                }
-                if _save_run_internal(conn, mapped_data):
-                    count += 1
-        return count
+            return _insert_runs(conn, runs)
     except Exception as e:
         print(f"Import JSON error: {e}")
         return 0
@@ -122,14 +660,24 @@ def import_json(data_str):
 # CORE DATA OPERATIONS
 # ===========================
 
+@perf.timed()
+@_serialized
 def save_run(data):
     """Saves a run with transaction handling."""
     conn = _get_conn()
     with conn:
-        return _save_run_internal(conn, data)
+        return _insert_runs(conn, [data]) > 0
+
+@perf.timed()
+@_serialized
+def save_runs(runs):
+    """Saves many runs in a single transaction. Returns how many were new."""
+    conn = _get_conn()
+    with conn:
+        return _insert_runs(conn, runs)
 
-def _save_run_internal(conn, data):
-    """Internal save helper that assumes an active transaction."""
+def _run_row(data, fingerprint, tower_id, type_id):
+    """Column values (without id) for a parsed run dict."""
     # 1. Calculate Total Explosives
     expl_str = data.get('expl', '?')
     total_expl = 0
@@ -142,80 +690,164 @@ def _save_run_internal(conn, data):
                 total_expl = int(expl_str)
         except:
             total_expl = 0
-            
-    # 2. Construct Fingerprint
-    fingerprint = f"{data.get('session_id', 'live')}_{data['timestamp']}_{data.get('time', 0)}"
+
+    epoch, time_ms, bed_ms = _run_times(data)
+    return (
+        epoch,
+        time_ms,
+        expl_str,
+        total_expl,
+        tower_id,
+        type_id,
+        data.get('height', 0), 
+        bed_ms,
+        1 if data.get('is_success', False) else 0,
+        data.get('fail_reason', data.get('raw_fail_reason', None)),
+        data.get('session_id'),
+        data.get('split_tag'),
+        fingerprint,
+        data.get('instance')
+    )
+
+def _insert_runs(conn, runs):
+    """Insert the runs that aren't stored yet (assumes an active transaction). Returns how many were new."""
+    db = _current()
+    known = _get_bloom(conn, db, len(runs))
+
+    # First occurrence wins within the batch, as with one-by-one saves
+    pending = {}
+    for data in runs:
+        pending.setdefault(run_fingerprint(data), data)
+
+    # Only fingerprints the filter may have seen need the index
+    maybe = [fp for fp in pending if known.might_contain(fp)]
+    for i in range(0, len(maybe), LOOKUP_CHUNK):
+        chunk = maybe[i:i + LOOKUP_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        for (fp,) in conn.execute(f"SELECT fingerprint FROM attempts WHERE fingerprint IN ({placeholders})", chunk):
+            del pending[fp]
+    if not pending:
+        return 0
+    towers, run_types = db.towers, db.run_types
+    tower_ids = {}
+    type_ids = {}
+    rows = []
+    for fp, data in pending.items():
+        tower = data.get('tower', 'Unknown')
+        tower_id = tower_ids.get(tower)
+        if tower_id is None:
+            tower_id = tower_ids[tower] = towers.intern(conn, tower)
+        run_type = data.get('type', 'Unknown')
+        type_id = type_ids.get(run_type)
+        if type_id is None:
+            type_id = type_ids[run_type] = run_types.intern(conn, run_type)
+        rows.append(_run_row(data, fp, tower_id, type_id))
 
     try:
-        # Prevent duplicates
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM attempts WHERE fingerprint = ?", (fingerprint,))
-        if cursor.fetchone():
-            return False 
-
-        cursor.execute('''
-            INSERT INTO attempts (
-                timestamp, time_sec, explosives, total_explosives,
-                tower, type, height, bed_time, 
-                is_success, fail_reason, session_id, split_tag, fingerprint
+        cursor = conn.executemany('''
+            INSERT OR IGNORE INTO attempts (
+                epoch, time_ms, explosives, total_explosives,
+                tower_id, type_id, height, bed_ms, 
+                is_success, fail_reason, session_id, split_tag, fingerprint, instance
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data['timestamp'], 
-            data.get('time', 0), 
-            expl_str,
-            total_expl,
-            data.get('tower', 'Unknown'), 
-            data.get('type', 'Unknown'), 
-            data.get('height', 0), 
-            data.get('bed_time'),
-            1 if data.get('is_success', False) else 0,
-            data.get('fail_reason', data.get('raw_fail_reason', None)),
-            data.get('session_id'),
-            data.get('split_tag'),
-            fingerprint
-        ))
-        
-        return True
-    except sqlite3.IntegrityError:
-        return False
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
     except Exception as e:
         print(f"DB Error: {e}")
-        return False
+        # Names interned above may be rolled back with the transaction
+        towers.reset()
+        run_types.reset()
+        return 0
+
+    _add_to_rollup(conn, [(row[0], row[1], row[8], row[3]) for row in rows])
+    if db.sketches is not None:
+        _merge_sketches(db.sketches, _build_sketches(
+            (row[4], row[5], row[6], row[1]) for row in rows if row[8]
+        ))
+    if db.moments is not None:
+        _add_moments(db.moments, (
+            (row[4], row[5], row[6], row[10], row[11], row[1], row[3]) for row in rows if row[8]
+        ))
+    for fp in pending:
+        known.add(fp)
+    _bump_generation()
+    return max(cursor.rowcount, 0)
 
 # ===========================
 # QUERY FUNCTIONS (unchanged API)
 # ===========================
 
+@perf.timed()
+@_serialized
 def get_recent_runs(limit=100):
     conn = _get_conn()
-    # Order by timestamp first for chronological accuracy
-    runs = conn.execute(f"SELECT * FROM attempts ORDER BY timestamp DESC, id DESC LIMIT {limit}").fetchall()
+    # Order by time first for chronological accuracy
+    runs = conn.execute(f"SELECT * FROM runs ORDER BY epoch DESC, id DESC LIMIT {limit}").fetchall()
     return runs
 
+@perf.timed()
+@_serialized
 def get_tower_stats():
     conn = _get_conn()
+    towers = _current().towers
     rows = conn.execute('''
-        SELECT tower, MIN(time_sec), COUNT(*) 
+        SELECT tower_id, MIN(time_ms) / 1000.0, COUNT(*) 
         FROM attempts 
-        WHERE is_success = 1 AND tower IS NOT NULL AND tower != 'Unknown'
-        GROUP BY tower 
+        WHERE is_success = 1 AND tower_id > 0
+        GROUP BY tower_id 
         ORDER BY COUNT(*) DESC
     ''').fetchall()
-    return rows
+    return [(towers.name(conn, r[0]),) + r[1:] for r in rows]
+
+@perf.timed()
+@_serialized
+def get_tower_summary():
+    """
+    Per-tower aggregates of successful runs, as shown on the tower grid.
+    Returns {tower: {'total', 'avg_expl', 'avg_time', 'best_expl', 'best_time', 'std_expl', 'std_time'}}.
+    Times of 0 (missing) are excluded from the time stats; std is None below two runs.
+    """
+    conn = _get_conn()
+    towers = _current().towers
+    moments = _get_moments(conn, _current())["tower"]
+    rows = conn.execute('''
+        SELECT tower_id, COUNT(*), AVG(total_explosives),
+               AVG(CASE WHEN time_ms > 0 THEN time_ms END) / 1000.0,
+               MIN(total_explosives),
+               MIN(CASE WHEN time_ms > 0 THEN time_ms END) / 1000.0
+        FROM attempts
+        WHERE is_success = 1 AND tower_id > 0
+        GROUP BY tower_id
+    ''').fetchall()
+    return {
+        towers.name(conn, r[0]): {
+            'total': r[1], 'avg_expl': r[2] or 0, 'avg_time': r[3] or 0,
+            'best_expl': r[4], 'best_time': r[5] or 0,
+            **_spread(moments.get(r[0]))
+        }
+        for r in rows
+    }
 
+@perf.timed()
+@_serialized
 def get_runs_by_tower(tower_name):
     conn = _get_conn()
-    rows = conn.execute("SELECT * FROM attempts WHERE tower = ? ORDER BY timestamp ASC", (tower_name,)).fetchall()
+    tower_id = _current().towers.lookup(conn, tower_name)
+    if tower_id is None:
+        return []
+    rows = conn.execute("SELECT * FROM runs WHERE tower_id = ? ORDER BY epoch ASC", (tower_id,)).fetchall()
     return rows
 
+@perf.timed()
+@_serialized
 def get_pbs_map():
+    """Best total explosives per (tower_id, type_id), i.e. keyed like (run[14], run[15])."""
     conn = _get_conn()
     rows = conn.execute('''
-        SELECT tower, type, MIN(total_explosives)
+        SELECT tower_id, type_id, MIN(total_explosives)
         FROM attempts
-        WHERE is_success = 1 AND tower != 'Unknown'
-        GROUP BY tower, type
+        WHERE is_success = 1 AND tower_id > 0
+        GROUP BY tower_id, type_id
     ''').fetchall()
     
     pb_map = {}
@@ -225,12 +857,15 @@ def get_pbs_map():
 
 # --- SESSION FUNCTIONS ---
 
+@perf.timed()
+@_serialized
 def get_session_index():
     conn = _get_conn()
     
     # 1. Log Files (No filter - we want to see all logs)
     files = conn.execute('''
-        SELECT session_id, MIN(timestamp), MAX(timestamp), COUNT(*), SUM(is_success)
+        SELECT session_id, datetime(MIN(epoch), 'unixepoch'), datetime(MAX(epoch), 'unixepoch'),
+               COUNT(*), SUM(is_success), MAX(epoch) - MIN(epoch)
         FROM attempts 
         WHERE session_id IS NOT NULL 
         GROUP BY session_id
@@ -238,28 +873,36 @@ def get_session_index():
     
     # 2. Splits (Must have at least 1 success to be valid)
     splits = conn.execute('''
-        SELECT split_tag, MIN(timestamp), MAX(timestamp), COUNT(*), SUM(is_success)
+        SELECT split_tag, datetime(MIN(epoch), 'unixepoch'), datetime(MAX(epoch), 'unixepoch'),
+               COUNT(*), SUM(is_success), MAX(epoch) - MIN(epoch)
         FROM attempts 
         WHERE split_tag IS NOT NULL 
         GROUP BY split_tag
         HAVING SUM(is_success) > 0
     ''').fetchall()
     
+    file_times = get_session_active_times('file')
+    split_times = get_session_active_times('split')
+
     results = []
     for row in files:
         results.append({
             'id': row[0], 'type': 'file', 'start_time': row[1], 
-            'end_time': row[2], 'count': row[3], 'success_count': row[4] or 0
+            'end_time': row[2], 'count': row[3], 'success_count': row[4] or 0,
+            'duration': row[5] or 0, 'active_time': file_times.get(row[0], 0)
         })
     for row in splits:
         results.append({
             'id': row[0], 'type': 'split', 'start_time': row[1], 
-            'end_time': row[2], 'count': row[3], 'success_count': row[4] or 0
+            'end_time': row[2], 'count': row[3], 'success_count': row[4] or 0,
+            'duration': row[5] or 0, 'active_time': split_times.get(row[0], 0)
         })
         
     results.sort(key=lambda x: x['start_time'], reverse=True)
     return results
 
+@perf.timed()
+@_serialized
 def get_runs_by_session(session_id, session_type):
     """
     Fetches all runs for a specific session ID or Split Tag.
@@ -267,17 +910,276 @@ def get_runs_by_session(session_id, session_type):
     conn = _get_conn()
     
     if session_type == 'file':
-        runs = conn.execute("SELECT * FROM attempts WHERE session_id = ? ORDER BY timestamp DESC", (session_id,)).fetchall()
+        runs = conn.execute("SELECT * FROM runs WHERE session_id = ? ORDER BY epoch DESC", (session_id,)).fetchall()
     else:
-        runs = conn.execute("SELECT * FROM attempts WHERE split_tag = ? ORDER BY timestamp DESC", (session_id,)).fetchall()
+        runs = conn.execute("SELECT * FROM runs WHERE split_tag = ? ORDER BY epoch DESC", (session_id,)).fetchall()
         
     return runs
 
+@perf.timed()
+@_serialized
+def get_session_active_times(session_type, hide_world_loads=False):
+    """
+    Active play time (seconds) for every session of a type, as {id: seconds}.
+    Runs are merged into play chunks, splitting wherever the next run starts
+    more than SESSION_GAP_SECONDS after everything before it has ended.
+    Computed in one SQL pass and cached until the data changes.
+    """
+    cache_key = (session_type, hide_world_loads)
+    db = _current()
+    cached = db.active_time_cache.get(cache_key)
+    if cached and cached[0] == db.generation:
+        return cached[1]
+
+    key_col = "session_id" if session_type == 'file' else "split_tag"
+    wl_filter = "AND (fail_reason IS NULL OR fail_reason != 'World Load')" if hide_world_loads else ""
+
+    conn = _get_conn()
+    rows = conn.execute(f'''
+        WITH spans AS (
+            SELECT {key_col} AS sid,
+                   epoch AS start_s,
+                   epoch + time_ms / 1000.0 AS end_s
+            FROM attempts
+            WHERE {key_col} IS NOT NULL {wl_filter}
+        ),
+        ordered AS (
+            SELECT sid, start_s, end_s,
+                   MAX(end_s) OVER (
+                       PARTITION BY sid ORDER BY start_s, end_s
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                   ) AS prev_end
+            FROM spans
+        ),
+        chunked AS (
+            SELECT sid, start_s, end_s,
+                   SUM(CASE WHEN prev_end IS NULL OR start_s - prev_end > ? THEN 1 ELSE 0 END) OVER (
+                       PARTITION BY sid ORDER BY start_s, end_s ROWS UNBOUNDED PRECEDING
+                   ) AS chunk
+            FROM ordered
+        )
+        SELECT sid, SUM(chunk_len) FROM (
+            SELECT sid, MAX(end_s) - MIN(start_s) AS chunk_len
+            FROM chunked
+            GROUP BY sid, chunk
+        )
+        GROUP BY sid
+    ''', (SESSION_GAP_SECONDS,)).fetchall()
+
+    result = {r[0]: r[1] or 0 for r in rows}
+    db.active_time_cache[cache_key] = (db.generation, result)
+    return result
+
+@perf.timed()
+@_serialized
+def get_session_active_time(session_id, session_type, hide_world_loads=False):
+    return get_session_active_times(session_type, hide_world_loads).get(session_id, 0)
+
+# --- DATE RANGES + CALENDAR ---
+
+@perf.timed()
+@_serialized
+def get_runs_between(start=None, end=None, filters=None):
+    """
+    Runs with start <= time < end, oldest first (same row layout as the other run queries).
+    start/end: epoch, date, datetime or 'YYYY-MM-DD[ HH:MM:SS]'; None leaves that side open.
+    filters: optional {'tower', 'type', 'is_success', 'height', 'session_id', 'split_tag', 'instance'}.
+    """
+    conn = _get_conn()
+    db = _current()
+    clauses = []
+    params = []
+    lo, hi = to_epoch(start), to_epoch(end)
+    if lo is not None:
+        clauses.append("epoch >= ?")
+        params.append(lo)
+    if hi is not None:
+        clauses.append("epoch < ?")
+        params.append(hi)
+    for key, value in (filters or {}).items():
+        if key in ("tower", "type"):
+            dim = db.towers if key == "tower" else db.run_types
+            value = dim.lookup(conn, value)
+            if value is None:
+                return []
+            clauses.append(f"{key}_id = ?")
+        elif key == "is_success":
+            value = 1 if value else 0
+            clauses.append("is_success = ?")
+        elif key in ("height", "session_id", "split_tag", "instance"):
+            clauses.append(f"{key} = ?")
+        else:
+            raise ValueError(f"Unknown filter: {key}")
+        params.append(value)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return conn.execute(f"SELECT * FROM runs {where} ORDER BY epoch ASC, id ASC", params).fetchall()
+
+def _refresh_rollup(conn, days=None):
+    """
+    Recompute daily_rollup from attempts for a set of day epochs, or every day
+    if None (inside a write transaction). Inserts use _add_to_rollup instead;
+    this is for bulk loads and deletes.
+    """
+    totals = {}
+    if days is None:
+        conn.execute("DELETE FROM daily_rollup")
+        _fold_days(totals, conn.execute(
+            "SELECT epoch, time_ms, is_success, total_explosives FROM attempts "
+            "WHERE epoch IS NOT NULL ORDER BY epoch, time_ms"
+        ))
+    else:
+        for day in sorted(days):
+            # Days left without runs lose their row
+            conn.execute("DELETE FROM daily_rollup WHERE day = ?", (day,))
+            _fold_days(totals, conn.execute(
+                "SELECT epoch, time_ms, is_success, total_explosives FROM attempts "
+                "WHERE epoch >= ? AND epoch < ? ORDER BY epoch, time_ms",
+                (day, day + DAY_SECONDS)
+            ))
+    conn.executemany(_ROLLUP_UPSERT, _rollup_rows(totals))
+
+def _add_to_rollup(conn, rows):
+    """
+    Add newly inserted (epoch, time_ms, is_success, total_expl) rows to their
+    days as deltas. Active time merges runs in time order, so a day is only
+    recomputed from attempts when a new run starts before its latest stored one.
+    """
+    by_day = {}
+    for row in rows:
+        if row[0] is not None:
+            by_day.setdefault(row[0] - row[0] % DAY_SECONDS, []).append(row)
+    stored = {}
+    days = list(by_day)
+    for i in range(0, len(days), LOOKUP_CHUNK):
+        chunk = days[i:i + LOOKUP_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        for day, active_ms, chunk_start, chunk_end, last_start in conn.execute(
+            "SELECT day, active_ms, chunk_start_ms, chunk_end_ms, last_start_ms "
+            f"FROM daily_rollup WHERE day IN ({placeholders})", chunk
+        ):
+            stored[day] = (active_ms, chunk_start, chunk_end, last_start)
+
+    deltas = {}
+    rebuild = set()
+    for day, day_rows in by_day.items():
+        day_rows.sort(key=lambda r: (r[0], r[1] or 0))
+        prev = stored.get(day)
+        if prev is not None:
+            active_ms, chunk_start, chunk_end, last_start = prev
+            if last_start is None or day_rows[0][0] * 1000 < last_start:
+                rebuild.add(day)
+                continue
+            # Counts start from zero (added by the upsert); the open chunk carries on
+            deltas[day] = [0, 0, None, None, active_ms - (chunk_end - chunk_start), chunk_start, chunk_end, last_start]
+        _fold_days(deltas, day_rows)
+    conn.executemany(_ROLLUP_UPSERT, _rollup_rows(deltas))
+    if rebuild:
+        _refresh_rollup(conn, rebuild)
+
+# Counts add up and bests take the minimum; the active-time columns are
+# replaced, as the delta already continues from the stored chunk
+_ROLLUP_UPSERT = '''
+    INSERT INTO daily_rollup (day, runs, successes, best_time_ms, best_expl, active_ms,
+                              chunk_start_ms, chunk_end_ms, last_start_ms)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (day) DO UPDATE SET
+        runs = runs + excluded.runs,
+        successes = successes + excluded.successes,
+        best_time_ms = MIN(COALESCE(best_time_ms, excluded.best_time_ms), COALESCE(excluded.best_time_ms, best_time_ms)),
+        best_expl = MIN(COALESCE(best_expl, excluded.best_expl), COALESCE(excluded.best_expl, best_expl)),
+        active_ms = excluded.active_ms,
+        chunk_start_ms = excluded.chunk_start_ms,
+        chunk_end_ms = excluded.chunk_end_ms,
+        last_start_ms = excluded.last_start_ms
+'''
+
+def _fold_days(totals, rows):
+    """
+    Fold time-ordered (epoch, time_ms, is_success, total_expl) rows into
+    day -> [runs, successes, best_time_ms, best_expl, closed_active_ms,
+            chunk_start, chunk_end, last_start] (times in ms).
+    """
+    gap_ms = SESSION_GAP_SECONDS * 1000
+    for epoch, time_ms, is_success, expl in rows:
+        day = epoch - epoch % DAY_SECONDS
+        t = totals.get(day)
+        if t is None:
+            t = totals[day] = [0, 0, None, None, 0, None, None, None]
+        t[0] += 1
+        if is_success:
+            t[1] += 1
+            if time_ms and (t[2] is None or time_ms < t[2]):
+                t[2] = time_ms
+            if expl is not None and (t[3] is None or expl < t[3]):
+                t[3] = expl
+        start_ms = epoch * 1000
+        end_ms = start_ms + (time_ms or 0)
+        if t[5] is None or start_ms - t[6] > gap_ms:
+            if t[5] is not None:
+                t[4] += t[6] - t[5]
+            t[5], t[6] = start_ms, end_ms
+        elif end_ms > t[6]:
+            t[6] = end_ms
+        t[7] = start_ms
+
+def _rollup_rows(totals):
+    return [(day, t[0], t[1], t[2], t[3], t[4] + t[6] - t[5], t[5], t[6], t[7]) for day, t in totals.items()]
+
+@perf.timed()
+@_serialized
+def get_daily_rollup(start=None, end=None):
+    """
+    One dict per day with runs in [start, end), oldest first:
+    {'day': 'YYYY-MM-DD', 'epoch', 'runs', 'successes', 'best_time', 'best_expl', 'active_time'}.
+    Times are in seconds; best_* cover successful runs only.
+    """
+    conn = _get_conn()
+    clauses = []
+    params = []
+    lo, hi = to_epoch(start), to_epoch(end)
+    if lo is not None:
+        clauses.append("day >= ?")
+        params.append(lo)
+    if hi is not None:
+        clauses.append("day < ?")
+        params.append(hi)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(
+        f"SELECT day, runs, successes, best_time_ms, best_expl, active_ms FROM daily_rollup {where} ORDER BY day",
+        params
+    ).fetchall()
+    return [
+        {
+            'day': format_timestamp(r[0], "%Y-%m-%d"), 'epoch': r[0], 'runs': r[1], 'successes': r[2],
+            'best_time': r[3] / 1000 if r[3] is not None else None, 'best_expl': r[4],
+            'active_time': r[5] / 1000
+        }
+        for r in rows
+    ]
+
+@perf.timed()
+@_serialized
+def get_range_summary(start=None, end=None):
+    """Totals over the days in [start, end) from the rollup (e.g. a "last 7 days" card)."""
+    days = get_daily_rollup(start, end)
+    best_times = [d['best_time'] for d in days if d['best_time'] is not None]
+    best_expls = [d['best_expl'] for d in days if d['best_expl'] is not None]
+    return {
+        'days': len(days),
+        'runs': sum(d['runs'] for d in days),
+        'successes': sum(d['successes'] for d in days),
+        'best_time': min(best_times) if best_times else None,
+        'best_expl': min(best_expls) if best_expls else None,
+        'active_time': sum(d['active_time'] for d in days),
+    }
+
+@perf.timed()
+@_serialized
 def get_height_stats():
     conn = _get_conn()
     # Only consider positive heights and successful runs for stats
     rows = conn.execute('''
-        SELECT height, COUNT(*), MIN(time_sec), MIN(total_explosives)
+        SELECT height, COUNT(*), MIN(time_ms) / 1000.0, MIN(total_explosives)
         FROM attempts 
         WHERE is_success = 1 AND height > 0
         GROUP BY height 
@@ -285,12 +1187,307 @@ def get_height_stats():
     ''').fetchall()
     return rows
 
+@perf.timed()
+@_serialized
+def get_height_summary():
+    """
+    Per-height aggregates of successful runs, as shown on the height list.
+    Returns a list of dicts ordered by height.
+    """
+    conn = _get_conn()
+    moments = _get_moments(conn, _current())["height"]
+    rows = conn.execute('''
+        SELECT height, COUNT(*), MIN(time_ms) / 1000.0, MIN(total_explosives),
+               AVG(CASE WHEN time_ms > 0 THEN time_ms END) / 1000.0,
+               AVG(total_explosives)
+        FROM attempts 
+        WHERE is_success = 1 AND height > 0
+        GROUP BY height 
+        ORDER BY height ASC
+    ''').fetchall()
+    return [
+        {
+            "height": r[0], "count": r[1], "best_time": r[2], "best_expl": r[3],
+            "avg_time": r[4] or 0, "avg_expl": r[5] or 0,
+            **_spread(moments.get(r[0]))
+        }
+        for r in rows
+    ]
+
+@perf.timed()
+@_serialized
 def get_runs_by_height(height):
     conn = _get_conn()
-    rows = conn.execute("SELECT * FROM attempts WHERE height = ? AND is_success = 1 ORDER BY timestamp ASC", (height,)).fetchall()
+    rows = conn.execute("SELECT * FROM runs WHERE height = ? AND is_success = 1 ORDER BY epoch ASC", (height,)).fetchall()
     return rows
 
+@perf.timed()
+@_serialized
+def get_distributions():
+    """
+    Time (seconds, > 0) and explosive (> 0) distributions of successful runs,
+    grouped three ways from a single pass over the table:
+        {'tower': {tower_id: ...}, 'tower_type': {(tower_id, type_id): ...}, 'height': {height: ...}}
+    where each group is {'time': summary, 'expl': summary} (see distribution.summarize).
+    Cached until the data changes.
+    """
+    db = _current()
+    cached = db.distribution_cache
+    if cached and cached[0] == db.generation:
+        return cached[1]
+
+    conn = _get_conn()
+    groups = {"tower": {}, "tower_type": {}, "height": {}}
+    rows = conn.execute('''
+        SELECT tower_id, type_id, height, time_ms, total_explosives
+        FROM attempts
+        WHERE is_success = 1
+    ''')
+    for tower_id, type_id, height, time_ms, expl in rows:
+        for kind, key in (("tower", tower_id), ("tower_type", (tower_id, type_id)), ("height", height)):
+            values = groups[kind].get(key)
+            if values is None:
+                values = groups[kind][key] = ([], [])
+            if time_ms and time_ms > 0:
+                values[0].append(time_ms / 1000)
+            if expl and expl > 0:
+                values[1].append(expl)
+
+    import distribution
+    time_width = distribution.BIN_WIDTHS["time"]
+    expl_width = distribution.BIN_WIDTHS["expl"]
+    result = {
+        kind: {
+            key: {"time": distribution.summarize(times, time_width), "expl": distribution.summarize(expls, expl_width)}
+            for key, (times, expls) in by_key.items()
+        }
+        for kind, by_key in groups.items()
+    }
+    db.distribution_cache = (db.generation, result)
+    return result
+
+# ===========================
+# QUANTILE SKETCHES
+# ===========================
+# One t-digest of successful run times (seconds) per tower, per (tower, type)
+# and per height, keyed by ids like get_distributions():
+#     {'tower': {tower_id: TDigest}, 'tower_type': {(tower_id, type_id): ...}, 'height': {height: ...}}
+# Each insert batch is sketched and merged in, so percentiles never rescan
+# the table. Browser snapshots carry the digests; anything else rebuilds them
+# from the table on first use.
+
+SKETCH_KINDS = ("tower", "tower_type", "height")
+
+def _build_sketches(rows):
+    """Sketches of (tower_id, type_id, height, time_ms) rows of successful runs."""
+    import tdigest
+    sketches = {kind: {} for kind in SKETCH_KINDS}
+    for tower_id, type_id, height, time_ms in rows:
+        if not time_ms or time_ms <= 0:
+            continue
+        value = time_ms / 1000
+        for kind, key in (("tower", tower_id), ("tower_type", (tower_id, type_id)), ("height", height)):
+            digest = sketches[kind].get(key)
+            if digest is None:
+                digest = sketches[kind][key] = tdigest.TDigest()
+            digest.add(value)
+    return sketches
+
+def _merge_sketches(into, sketches):
+    for kind, by_key in sketches.items():
+        target = into.setdefault(kind, {})
+        for key, digest in by_key.items():
+            if key in target:
+                target[key].merge(digest)
+            else:
+                target[key] = digest
+
+def _get_sketches(conn, db):
+    if db.sketches is None:
+        db.sketches = _build_sketches(conn.execute(
+            "SELECT tower_id, type_id, height, time_ms FROM attempts WHERE is_success = 1"
+        ))
+    return db.sketches
+
+def _sketches_to_storage(conn, db, row_count):
+    """JSON for browser storage (names rather than ids, like the run rows), or None if not built."""
+    if db.sketches is None:
+        return None
+    towers, run_types = db.towers, db.run_types
+    entries = []
+    for kind, by_key in db.sketches.items():
+        for key, digest in by_key.items():
+            if kind == "tower":
+                key = towers.name(conn, key)
+            elif kind == "tower_type":
+                key = [towers.name(conn, key[0]), run_types.name(conn, key[1])]
+            entries.append([kind, key, digest.to_dict()])
+    return json.dumps({"rows": row_count, "sketches": entries})
+
+def _sketches_from_storage(conn, db, raw):
+    """Sketches saved with the snapshot, or None (rebuilt lazily) if missing or stale."""
+    if not raw:
+        return None
+    import tdigest
+    try:
+        data = json.loads(raw)
+        # Saved alongside a different snapshot (or merged into existing rows)
+        count = conn.execute("SELECT COUNT(*) FROM attempts").fetchone()[0]
+        if data.get("rows") != count:
+            return None
+        sketches = {kind: {} for kind in SKETCH_KINDS}
+        for kind, key, digest in data["sketches"]:
+            if kind == "tower":
+                key = db.towers.intern(conn, key)
+            elif kind == "tower_type":
+                key = (db.towers.intern(conn, key[0]), db.run_types.intern(conn, key[1]))
+            sketches[kind][key] = tdigest.TDigest.from_dict(digest)
+        return sketches
+    except Exception as e:
+        print(f"Load sketches error: {e}")
+        return None
+
+@perf.timed()
+@_serialized
+def get_time_quantiles(kind, keys, qs=(0.5, 0.9)):
+    """
+    Estimated time quantiles (seconds) of successful runs over the union of
+    the given groups, e.g. get_time_quantiles("tower_type", [(1, 2), (1, 3)]).
+    Returns {q: value}, with None values when the groups have no timed runs.
+    """
+    sketches = _get_sketches(_get_conn(), _current())[kind]
+    digests = [sketches.get(key) for key in keys]
+    digests = [d for d in digests if d is not None]
+    if len(digests) == 1:
+        digest = digests[0]
+    else:
+        import tdigest
+        digest = tdigest.merged(digests)
+    return {q: digest.quantile(q) if digest is not None else None for q in qs}
+
+# ===========================
+# RUNNING MOMENTS (consistency)
+# ===========================
+# Welford mean / variance of successful runs' time (seconds, > 0) and total
+# explosives per tower, (tower, type), height, (height, tower, type), log
+# session and split:
+#     {kind: {key: {'time': Welford, 'expl': Welford}}}
+# Inserts add to them in place and delete_runs() removes from them. Missing
+# values (no time, no explosives) are skipped rather than counted as 0.
+
+MOMENT_KINDS = ("tower", "tower_type", "height", "height_tower_type", "file", "split")
+
+def _moment_keys(tower_id, type_id, height, session_id, split_tag):
+    return (("tower", tower_id), ("tower_type", (tower_id, type_id)), ("height", height),
+            ("height_tower_type", (height, tower_id, type_id)),
+            ("file", session_id), ("split", split_tag))
+
+def _add_moments(moments, rows):
+    """Fold in (tower_id, type_id, height, session_id, split_tag, time_ms, total_expl) rows."""
+    import analytics
+    for tower_id, type_id, height, session_id, split_tag, time_ms, expl in rows:
+        for kind, key in _moment_keys(tower_id, type_id, height, session_id, split_tag):
+            if key is None:
+                continue
+            group = moments[kind].get(key)
+            if group is None:
+                group = moments[kind][key] = {"time": analytics.Welford(), "expl": analytics.Welford()}
+            if time_ms is not None and time_ms > 0:
+                group["time"].add(time_ms / 1000)
+            if expl is not None:
+                group["expl"].add(expl)
+
+def _remove_moments(moments, rows):
+    """Take back rows previously folded in by _add_moments (same layout)."""
+    for tower_id, type_id, height, session_id, split_tag, time_ms, expl in rows:
+        for kind, key in _moment_keys(tower_id, type_id, height, session_id, split_tag):
+            group = moments[kind].get(key)
+            if group is None:
+                continue
+            if time_ms is not None and time_ms > 0:
+                group["time"].remove(time_ms / 1000)
+            if expl is not None:
+                group["expl"].remove(expl)
+            if group["time"].n == 0 and group["expl"].n == 0:
+                del moments[kind][key]
+
+def _get_moments(conn, db):
+    with db.lock:
+        if db.moments is None:
+            moments = {kind: {} for kind in MOMENT_KINDS}
+            _add_moments(moments, conn.execute('''
+                SELECT tower_id, type_id, height, session_id, split_tag, time_ms, total_explosives
+                FROM attempts
+                WHERE is_success = 1
+            '''))
+            db.moments = moments
+        return db.moments
+
+def _spread(group):
+    if group is None:
+        return {'std_time': None, 'std_expl': None}
+    return {'std_time': group["time"].std(), 'std_expl': group["expl"].std()}
+
+@perf.timed()
+@_serialized
+def get_consistency(kind, keys):
+    """
+    Mean and standard deviation of successful runs over the union of the given
+    groups (kind is one of MOMENT_KINDS; sessions use kind 'file' or 'split').
+    Returns {'avg_time', 'std_time', 'avg_expl', 'std_expl'}; None where undefined.
+    """
+    import analytics
+    groups = _get_moments(_get_conn(), _current())[kind]
+    time_acc = analytics.Welford()
+    expl_acc = analytics.Welford()
+    for key in keys:
+        group = groups.get(key)
+        if group is not None:
+            time_acc.merge(group["time"])
+            expl_acc.merge(group["expl"])
+    return {
+        'avg_time': time_acc.mean if time_acc.n else None, 'std_time': time_acc.std(),
+        'avg_expl': expl_acc.mean if expl_acc.n else None, 'std_expl': expl_acc.std(),
+    }
+
+@perf.timed()
+@_serialized
+def delete_runs(run_ids):
+    """Delete runs by id, keeping the rollup and running stats in step. Returns how many were deleted."""
+    conn = _get_conn()
+    db = _current()
+    run_ids = list(run_ids)
+    deleted = []
+    with conn:
+        for i in range(0, len(run_ids), LOOKUP_CHUNK):
+            chunk = run_ids[i:i + LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            deleted.extend(conn.execute(f'''
+                SELECT epoch, is_success, tower_id, type_id, height, session_id, split_tag,
+                       time_ms, total_explosives
+                FROM attempts WHERE id IN ({placeholders})
+            ''', chunk).fetchall())
+            conn.execute(f"DELETE FROM attempts WHERE id IN ({placeholders})", chunk)
+        if not deleted:
+            return 0
+        _refresh_rollup(conn, {r[0] - r[0] % DAY_SECONDS for r in deleted if r[0] is not None})
+    if db.moments is not None:
+        _remove_moments(db.moments, (r[2:] for r in deleted if r[1]))
+    # Digests can't take values back out; rebuild them from the remaining rows
+    if db.sketches is not None:
+        db.sketches = None
+        _get_sketches(conn, db)
+    _bump_generation()
+    return len(deleted)
+
+@perf.timed()
+@_serialized
 def clear_db():
     conn = _get_conn()
     with conn:
-        conn.execute("DELETE FROM attempts")
\ No newline at end of file
+        conn.execute("DELETE FROM attempts")
+        conn.execute("DELETE FROM daily_rollup")
+    _current().bloom = None
+    _current().sketches = _build_sketches(())
+    _current().moments = None
+    _bump_generation()
\ No newline at end of file
@@ -0,0 +1,118 @@
+import math
+
+# ===========================
+# DISTRIBUTIONS (no flet imports)
+# ===========================
+# Fixed-width histograms and quantiles of run values. Bin i covers
+# [i * width, (i + 1) * width), so histograms built for different groups
+# (e.g. the types of one tower) line up and can be added bin by bin.
+
+QUANTILES = (0.1, 0.5, 0.9)
+BIN_WIDTHS = {"expl": 1, "time": 2.0} # explosives; seconds
+
+# Drawing: at most this many bars; long tails outside CLIP_QUANTILES are
+# folded into an underflow and an overflow bar
+MAX_BARS = 60
+CLIP_QUANTILES = (0.01, 0.99)
+
+def quantile(sorted_values, q):
+    """Linear-interpolated quantile of an already sorted list, or None if empty."""
+    n = len(sorted_values)
+    if n == 0:
+        return None
+    pos = (n - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, n - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+def histogram(values, width):
+    """{bin index: count}; empty bins are left out."""
+    counts = {}
+    for v in values:
+        i = math.floor(v / width)
+        counts[i] = counts.get(i, 0) + 1
+    return counts
+
+def summarize(values, width):
+    """Histogram, quantiles and range of one group's values."""
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "width": width,
+        "hist": histogram(ordered, width),
+        "quantiles": {q: quantile(ordered, q) for q in QUANTILES},
+        "min": ordered[0] if ordered else None,
+        "max": ordered[-1] if ordered else None,
+    }
+
+def merge(summaries):
+    """
+    Combine summaries of disjoint groups with the same bin width. Quantiles of
+    the result are estimated from the merged histogram (values assumed spread
+    evenly within a bin), so they are exact to within one bin.
+    """
+    summaries = [s for s in summaries if s and s["count"]]
+    if not summaries:
+        return None
+    if len(summaries) == 1:
+        return summaries[0]
+    width = summaries[0]["width"]
+    hist = {}
+    for s in summaries:
+        for i, c in s["hist"].items():
+            hist[i] = hist.get(i, 0) + c
+    count = sum(hist.values())
+    lo = min(s["min"] for s in summaries)
+    hi = max(s["max"] for s in summaries)
+    return {
+        "count": count,
+        "width": width,
+        "hist": hist,
+        "quantiles": {q: _histogram_quantile(hist, width, count, q, lo, hi) for q in QUANTILES},
+        "min": lo,
+        "max": hi,
+    }
+
+def _histogram_quantile(hist, width, count, q, lo, hi):
+    target = (count - 1) * q
+    seen = 0
+    for i in sorted(hist):
+        c = hist[i]
+        if seen + c > target:
+            value = (i + (target - seen + 0.5) / c) * width
+            return min(max(value, lo), hi)
+        seen += c
+    return hi
+
+def bars(summary, max_bars=MAX_BARS):
+    """
+    [(start, end, count)] bars for drawing, empty bins included. If the full
+    range needs more than max_bars bins, bins outside the CLIP_QUANTILES are
+    folded into an underflow bar (start None) and an overflow bar (end None),
+    and adjacent bins are combined until the rest fits.
+    """
+    if not summary or not summary["hist"]:
+        return []
+    hist = summary["hist"]
+    width = summary["width"]
+    first, last = min(hist), max(hist)
+    if last - first + 1 > max_bars:
+        count = sum(hist.values())
+        lo_q, hi_q = (_histogram_quantile(hist, width, count, q, summary["min"], summary["max"])
+                      for q in CLIP_QUANTILES)
+        first = max(first, math.floor(lo_q / width))
+        last = min(last, math.floor(hi_q / width))
+    under = sum(c for i, c in hist.items() if i < first)
+    over = sum(c for i, c in hist.items() if i > last)
+    room = max(1, max_bars - (under > 0) - (over > 0))
+    step = max(1, math.ceil((last - first + 1) / room))
+
+    result = []
+    if under:
+        result.append((None, first * width, under))
+    for i in range(first, last + 1, step):
+        stop = min(i + step, last + 1)
+        result.append((i * width, stop * width, sum(hist.get(j, 0) for j in range(i, stop))))
+    if over:
+        result.append(((last + 1) * width, None, over))
+    return result
@@ -1,7 +1,10 @@
 import re
-import gzip
+import heapq
+import os
+import zlib
 from datetime import datetime, date, timedelta
 import database
+import perf
 
 # REGEX PATTERNS
 patterns = {
@@ -23,50 +26,70 @@ patterns = {
 }
 
 class RunParser:
-    def __init__(self, callback_func, is_live=False, session_id="unknown"):
+    def __init__(self, callback_func, is_live=False, session_id="unknown", save_func=None, instance=None):
         self.callback = callback_func
+        # Where finished runs go; returns True if the run was stored (default: the database)
+        self.save_func = save_func or database.save_run
         self.is_live = is_live
         self.session_id = session_id
+        self.instance = instance # Game instance the log belongs to (multi-instance imports)
         self.buffer = {}
         self.current_track_date = date.today()
-        self.last_parsed_time = None
-        self.attempt_start_time = None
+        self.day_start = database.day_epoch(self.current_track_date)
+        self.last_parsed_time = None # Seconds into the day of the previous timed line
+        self.attempt_start_time = None # Epoch
         self.is_attempting = False
-        self.bed_time = None
+        self.bed_ms = None
         self.current_split_tag = None
         self.dragon_killed = False
+        self.saved_count = 0
+        # For stitching chunk-parsed files (see parse_chunk)
+        self.first_parsed_time = None
+        self.first_split_at = None # saved_count at the first split start/end line
+        self.auto_split_tags = {} # Generated split name -> epoch it was derived from
 
     def set_date_context(self, date_obj):
         self.current_track_date = date_obj
+        self.day_start = database.day_epoch(date_obj)
         self.last_parsed_time = None
 
+    @perf.timed("engine.RunParser.process_line", sample_every=64)
     def process_line(self, line):
         t_match = patterns['log_time'].search(line)
-        timestamp_str = ""
-        current_dt = None
+        current_ts = None
         
         if t_match:
+            # "HH:MM:SS" -> integer epoch; no datetime objects per line
             time_str = t_match.group(1)
-            try:
-                t_obj = datetime.strptime(time_str, "%H:%M:%S").time()
+            h, m, sec = int(time_str[0:2]), int(time_str[3:5]), int(time_str[6:8])
+            if h < 24 and m < 60 and sec < 60:
+                t_sec = h * 3600 + m * 60 + sec
                 if self.last_parsed_time is not None:
-                    if t_obj < self.last_parsed_time:
+                    if t_sec < self.last_parsed_time:
                          self.current_track_date += timedelta(days=1)
-                self.last_parsed_time = t_obj
-                current_dt = datetime.combine(self.current_track_date, t_obj)
-                timestamp_str = current_dt.strftime("%Y-%m-%d %H:%M:%S")
-                self.buffer['timestamp'] = timestamp_str
-            except ValueError:
-                pass
+                         self.day_start += 86400
+                elif self.first_parsed_time is None:
+                    self.first_parsed_time = t_sec
+                self.last_parsed_time = t_sec
+                current_ts = self.day_start + t_sec
+                self.buffer['epoch'] = current_ts
         
-        if not current_dt: return 
+        if current_ts is None: return 
 
         s_match = patterns['split_start'].search(line)
         if s_match:
+            if self.first_split_at is None:
+                self.first_split_at = self.saved_count
             custom_name = s_match.group(1).strip()
-            self.current_split_tag = custom_name if custom_name else f"Session {timestamp_str}"
+            if custom_name:
+                self.current_split_tag = custom_name
+            else:
+                self.current_split_tag = f"Session {database.format_timestamp(current_ts)}"
+                self.auto_split_tags[self.current_split_tag] = current_ts
             return
         elif patterns['split_end'].search(line):
+            if self.first_split_at is None:
+                self.first_split_at = self.saved_count
             self.current_split_tag = None
             return
 
@@ -76,19 +99,19 @@ class RunParser:
                 distance = float(pearl_match.group(1))
                 if not self.is_attempting and distance > 10.0:
                     self.is_attempting = True
-                    self.attempt_start_time = current_dt
-                    self.bed_time = None
-                    self.buffer = {'timestamp': timestamp_str}
+                    self.attempt_start_time = current_ts
+                    self.bed_ms = None
+                    self.buffer = {'epoch': current_ts}
             except (ValueError, IndexError):
                 pass
 
         if "1st Bed Placed" in line:
             m = patterns['bed'].search(line)
-            if m: self.bed_time = float(m.group(1))
+            if m: self.bed_ms = database.to_ms(m.group(1))
 
         if "Time:" in line:
             m = patterns['time'].search(line)
-            if m: self.buffer['time'] = float(m.group(1))
+            if m: self.buffer['time_ms'] = database.to_ms(m.group(1))
         
         if "Explosives:" in line:
             m = patterns['expl'].search(line)
@@ -119,34 +142,39 @@ class RunParser:
             elif patterns['advancement_reset'].search(line): fail_reason = "World Load"
 
             if fail_reason:
-                duration = (current_dt - self.attempt_start_time).total_seconds() if self.attempt_start_time else 0.0
-                self.finish_fail(duration, fail_reason, timestamp_str)
+                duration = current_ts - self.attempt_start_time if self.attempt_start_time else 0
+                self.finish_fail(duration, fail_reason, current_ts)
 
     def finish_success(self):
         self.buffer['is_success'] = True
         self.buffer['session_id'] = self.session_id
         self.buffer['split_tag'] = self.current_split_tag
-        self.buffer['bed_time'] = self.bed_time
-        database.save_run(self.buffer)
+        self.buffer['bed_ms'] = self.bed_ms
+        self.buffer['instance'] = self.instance
+        if self.save_func(self.buffer):
+            self.saved_count += 1
         if self.callback: self.callback()
         self.reset_state()
 
-    def finish_fail(self, duration, reason, timestamp):
-        if duration < 2.0: return
+    def finish_fail(self, duration, reason, epoch):
+        """duration: whole seconds since the attempt started."""
+        if duration < 2: return
         fail_data = {
-            'timestamp': timestamp, 'time': round(duration, 2), 'expl': '?',
-            'tower': 'Unknown', 'type': 'Unknown', 'height': 0, 'bed_time': self.bed_time,
+            'epoch': epoch, 'time_ms': duration * 1000, 'expl': '?',
+            'tower': 'Unknown', 'type': 'Unknown', 'height': 0, 'bed_ms': self.bed_ms,
             'is_success': False, 'fail_reason': reason,
-            'session_id': self.session_id, 'split_tag': self.current_split_tag
+            'session_id': self.session_id, 'split_tag': self.current_split_tag,
+            'instance': self.instance
         }
-        database.save_run(fail_data)
+        if self.save_func(fail_data):
+            self.saved_count += 1
         if self.callback: self.callback()
         self.reset_state()
 
     def reset_state(self):
         self.is_attempting = False
         self.attempt_start_time = None
-        self.bed_time = None
+        self.bed_ms = None
         self.dragon_killed = False
         self.buffer = {}
 
@@ -154,6 +182,7 @@ class RunParser:
 # FILE IMPORT (replaces LogWatcher + import_history_archives)
 # ===========================
 
+@perf.timed()
 def process_file_content(filename, content_bytes, callback_func=None):
     """
     Process a single uploaded file's content (bytes).
@@ -162,27 +191,346 @@ def process_file_content(filename, content_bytes, callback_func=None):
     Returns the number of runs saved.
     """
     parser = RunParser(callback_func, is_live=False, session_id=filename)
-    
+    _parse_content(parser, filename, content_bytes)
+    return parser.saved_count
+
+@perf.timed()
+def parse_file_content(filename, content_bytes, instance=None):
+    """
+    Parse a file without touching the database.
+    Returns the list of run dicts in log order (safe to call from worker processes),
+    or None if the pre-scan found no practice runs in it.
+    instance: game instance the file belongs to, for multi-instance imports.
+    """
+    try:
+        raw = scan_content(filename, content_bytes)
+    except Exception as e:
+        print(f"Error reading {filename}: {e}")
+        return []
+    if raw is None:
+        return None
+    return parse_text(filename, raw.decode('utf-8', errors='ignore'), instance)
+
+# ===========================
+# QUICK-REJECT PRE-SCAN
+# ===========================
+# Every run needs a pearl throw (attempt start) or a standing-height line
+# (success), so a file containing neither can be skipped before any
+# decoding, line splitting or regex work.
+
+PRACTICE_MARKERS = (b"Pearled to", b"Standing Height:")
+_MARKER_OVERLAP = max(len(m) for m in PRACTICE_MARKERS) - 1
+_SCAN_CHUNK = 256 * 1024
+
+def _has_marker(data):
+    return any(m in data for m in PRACTICE_MARKERS)
+
+def scan_content(filename, content_bytes):
+    """
+    Decompress (.gz) while looking for PRACTICE_MARKERS.
+    Returns the raw log bytes, or None if no marker occurs (the file has no runs).
+    Raises on corrupt input.
+    """
+    if not filename.endswith('.gz'):
+        return content_bytes if _has_marker(content_bytes) else None
+
+    chunks = []
+    found = False
+    tail = b""
+    data = content_bytes
+    while data:
+        # One decompressor per gzip member (concatenated members are valid)
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        view = memoryview(data)
+        for start in range(0, len(data), _SCAN_CHUNK):
+            out = d.decompress(view[start:start + _SCAN_CHUNK])
+            if out:
+                chunks.append(out)
+                if not found:
+                    found = _has_marker(tail + out)
+                    tail = out[-_MARKER_OVERLAP:]
+            if d.eof:
+                break
+        if not d.eof:
+            raise zlib.error(f"{filename}: truncated gzip stream")
+        out = d.flush()
+        if out:
+            chunks.append(out)
+            found = found or _has_marker(tail + out)
+        data = d.unused_data.lstrip(b"\0")
+    return b"".join(chunks) if found else None
+
+def parse_text(filename, text, instance=None):
+    """Parse decoded log text into run dicts (log order) without touching the database."""
+    parser, runs = _collecting_parser(filename, instance)
+    _set_date_context(parser, filename)
+    _parse_lines(parser, text)
+    return runs
+
+def _collecting_parser(filename, instance=None, is_live=False):
+    """A parser that appends finished runs to a list instead of saving them. Returns (parser, list)."""
+    runs = []
+    def collect(run):
+        runs.append(dict(run))
+        return True
+    parser = RunParser(None, is_live=is_live, session_id=session_name(filename, instance), save_func=collect, instance=instance)
+    return parser, runs
+
+def session_name(filename, instance=None):
+    """session_id of a log file's runs; files of different instances often share names (latest.log)."""
+    return f"{instance}/{filename}" if instance else filename
+
+def _parse_content(parser, filename, content_bytes):
+    _set_date_context(parser, filename)
+    try:
+        raw = scan_content(filename, content_bytes)
+    except Exception as e:
+        print(f"Error reading {filename}: {e}")
+        return
+    if raw is not None:
+        _parse_lines(parser, raw.decode('utf-8', errors='ignore'))
+
+def _set_date_context(parser, filename):
+    parser.set_date_context(_file_date(filename))
+
+def _file_date(filename):
     # Determine date context from filename
     m = patterns['gz_filename'].match(filename)
     if m:
         try:
-            file_date = datetime.strptime(m.group(1), "%Y-%m-%d").date()
-            parser.set_date_context(file_date)
+            return datetime.strptime(m.group(1), "%Y-%m-%d").date()
         except ValueError:
-            parser.set_date_context(date.today())
-    else:
-        parser.set_date_context(date.today())
-    
-    # Decompress if .gz, otherwise decode directly
+            pass
+    return date.today()
+
+def _parse_lines(parser, text):
+    for line in text.splitlines():
+        parser.process_line(line)
+
+# ===========================
+# CHUNK-PARALLEL PARSING (one large file)
+# ===========================
+# A long session log is cut into byte ranges right after "Loaded N
+# advancements" lines: a world load ends any open attempt, so each range can
+# be parsed on its own (worker processes) as if it started a fresh file.
+# Stitching then walks the ranges in order and carries what a single parser
+# would have: the day (midnight rollovers), the active split tag and, if a
+# range did end mid-attempt after all, the open attempt itself (that range's
+# successor is re-parsed here from the carried state).
+
+CHUNK_BYTES = 8 * 1024 * 1024
+PARALLEL_MIN_BYTES = 2 * CHUNK_BYTES # Smaller files aren't worth the process round trips
+_SAFE_BOUNDARY = re.compile(rb"\n\[\d\d:\d\d:\d\d\][^\n]*Loaded \d+ advancements[^\n]*\n")
+_OPEN_STATE = ("is_attempting", "attempt_start_time", "bed_ms", "dragon_killed", "buffer")
+
+def chunk_bounds(raw, chunk_bytes=CHUNK_BYTES):
+    """[(start, end)] byte ranges of about chunk_bytes, each ending after a world load line."""
+    bounds = [0]
+    target = chunk_bytes
+    while target < len(raw):
+        m = _SAFE_BOUNDARY.search(raw, target)
+        if m is None or m.end() >= len(raw):
+            break
+        bounds.append(m.end())
+        target = m.end() + chunk_bytes
+    bounds.append(len(raw))
+    return list(zip(bounds, bounds[1:]))
+
+def parse_chunk(filename, base_date, data, instance=None):
+    """
+    Parse one byte range as if it started the file on base_date (worker side).
+    Returns the runs plus what stitch_chunks needs to place them.
+    """
+    parser, runs = _collecting_parser(filename, instance)
+    parser.set_date_context(base_date)
+    start_day = parser.day_start
+    _parse_lines(parser, data.decode('utf-8', errors='ignore'))
+    return {
+        "runs": runs,
+        "first_time": parser.first_parsed_time,
+        "last_time": parser.last_parsed_time,
+        "days": (parser.day_start - start_day) // 86400,
+        "split_at": parser.first_split_at,
+        "split_tag": parser.current_split_tag,
+        "auto_tags": parser.auto_split_tags,
+        "open": _open_state(parser),
+    }
+
+def _open_state(parser):
+    """Attempt state left at the end of a range, or None if nothing carries over."""
+    if not parser.is_attempting and parser.bed_ms is None and not parser.dragon_killed and set(parser.buffer) <= {'epoch'}:
+        return None
+    return {name: getattr(parser, name) for name in _OPEN_STATE}
+
+def _shift_state(state, shift):
+    if state is None or not shift:
+        return state
+    state = dict(state, buffer=dict(state["buffer"]))
+    if state["attempt_start_time"] is not None:
+        state["attempt_start_time"] += shift
+    if "epoch" in state["buffer"]:
+        state["buffer"]["epoch"] += shift
+    return state
+
+def stitch_chunks(filename, base_date, raw, bounds, results, instance=None):
+    """Runs of the whole file, in log order, from parse_chunk results of each range."""
+    runs = []
+    day_offset = 0 # Days after base_date at the end of the previous range
+    last_time = None
+    split_tag = None
+    carried = None # Open attempt state (absolute epochs) from the previous range
+    for (start, end), res in zip(bounds, results):
+        if carried is not None:
+            # The range didn't start clean: parse it again, continuing the previous one
+            parser, out = _collecting_parser(filename, instance)
+            parser.set_date_context(base_date + timedelta(days=day_offset))
+            parser.last_parsed_time = last_time
+            parser.current_split_tag = split_tag
+            for name, value in carried.items():
+                setattr(parser, name, value)
+            _parse_lines(parser, raw[start:end].decode('utf-8', errors='ignore'))
+            runs.extend(out)
+            day_offset = (parser.day_start - database.day_epoch(base_date)) // 86400
+            last_time = parser.last_parsed_time
+            split_tag = parser.current_split_tag
+            carried = _open_state(parser)
+            continue
+
+        days = day_offset
+        if res["first_time"] is not None and last_time is not None and res["first_time"] < last_time:
+            days += 1 # Rolled over midnight right at the boundary
+        shift = days * 86400
+        # Default split names embed the start time, which was off by `shift`
+        renamed = {}
+        if shift:
+            renamed = {tag: f"Session {database.format_timestamp(epoch + shift)}" for tag, epoch in res["auto_tags"].items()}
+        split_at = res["split_at"]
+        for i, run in enumerate(res["runs"]):
+            if shift:
+                run['epoch'] += shift
+            if split_at is None or i < split_at:
+                run['split_tag'] = split_tag # Still inside the split the previous range ended in
+            elif run['split_tag'] in renamed:
+                run['split_tag'] = renamed[run['split_tag']]
+        runs.extend(res["runs"])
+
+        if split_at is not None:
+            split_tag = renamed.get(res["split_tag"], res["split_tag"])
+        day_offset = days + res["days"]
+        if res["last_time"] is not None:
+            last_time = res["last_time"]
+        carried = _shift_state(res["open"], shift)
+    return runs
+
+@perf.timed()
+def parse_file_chunked(filename, content_bytes, executor=None, chunk_bytes=CHUNK_BYTES, instance=None):
+    """
+    parse_file_content for one large file, with its ranges parsed on `executor`
+    (e.g. a ProcessPoolExecutor). Small files, or no executor, parse in-process.
+    """
     try:
-        if filename.endswith('.gz'):
-            text = gzip.decompress(content_bytes).decode('utf-8', errors='ignore')
-        else:
-            text = content_bytes.decode('utf-8', errors='ignore')
+        raw = scan_content(filename, content_bytes)
     except Exception as e:
         print(f"Error reading {filename}: {e}")
-        return
-    
-    for line in text.splitlines():
-        parser.process_line(line)
\ No newline at end of file
+        return []
+    if raw is None:
+        return None
+    if executor is None or len(raw) < PARALLEL_MIN_BYTES:
+        return parse_text(filename, raw.decode('utf-8', errors='ignore'), instance)
+
+    base_date = _file_date(filename)
+    bounds = chunk_bounds(raw, chunk_bytes)
+    futures = [executor.submit(parse_chunk, filename, base_date, raw[start:end], instance) for start, end in bounds]
+    return stitch_chunks(filename, base_date, raw, bounds, [f.result() for f in futures], instance)
+
+# ===========================
+# MULTI-INSTANCE MERGING
+# ===========================
+# Wall-style practice runs several game instances at once, each with its own
+# logs folder. Every instance's logs are parsed with their own RunParser
+# state; the per-instance run streams (each already in time order) are then
+# combined with a k-way heap merge on the run epoch.
+
+_INSTANCE_SUBDIRS = ("logs", ".minecraft", "minecraft")
+
+def instance_id(logs_dir):
+    """
+    Instance name for a logs folder: the first enclosing folder that isn't
+    'logs' or '.minecraft' (e.g. instances/Wall 3/.minecraft/logs -> 'Wall 3').
+    """
+    path = os.path.abspath(logs_dir)
+    while os.path.basename(path) in _INSTANCE_SUBDIRS:
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return os.path.basename(path) or logs_dir
+
+def instance_stream(file_runs):
+    """One instance's run lists (one per file, any order) chained into a single time-ordered stream."""
+    ordered = sorted((runs for runs in file_runs if runs), key=lambda runs: runs[0]['epoch'])
+    return [run for runs in ordered for run in runs]
+
+def merge_instance_runs(streams):
+    """k-way merge of time-ordered run streams by epoch (ties keep stream order)."""
+    return heapq.merge(*streams, key=lambda run: run['epoch'])
+
+class InstanceMerger:
+    """
+    Live multi-instance parsing: lines are fed per instance, each into its own
+    RunParser, and finished runs are handed to save_func in timestamp order.
+    A run is only released once every instance's log has reached its time
+    (or, with `now` given to drain(), once an idle instance's log could no
+    longer produce anything earlier).
+    """
+    LIVE_SLACK_SECONDS = 5 # Lines can be written a little after their timestamp
+
+    def __init__(self, save_func):
+        self.save_func = save_func
+        self.parsers = {}
+        self.pending = [] # Heap of (epoch, seq, run)
+        self.seq = 0
+
+    def add_instance(self, instance, filename="latest.log", log_date=None):
+        """(Re)start an instance's stream, e.g. when its latest.log was rotated."""
+        parser, runs = _collecting_parser(filename, instance, is_live=True)
+        if log_date is None:
+            _set_date_context(parser, filename)
+        else:
+            parser.set_date_context(log_date)
+        self.parsers[instance] = (parser, runs)
+
+    def feed(self, instance, lines):
+        parser, runs = self.parsers[instance]
+        for line in lines:
+            parser.process_line(line)
+        for run in runs:
+            heapq.heappush(self.pending, (run['epoch'], self.seq, run))
+            self.seq += 1
+        runs.clear()
+
+    def watermark(self, now=None):
+        """Epoch up to which every instance is complete."""
+        marks = []
+        for parser, _ in self.parsers.values():
+            mark = None
+            if parser.last_parsed_time is not None:
+                mark = parser.day_start + parser.last_parsed_time
+            if now is not None:
+                mark = max(mark or 0, now - self.LIVE_SLACK_SECONDS)
+            marks.append(mark)
+        if not marks or None in marks:
+            return None
+        return min(marks)
+
+    def drain(self, now=None, final=False):
+        """Save the runs that can no longer be preceded by another instance's. Returns how many were new."""
+        limit = None if final else self.watermark(now)
+        if limit is None and not final:
+            return 0
+        saved = 0
+        while self.pending and (final or self.pending[0][0] <= limit):
+            _, _, run = heapq.heappop(self.pending)
+            if self.save_func(run):
+                saved += 1
+        return saved
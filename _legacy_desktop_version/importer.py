@@ -0,0 +1,379 @@
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+import perf
+
+# ===========================
+# BACKGROUND IMPORT JOBS
+# ===========================
+# Uploads only enqueue files; a worker thread imports them so the Flet
+# event handlers return immediately. Progress and completion callbacks run on
+# the worker thread: they should only touch controls and call page.update().
+#
+# Each job runs as a staged pipeline with bounded queues between stages:
+#   read -> decompress + pre-scan (thread pool; zlib releases the GIL) -> parse -> write
+# so reading, inflating and parsing overlap, and at most a handful of files
+# are held in memory however many were dropped. The single writer batches
+# runs into one transaction per WRITE_BATCH_RUNS.
+
+PROGRESS_INTERVAL = 0.25 # Seconds between progress events
+
+READ_QUEUE_SIZE = 4      # Raw files waiting for decompression
+DECODE_QUEUE_SIZE = 4    # Decompressions in flight / waiting for the parser
+RUNS_QUEUE_SIZE = 8      # Parsed files waiting for the writer
+DECOMPRESS_WORKERS = 2
+WRITE_BATCH_RUNS = 500
+
+STAGES = ("read", "decompress", "parse", "write")
+
+class StageStats:
+    """Per-stage counters: items handled, busy time and depth of the stage's input queue."""
+    __slots__ = ("name", "items", "busy", "depth", "max_depth")
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.depth = 0
+        self.max_depth = 0
+
+    def observe_queue(self, q):
+        self.depth = q.qsize()
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+
+    def to_dict(self):
+        return {
+            "items": self.items,
+            "busy_s": round(self.busy, 3),
+            "items_per_sec": round(self.items / self.busy, 1) if self.busy > 0 else None,
+            "queue_depth": self.depth,
+            "max_queue_depth": self.max_depth,
+        }
+
+class _FileItem:
+    __slots__ = ("name", "path", "delete_after", "data", "text", "runs", "failed", "skipped")
+
+    def __init__(self, name, path, delete_after):
+        self.name = name
+        self.path = path
+        self.delete_after = delete_after
+        self.data = None
+        self.text = None
+        self.runs = ()
+        self.failed = path is None
+        self.skipped = False # Pre-scan found no practice runs
+
+class ImportProgress:
+    __slots__ = ("job_id", "state", "files_done", "files_total", "files_failed", "files_skipped",
+                 "runs_saved", "current_file", "elapsed", "files_per_sec", "runs_per_sec", "eta", "stages")
+
+    def __init__(self, job, state):
+        self.job_id = job.id
+        self.state = state # "running", "done" or "cancelled"
+        self.files_done = job.files_done
+        self.files_total = job.files_total
+        self.files_failed = job.files_failed
+        self.files_skipped = job.files_skipped
+        self.runs_saved = job.runs_saved
+        self.current_file = job.current_file
+        self.elapsed = time.perf_counter() - job.started_at if job.started_at else 0.0
+
+        rate = self.files_done / self.elapsed if self.elapsed > 0 else 0.0
+        self.files_per_sec = rate
+        self.runs_per_sec = self.runs_saved / self.elapsed if self.elapsed > 0 else 0.0
+        remaining = self.files_total - self.files_done
+        self.eta = remaining / rate if rate > 0 else None
+        self.stages = {name: st.to_dict() for name, st in job.stages.items()}
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+class ImportJob:
+    """A batch of files expected to arrive (e.g. from one file picker selection)."""
+    _next_id = 1
+
+    def __init__(self, files_total, on_progress=None, on_finished=None, db_key=None):
+        self.id = ImportJob._next_id
+        ImportJob._next_id += 1
+        self.files_total = files_total
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        # Session database the runs go to; defaults to the one current at creation
+        self.db_key = db_key or database.current_session_key()
+
+        self.files_done = 0
+        self.files_failed = 0
+        self.files_skipped = 0
+        self.runs_saved = 0
+        self.current_file = None
+        self.started_at = None
+        self.stages = {name: StageStats(name) for name in STAGES}
+
+        self._files = queue.Queue()
+        self._cancelled = threading.Event()
+
+    def add_file(self, name, path, delete_after=True):
+        """Enqueue a file on disk (e.g. a finished upload)."""
+        self._files.put((name, path, delete_after))
+
+    def skip_file(self, name):
+        """A file that will never arrive (e.g. its upload failed)."""
+        self._files.put((name, None, False))
+
+    def cancel(self):
+        self._cancelled.set()
+        self._files.put(None) # Wake the worker if it is waiting for uploads
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def _next_file(self, timeout=0.5):
+        try:
+            return self._files.get(timeout=timeout)
+        except queue.Empty:
+            return False
+
+class ImportWorker:
+    """Runs ImportJobs one at a time on a daemon thread."""
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._thread = None
+        self.current_job = None
+        self.last_stages = None # Stage metrics of the last finished job
+
+    def submit(self, job):
+        self._jobs.put(job)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="import-worker", daemon=True)
+            self._thread.start()
+        return job
+
+    def _loop(self):
+        while True:
+            try:
+                job = self._jobs.get(timeout=5)
+            except queue.Empty:
+                return # Idle: let the thread exit, submit() restarts it
+            self.current_job = job
+            try:
+                # Callbacks run inside this block too, so their queries hit the job's session
+                with database.session(job.db_key):
+                    self._run_job(job)
+            except database.SessionClosedError:
+                # The page's database went away mid-import; stop the other stages too
+                job.cancel()
+                print(f"Import job {job.id} stopped: its session database was closed")
+            finally:
+                self.current_job = None
+
+    def _run_job(self, job):
+        job.started_at = time.perf_counter()
+        self._emit(job, "running")
+
+        read_q = queue.Queue(READ_QUEUE_SIZE)
+        decode_q = queue.Queue(DECODE_QUEUE_SIZE)
+        runs_q = queue.Queue(RUNS_QUEUE_SIZE)
+        # Stage threads run in a copy of this context, i.e. bound to the job's session
+        stages = [
+            threading.Thread(target=contextvars.copy_context().run, args=(self._read_stage, job, read_q),
+                             name="import-read", daemon=True),
+            threading.Thread(target=contextvars.copy_context().run, args=(self._decompress_stage, job, read_q, decode_q),
+                             name="import-decompress", daemon=True),
+            threading.Thread(target=contextvars.copy_context().run, args=(self._parse_stage, job, decode_q, runs_q),
+                             name="import-parse", daemon=True),
+        ]
+        for t in stages:
+            t.start()
+        # The writer stays on this thread, inside the job's database session
+        self._write_stage(job, runs_q)
+        for t in stages:
+            t.join()
+
+        if job.cancelled:
+            self._discard_pending(job)
+        state = "cancelled" if job.cancelled else "done"
+        final = ImportProgress(job, state)
+        self.last_stages = final.stages
+        if job.on_finished:
+            try:
+                job.on_finished(final)
+            except Exception as ex:
+                print(f"Import finish callback error: {ex}")
+
+    # --- Pipeline stages; each forwards a None sentinel when its input ends ---
+
+    def _read_stage(self, job, out_q):
+        stats = job.stages["read"]
+        received = 0
+        while received < job.files_total and not job.cancelled:
+            entry = job._next_file()
+            if entry is False or entry is None:
+                continue
+            received += 1
+            item = _FileItem(*entry)
+            if item.path is not None:
+                start = time.perf_counter()
+                try:
+                    with open(item.path, "rb") as fh:
+                        item.data = fh.read()
+                except Exception as ex:
+                    item.failed = True
+                    print(f"Error reading {item.name}: {ex}")
+                finally:
+                    if item.delete_after:
+                        try:
+                            os.remove(item.path)
+                        except OSError:
+                            pass
+                stats.busy += time.perf_counter() - start
+            stats.items += 1
+            out_q.put(item) # Blocks while downstream is full (backpressure)
+        out_q.put(None)
+
+    def _decompress_stage(self, job, in_q, out_q):
+        import engine # Loaded with the first import rather than at app startup
+        stats = job.stages["decompress"]
+        stats_lock = threading.Lock() # Pool workers update the stage stats concurrently
+
+        def decompress(item):
+            busy = 0.0
+            if not item.failed and not job.cancelled:
+                start = time.perf_counter()
+                try:
+                    with perf.span("importer.decompress"):
+                        raw = engine.scan_content(item.name, item.data)
+                    if raw is None:
+                        item.skipped = True
+                    else:
+                        item.text = raw.decode('utf-8', errors='ignore')
+                except Exception as ex:
+                    item.failed = True
+                    print(f"Error reading {item.name}: {ex}")
+                busy = time.perf_counter() - start
+            item.data = None
+            with stats_lock:
+                stats.busy += busy
+                stats.items += 1
+            return item
+
+        # Futures go downstream in arrival order, so the bounded queue also caps work in flight
+        with ThreadPoolExecutor(max_workers=DECOMPRESS_WORKERS, thread_name_prefix="import-inflate") as pool:
+            while True:
+                stats.observe_queue(in_q)
+                item = in_q.get()
+                if item is None:
+                    break
+                out_q.put(pool.submit(contextvars.copy_context().run, decompress, item))
+        out_q.put(None)
+
+    def _parse_stage(self, job, in_q, out_q):
+        import engine
+        stats = job.stages["parse"]
+        while True:
+            stats.observe_queue(in_q)
+            future = in_q.get()
+            if future is None:
+                break
+            item = future.result()
+            if not item.failed and not item.skipped and not job.cancelled:
+                start = time.perf_counter()
+                try:
+                    with perf.span("importer.parse") as span:
+                        item.runs = engine.parse_text(item.name, item.text)
+                        span.rows = len(item.runs)
+                except Exception as ex:
+                    item.failed = True
+                    print(f"Error processing {item.name}: {ex}")
+                stats.busy += time.perf_counter() - start
+            item.text = None
+            stats.items += 1
+            out_q.put(item)
+        out_q.put(None)
+
+    def _write_stage(self, job, in_q):
+        stats = job.stages["write"]
+        batch = []
+        batch_files = []
+        last_emit = 0.0
+
+        def flush():
+            if batch and not job.cancelled:
+                start = time.perf_counter()
+                with perf.span("importer.write") as span:
+                    saved = database.save_runs(batch)
+                    span.rows = saved
+                job.runs_saved += saved
+                stats.busy += time.perf_counter() - start
+            stats.items += len(batch_files)
+            job.files_done += len(batch_files)
+            batch.clear()
+            batch_files.clear()
+
+        while True:
+            stats.observe_queue(in_q)
+            item = in_q.get()
+            if item is None:
+                break
+            job.current_file = item.name
+            if item.failed:
+                job.files_failed += 1
+            elif item.skipped:
+                job.files_skipped += 1
+            batch.extend(item.runs)
+            batch_files.append(item.name)
+            # Commit when the batch is big enough or nothing else is ready yet
+            if len(batch) >= WRITE_BATCH_RUNS or in_q.empty():
+                flush()
+
+            now = time.perf_counter()
+            if now - last_emit >= PROGRESS_INTERVAL:
+                last_emit = now
+                self._emit(job, "running")
+        flush()
+
+    def _emit(self, job, state):
+        if job.on_progress:
+            try:
+                job.on_progress(ImportProgress(job, state))
+            except Exception as ex:
+                print(f"Import progress callback error: {ex}")
+
+    def _discard_pending(self, job):
+        """Remove uploads that arrived after cancellation."""
+        while True:
+            try:
+                item = job._files.get_nowait()
+            except queue.Empty:
+                return
+            if item and item[1] and item[2]:
+                try:
+                    os.remove(item[1])
+                except OSError:
+                    pass
+
+def format_stages(stages):
+    """Compact per-stage summary, e.g. for the performance panel."""
+    parts = []
+    for name in STAGES:
+        st = stages[name]
+        rate = f"{st['items_per_sec']:g}/s" if st["items_per_sec"] else "-"
+        parts.append(f"{name} {st['items']} @ {rate} (queue max {st['max_queue_depth']})")
+    return " • ".join(parts)
+
+def format_progress(p):
+    """One-line human readable progress text."""
+    text = f"Processing: {p.files_done}/{p.files_total} files • {p.runs_saved} runs"
+    if p.files_skipped:
+        text += f" • {p.files_skipped} without runs skipped"
+    if p.files_per_sec:
+        text += f" • {p.files_per_sec:.1f} files/s, {p.runs_per_sec:.0f} runs/s"
+    if p.eta is not None and p.files_done < p.files_total:
+        text += f" • ETA {int(p.eta)}s"
+    return text
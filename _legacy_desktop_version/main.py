@@ -1,12 +1,25 @@
+import time
+_import_started = time.perf_counter()
+
 import flet as ft
 import os
 import base64
 import json
+import importlib
 
 import database
-import engine
 import config
-from components import recent_runs, tower_analytics, session_analytics, height_analytics
+import refresh
+import persistence
+import perf
+
+# Set to print import time and time-to-first-frame (see benchmarks/startup.py)
+STARTUP_PROFILE = bool(os.getenv("MCSR_STARTUP_PROFILE"))
+
+# Each browser session gets its own database; handlers run with their page as flet's context page
+database.set_session_resolver(lambda: ft.context.page.session_id if ft.context.page else None)
+# ...and its own timing probes in the performance panel
+perf.set_scope_resolver(database.current_session_key)
 
 # Upload directory for file imports (server-side)
 UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
@@ -15,6 +28,10 @@ UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
 # MAIN APP
 # ===========================
 def main(page: ft.Page):
+    main_started = time.perf_counter()
+    # Analytics tabs are imported on first selection; only the always-visible panel loads here
+    from components import recent_runs
+
     # 1. Page Configuration
     page.title = "MCSR Practice Tracker v1.13 (Web)"
     page.theme_mode = ft.ThemeMode.DARK
@@ -24,30 +41,63 @@ def main(page: ft.Page):
     database.init_db()
     database.load_from_storage(page)
     
-    # Load Config
-    cfg = config.load_config(page)
+    # Load Config (cached per page; changes are written back shortly after)
+    cfg = config.get_config(page)
+
+    # Saves to browser storage are coalesced and run off the UI thread
+    db_key = database.current_session_key()
+
+    def persist_session():
+        with database.session(db_key):
+            return database.save_to_storage(page)
+
+    persister = persistence.PersistScheduler(persist_session)
 
     # --- FILE PICKER SETUP ---
     file_picker = ft.FilePicker()
     page.overlay.append(file_picker)
 
     # --- UI COMPONENTS ---
-    analytics_comp = tower_analytics.TowerAnalytics()
-    session_comp = session_analytics.SessionAnalytics()
-    height_comp = height_analytics.HeightAnalytics()
+    # Tab contents are created on first selection: (scheduler name, module, class)
+    TAB_SPECS = [
+        ("sessions", "components.session_analytics", "SessionAnalytics"),
+        ("towers", "components.tower_analytics", "TowerAnalytics"),
+        ("heights", "components.height_analytics", "HeightAnalytics"),
+    ]
+    tab_comps = [None] * len(TAB_SPECS)
+
+    def ensure_tab(index):
+        """Import, construct and mount a tab's component the first time it's needed."""
+        if tab_comps[index] is None:
+            name, module_name, class_name = TAB_SPECS[index]
+            comp = getattr(importlib.import_module(module_name), class_name)()
+            tab_comps[index] = comp
+            tabs.tabs[index].content = comp
+            if tabs.page:
+                tabs.update()
+            # Built straight from the database, so nothing is pending
+            scheduler.mark_clean(name)
+        return tab_comps[index]
+
+    def on_tab_change(e):
+        index = tabs.selected_index
+        if tab_comps[index] is None:
+            ensure_tab(index)
+        else:
+            scheduler.on_visible(TAB_SPECS[index][0])
     
     # Callback for clicking a run in the Recent list
     def go_to_tower_analytics(tower_name, run_type):
         tabs.selected_index = 1
+        analytics_comp = ensure_tab(1)
         tabs.update()
         
-        current_cfg = config.load_config(page)
-        mode = current_cfg.get("navigation_mode", "default")
-        
-        if mode == "filter":
+        if cfg.get("navigation_mode", "default") == "filter":
             analytics_comp.show_detail(tower_name, initial_filter_type=run_type)
         else:
             analytics_comp.show_detail(tower_name)
+        # Detail view is fresh; clears the pending grid rebuild without doing it
+        scheduler.mark_clean("towers")
 
     # Create the Recent Runs view
     recent_view, table_control = recent_runs.get_view(page, on_run_click=go_to_tower_analytics)
@@ -70,20 +120,21 @@ def main(page: ft.Page):
             ft.Tab(
                 text="Session Analytics",
                 icon=ft.icons.HISTORY,
-                content=session_comp
+                content=ft.Container()
             ),
             ft.Tab(
                 text="Tower Analytics",
                 icon=ft.icons.BAR_CHART,
-                content=analytics_comp
+                content=ft.Container()
             ),
             ft.Tab(
                 text="Height Analytics",
                 icon=ft.icons.HEIGHT,
-                content=height_comp
+                content=ft.Container()
             ),
         ],
-        expand=True
+        expand=True,
+        on_change=on_tab_change
     )
 
     right_panel = ft.Container(
@@ -102,10 +153,7 @@ def main(page: ft.Page):
             left_panel.update()
 
     def save_resize(e):
-        current_cfg = config.load_config(page)
-        current_cfg['left_panel_width'] = left_panel.width
-        config.save_config(page, current_cfg)
-        recent_runs.set_width(table_control, left_panel.width)
+        cfg.update({'left_panel_width': left_panel.width})
 
     divider = ft.GestureDetector(
         content=ft.Container(
@@ -166,23 +214,38 @@ def main(page: ft.Page):
         page.update()
 
     # --- STARTUP / REFRESH LOGIC ---
-    def refresh_ui():
-        set_loading(True)
-        try:
-            if hasattr(table_control, 'page') and table_control.page:
-                recent_runs.update_table(table_control)
-            
-            if hasattr(session_comp, 'page') and session_comp.page and session_comp.view_mode == "list":
-                session_comp.refresh_list()
-                
-            if hasattr(analytics_comp, 'page') and analytics_comp.page and analytics_comp.view_mode == "grid":
-                analytics_comp.show_grid()
+    # Each component declares the data slices it reads; hidden tabs rebuild when selected
+    scheduler = refresh.RefreshScheduler(on_error=lambda name, e: print(f"UI Refresh Error ({name}): {e}"))
+
+    def tab_visible(index):
+        comp = tab_comps[index]
+        return tabs.selected_index == index and comp is not None and bool(comp.page)
+
+    def refresh_sessions():
+        if tab_comps[0].view_mode == "list":
+            tab_comps[0].refresh_list()
+
+    def refresh_towers():
+        if tab_comps[1].view_mode == "grid":
+            tab_comps[1].show_grid()
 
-            if hasattr(height_comp, 'page') and height_comp.page and height_comp.view_mode == "list":
-                height_comp.show_list()
+    def refresh_heights():
+        if tab_comps[2].view_mode == "list":
+            tab_comps[2].show_list()
 
-        except Exception as e:
-            print(f"UI Refresh Error: {e}")
+    scheduler.register("recent_runs", {refresh.RECENT_RUNS}, lambda: recent_runs.update_table(table_control),
+                       is_visible=lambda: bool(table_control.page))
+    scheduler.register("sessions", {refresh.SESSIONS}, refresh_sessions, is_visible=lambda: tab_visible(0))
+    scheduler.register("towers", {refresh.TOWERS}, refresh_towers, is_visible=lambda: tab_visible(1))
+    scheduler.register("heights", {refresh.HEIGHTS}, refresh_heights, is_visible=lambda: tab_visible(2))
+
+    # Only the visible tab is built at startup
+    ensure_tab(tabs.selected_index)
+
+    def refresh_ui(slices=refresh.ALL_SLICES):
+        set_loading(True)
+        try:
+            scheduler.mark_dirty(slices)
         finally:
             set_loading(False)
 
@@ -197,9 +260,20 @@ def main(page: ft.Page):
         "count_before": 0,
         "status_text": None,
         "data_count_text": None,
+        "job": None,
+        "worker": None,
     }
 
+    # Parsing runs on a worker thread so uploads never block the event loop.
+    # The importer (and the log parser behind it) loads with the first import.
+    def get_import_worker():
+        if _import_state["worker"] is None:
+            import importer
+            _import_state["worker"] = importer.ImportWorker()
+        return _import_state["worker"]
+
     def open_import(e):
+        import importer
         # Hide the persistent welcome banner if it's visible
         if welcome_container.visible:
             welcome_container.visible = False
@@ -214,8 +288,11 @@ def main(page: ft.Page):
 
         # --- UPLOAD HANDLER (fires per-file as uploads complete) ---
         def on_upload(e: ft.FilePickerUploadEvent):
+            job = _import_state["job"]
             if e.error:
                 print(f"Upload error for {e.file_name}: {e.error}")
+                if job:
+                    job.skip_file(e.file_name)
                 return
             
             if e.progress < 1.0:
@@ -225,38 +302,41 @@ def main(page: ft.Page):
                 page.update()
                 return
             
-            # Upload complete (progress == 1.0) — process the file
-            _import_state["processed_files"] += 1
-            current = _import_state["processed_files"]
-            total = _import_state["total_files"]
-            
-            import_status.value = f"Processing: {current}/{total} — {e.file_name}"
+            # Upload complete (progress == 1.0) — hand the file to the import worker
+            if job:
+                job.add_file(e.file_name, os.path.join(UPLOAD_DIR, e.file_name))
+
+        def on_import_progress(p):
+            import_status.value = importer.format_progress(p)
             page.update()
-            
-            try:
-                upload_path = os.path.join(UPLOAD_DIR, e.file_name)
-                with open(upload_path, "rb") as fh:
-                    content = fh.read()
-                engine.process_file_content(e.file_name, content)
-                # Clean up uploaded file
-                try:
-                    os.remove(upload_path)
-                except:
-                    pass
-            except Exception as ex:
-                print(f"Error processing {e.file_name}: {ex}")
-            
-            # Check if all files are done
-            if current >= total:
-                database.save_to_storage(page)
-                count_after = database.get_row_count()
-                new_runs = count_after - _import_state["count_before"]
-                import_status.value = f"✅ Done! {new_runs} new run(s) added. ({count_after} total)"
-                if _import_state["data_count_text"]:
-                    _import_state["data_count_text"].value = f"Currently storing {count_after} runs in browser."
-                set_loading(False)
-                refresh_ui()
-        
+
+        def on_import_finished(p):
+            # Persist + refresh once per job
+            cancel_btn.visible = _import_state["job"] is not None and _import_state["job"].id != p.job_id
+            persister.request()
+            count_after = database.get_row_count()
+            new_runs = count_after - _import_state["count_before"]
+            if p.state == "cancelled":
+                import_status.value = f"Import cancelled after {p.files_done}/{p.files_total} file(s). {new_runs} new run(s) added."
+            else:
+                import_status.value = f"✅ Done! {new_runs} new run(s) added. ({count_after} total, {p.elapsed:.1f}s)"
+                if p.files_skipped:
+                    import_status.value += f"\n{p.files_skipped} file(s) had no practice runs and were skipped."
+            if _import_state["data_count_text"]:
+                _import_state["data_count_text"].value = f"Currently storing {count_after} runs in browser."
+            if _import_state["job"] and _import_state["job"].id == p.job_id:
+                _import_state["job"] = None
+            set_loading(False)
+            # New runs touch every slice; an import that added nothing changes none
+            refresh_ui(refresh.ALL_SLICES if new_runs else ())
+
+        def cancel_import(e):
+            job = _import_state["job"]
+            if job:
+                job.cancel()
+                import_status.value = "Cancelling import..."
+                page.update()
+
         file_picker.on_upload = on_upload
 
         # --- FILE PICK HANDLER ---
@@ -264,10 +344,17 @@ def main(page: ft.Page):
             if e.files is None or len(e.files) == 0:
                 return
             
+            if _import_state["job"]:
+                _import_state["job"].cancel()
+
             set_loading(True)
             _import_state["total_files"] = len(e.files)
             _import_state["processed_files"] = 0
             _import_state["count_before"] = database.get_row_count()
+            _import_state["job"] = get_import_worker().submit(importer.ImportJob(
+                len(e.files), on_progress=on_import_progress, on_finished=on_import_finished
+            ))
+            cancel_btn.visible = True
             
             import_status.value = f"Uploading {len(e.files)} file(s)..."
             page.update()
@@ -334,9 +421,9 @@ def main(page: ft.Page):
                                 with open(upload_path, "r", encoding="utf-8") as fh:
                                     content = fh.read()
                                 count = database.import_json(content)
-                                database.save_to_storage(page)
+                                persister.request()
                                 import_status.value = f"✅ Backup restored! {count} runs imported."
-                                refresh_ui()
+                                refresh_ui(refresh.ALL_SLICES if count else ())
                                 # Clean up
                                 os.remove(upload_path)
                             except Exception as ex:
@@ -362,7 +449,7 @@ def main(page: ft.Page):
         def clear_data(e):
             def confirm_clear(ce):
                 database.clear_db()
-                database.save_to_storage(page)
+                persister.request()
                 import_status.value = "All data cleared."
                 refresh_ui()
                 page.close(dlg_confirm)
@@ -418,6 +505,9 @@ def main(page: ft.Page):
             )
         )
 
+        cancel_btn = ft.TextButton("Cancel Import", icon=ft.icons.CANCEL, on_click=cancel_import,
+                                   visible=_import_state["job"] is not None)
+
         export_btn = ft.OutlinedButton("Export Data", icon=ft.icons.DOWNLOAD, on_click=export_data)
         backup_btn = ft.OutlinedButton("Import Backup", icon=ft.icons.RESTORE, on_click=import_backup)
         clear_btn = ft.TextButton("Clear All Data", icon=ft.icons.DELETE_FOREVER, 
@@ -437,6 +527,7 @@ def main(page: ft.Page):
                          size=14, color=ft.colors.BLUE_200, italic=True),
                 import_btn,
                 import_status,
+                cancel_btn,
                 ft.Divider(),
                 # ft.Text("Data Management", weight="bold", size=13),
                 # ft.Row([export_btn, backup_btn], spacing=10),
@@ -499,14 +590,14 @@ def main(page: ft.Page):
     # SETTINGS POPUP (appearance & behavior only)
     # ===========================
     def open_settings(e):
-        current_cfg = config.load_config(page)
+        current_cfg = cfg.as_dict()
         
         def save_settings(e):
             new_cfg = {
                 "left_panel_width": width_slider.value,
                 "navigation_mode": nav_radio.value,
             }
-            config.save_config(page, new_cfg)
+            cfg.update(new_cfg)
             dlg_modal.open = False
             page.snack_bar = ft.SnackBar(ft.Text("Settings saved!"))
             page.snack_bar.open = True
@@ -552,6 +643,134 @@ def main(page: ft.Page):
         dlg_modal.open = True
         page.update()
 
+    # ===========================
+    # PERFORMANCE PANEL (hidden, Ctrl+Shift+P)
+    # ===========================
+    PERF_COLUMNS = [("calls", "Calls"), ("total_ms", "Total ms"), ("p50_ms", "p50 ms"),
+                    ("p99_ms", "p99 ms"), ("max_ms", "Max ms"), ("rows", "Rows")]
+    SQL_COLUMNS = [("count", "Count"), ("total_ms", "Total ms"), ("max_ms", "Max ms"), ("slow", "Slow")]
+
+    def open_perf_panel(e=None):
+        import sqltrace
+        perf_table = ft.DataTable(
+            columns=[ft.DataColumn(ft.Text("Probe"))] +
+                    [ft.DataColumn(ft.Text(label), numeric=True) for _, label in PERF_COLUMNS],
+            column_spacing=16,
+            data_row_min_height=28,
+            data_row_max_height=28,
+        )
+        perf_status = ft.Text("", size=12, color="grey")
+        sql_table = ft.DataTable(
+            columns=[ft.DataColumn(ft.Text("Statement"))] +
+                    [ft.DataColumn(ft.Text(label), numeric=True) for _, label in SQL_COLUMNS],
+            column_spacing=16,
+            data_row_min_height=28,
+            data_row_max_height=28,
+        )
+        sql_plans = ft.Column(spacing=4)
+        tracer = database.get_sql_tracer()
+        sql_switch = ft.Switch(label="Trace SQL", value=tracer is not None)
+        slow_input = ft.TextField(
+            label="Slow ms", width=90, height=40, text_size=12, content_padding=5,
+            value=f"{tracer.slow_ms:g}" if tracer else f"{sqltrace.DEFAULT_SLOW_MS:g}",
+            keyboard_type=ft.KeyboardType.NUMBER
+        )
+
+        def fill_sql():
+            tracer = database.get_sql_tracer()
+            summary = tracer.summary(limit=15) if tracer else []
+            sql_table.rows = [
+                ft.DataRow(cells=[ft.DataCell(ft.Text(r["sql"][:70] + (" [SCAN]" if r["scans"] else ""),
+                                                      size=12, tooltip=r["sql"]))] + [
+                    ft.DataCell(ft.Text(f"{r[key]:g}", size=12)) for key, _ in SQL_COLUMNS
+                ])
+                for r in summary
+            ]
+            sql_plans.controls = [
+                ft.Text(r["sql"][:120] + "\n" + "\n".join("    " + p for p in r["plan"]),
+                        size=11, font_family="monospace", selectable=True)
+                for r in summary if r["plan"]
+            ]
+
+        def on_trace_toggle(e):
+            if sql_switch.value:
+                try:
+                    database.enable_sql_trace(float(slow_input.value))
+                except ValueError:
+                    database.enable_sql_trace()
+            else:
+                database.disable_sql_trace()
+            fill_table()
+            page.update()
+
+        sql_switch.on_change = on_trace_toggle
+        slow_input.on_submit = on_trace_toggle
+
+        def fill_table():
+            perf_table.rows = [
+                ft.DataRow(cells=[ft.DataCell(ft.Text(r["name"].replace("components.", ""), size=12))] + [
+                    ft.DataCell(ft.Text("-" if r[key] is None else f"{r[key]:g}", size=12))
+                    for key, _ in PERF_COLUMNS
+                ])
+                for r in perf.report()
+            ]
+            perf_status.value = (f"{len(perf_table.rows)} probes • instrumentation {'on' if perf.enabled else 'off'}\n"
+                                 f"{persistence.format_stats(persister.stats())}")
+            worker = _import_state["worker"]
+            if worker and worker.last_stages:
+                import importer
+                perf_status.value += f"\nLast import: {importer.format_stages(worker.last_stages)}"
+            fill_sql()
+
+        def on_refresh(e):
+            fill_table()
+            page.update()
+
+        def on_reset(e):
+            perf.reset()
+            if database.get_sql_tracer():
+                database.get_sql_tracer().reset()
+            fill_table()
+            page.update()
+
+        def on_export(e):
+            tracer = database.get_sql_tracer()
+            report = {"probes": perf.report(), "sql": tracer.report() if tracer else None,
+                      "storage": persister.stats(), "import_stages": _import_state["worker"] and _import_state["worker"].last_stages}
+            b64 = base64.b64encode(json.dumps(report, indent=2).encode("utf-8")).decode("utf-8")
+            page.launch_url(f"data:application/json;base64,{b64}")
+            perf_status.value = "✅ Report generated! Download should start shortly."
+            page.update()
+
+        fill_table()
+        dlg_perf = ft.AlertDialog(
+            title=ft.Text("Performance"),
+            content=ft.Column([
+                perf_status,
+                ft.Row([perf_table], scroll=ft.ScrollMode.AUTO),
+                ft.Divider(),
+                ft.Row([ft.Text("SQL", weight="bold"), sql_switch, slow_input], spacing=15),
+                ft.Row([sql_table], scroll=ft.ScrollMode.AUTO),
+                sql_plans,
+            ], height=450, width=800, scroll=ft.ScrollMode.ADAPTIVE),
+            actions=[
+                ft.TextButton("Refresh", on_click=on_refresh),
+                ft.TextButton("Reset", on_click=on_reset),
+                ft.TextButton("Export JSON", on_click=on_export),
+                ft.TextButton("Close", on_click=lambda e: page.close(dlg_perf)),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        page.dialog = dlg_perf
+        dlg_perf.open = True
+        page.update()
+
+    def on_keyboard(e: ft.KeyboardEvent):
+        if e.ctrl and e.shift and e.key.upper() == "P":
+            open_perf_panel()
+
+    page.on_keyboard_event = on_keyboard
+
     # --- HEADER ---
     header = ft.Row(
         controls=[
@@ -580,10 +799,54 @@ def main(page: ft.Page):
         ft.Column([main_layout, welcome_container], expand=True, spacing=0)
     )
     
-    # Initialize width for scaling
+    # Initialize width for scaling, then follow changes (divider drag or settings)
     recent_runs.set_width(table_control, left_panel.width)
+    cfg.subscribe(lambda changed: recent_runs.set_width(table_control, changed["left_panel_width"]),
+                  keys={"left_panel_width"})
+
+    # Write pending changes while the browser can still receive them (tab hidden / closing)
+    def on_lifecycle_change(e):
+        if e.state in (ft.AppLifecycleState.HIDE, ft.AppLifecycleState.INACTIVE,
+                       ft.AppLifecycleState.PAUSE, ft.AppLifecycleState.DETACH):
+            cfg.flush()
+            persister.flush()
+
+    page.on_app_lifecycle_state_change = on_lifecycle_change
+
+    # Before the session database is closed (page gone) or evicted: stop the
+    # import writing into it and write the pending save while the data still exists
+    def before_session_close():
+        if _import_state["job"]:
+            _import_state["job"].cancel()
+        persister.shutdown()
+
+    database.add_close_hook(db_key, before_session_close)
+
+    # Session database lifecycle: a disconnected page's data may be evicted, so reload on return
+    def on_reconnect(e):
+        nonlocal persister
+        if not database.attach_session(db_key):
+            database.init_db()
+            database.load_from_storage(page)
+            persister = persistence.PersistScheduler(persist_session)
+            database.add_close_hook(db_key, before_session_close)
+            refresh_ui()
+
+    page.on_connect = on_reconnect
+    page.on_disconnect = lambda e: database.detach_session(db_key)
+
+    def on_page_close(e):
+        config.discard_config(page)
+        database.close_session(db_key)
+        perf.forget_scope(db_key)
+
+    page.on_close = on_page_close
     
     page.update() # Final build sync before data refresh
+    if STARTUP_PROFILE:
+        now = time.perf_counter()
+        print(f"[startup] module import: {(main_started - _import_started) * 1000:.1f} ms (first page only), "
+              f"main() to first frame: {(now - main_started) * 1000:.1f} ms")
 
     # --- STARTUP MESSAGE ---
     row_count = database.get_row_count()
@@ -0,0 +1,191 @@
+import functools
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# ===========================
+# HOT-PATH TIMING (no flet imports)
+# ===========================
+# Probes collect call counts, total time and rows returned, plus the most
+# recent durations in a fixed-size ring buffer for p50/p99. Recording is a
+# few attribute updates and a deque append; with `enabled = False` wrappers
+# call straight through.
+#
+# Hot per-line functions use sample_every=N: only every Nth call is timed,
+# and it is counted as N calls, so totals are extrapolated from the samples.
+#
+# Probes are kept per scope: the app sets a resolver returning the browser
+# session, so each page's panel only shows its own timings (the import
+# stages run bound to their job's session). Without a resolver (CLI) there is
+# one process-wide scope. Updates take the probe's lock, since the import
+# stages, persister and UI handlers record from different threads.
+
+SAMPLE_SIZE = 512 # Recent durations kept per probe
+
+enabled = True
+_probes = {} # (scope, name) -> Probe
+_probes_lock = threading.Lock()
+_scope_resolver = None
+
+def set_scope_resolver(func):
+    """func() returns the scope (e.g. session key) probes record into right now."""
+    global _scope_resolver
+    _scope_resolver = func
+
+def current_scope():
+    if _scope_resolver is None:
+        return None
+    try:
+        return _scope_resolver()
+    except Exception:
+        return None
+
+class Probe:
+    __slots__ = ("name", "calls", "timed", "total", "max", "rows", "samples", "lock")
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = 0
+            self.timed = 0
+            self.total = 0.0
+            self.max = 0.0
+            self.rows = 0
+            self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def record(self, seconds, rows=None, calls=1):
+        with self.lock:
+            self.calls += calls
+            self.timed += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            self.samples.append(seconds)
+            if rows is not None:
+                self.rows += rows
+
+    def snapshot(self):
+        """Plain dict of the stats, times in milliseconds."""
+        with self.lock:
+            calls, timed, total, longest, rows = self.calls, self.timed, self.total, self.max, self.rows
+            samples = sorted(self.samples)
+        scale = calls / timed if timed else 0
+        return {
+            "name": self.name,
+            "calls": calls,
+            "timed": timed,
+            "total_ms": round(total * scale * 1000, 3),
+            "mean_ms": round(total / timed * 1000, 4) if timed else None,
+            "p50_ms": round(_nearest_rank(samples, 0.50) * 1000, 4) if samples else None,
+            "p99_ms": round(_nearest_rank(samples, 0.99) * 1000, 4) if samples else None,
+            "max_ms": round(longest * 1000, 4),
+            "rows": rows,
+        }
+
+def _nearest_rank(sorted_values, q):
+    idx = max(0, min(len(sorted_values) - 1, int(q * len(sorted_values) + 0.5) - 1))
+    return sorted_values[idx]
+
+def get_probe(name):
+    """The probe for `name` in the current scope."""
+    key = (current_scope(), name)
+    probe = _probes.get(key)
+    if probe is None:
+        with _probes_lock:
+            probe = _probes.get(key)
+            if probe is None:
+                probe = _probes[key] = Probe(name)
+    return probe
+
+def _row_count(result):
+    # Lists/dicts of rows count as rows returned; scalars (ints, None) don't
+    if isinstance(result, (list, tuple, dict)):
+        return len(result)
+    return None
+
+def timed(name=None, sample_every=1):
+    """
+    Decorator recording every call of a function under `name`
+    (default: module.qualname).
+    """
+    def decorator(func):
+        probe_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        if sample_every <= 1:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                result = func(*args, **kwargs)
+                get_probe(probe_name).record(time.perf_counter() - start, _row_count(result))
+                return result
+        else:
+            counter = itertools.count(1) # next() is atomic, so no lock on the skipped calls
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not enabled or next(counter) % sample_every:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                result = func(*args, **kwargs)
+                get_probe(probe_name).record(time.perf_counter() - start, calls=sample_every)
+                return result
+        return wrapper
+    return decorator
+
+@contextmanager
+def span(name):
+    """
+    Time a block. Set `.rows` on the yielded object to record rows:
+
+        with perf.span("import.file") as s:
+            s.rows = len(runs)
+    """
+    if not enabled:
+        yield _Span()
+        return
+    s = _Span()
+    start = time.perf_counter()
+    try:
+        yield s
+    finally:
+        get_probe(name).record(time.perf_counter() - start, s.rows)
+
+class _Span:
+    __slots__ = ("rows",)
+
+    def __init__(self):
+        self.rows = None
+
+def _scope_probes(scope):
+    with _probes_lock:
+        return [p for (s, _), p in _probes.items() if s == scope]
+
+def report(sort_by="total_ms"):
+    """Snapshots of every probe called in the current scope, slowest first."""
+    rows = [p.snapshot() for p in _scope_probes(current_scope())]
+    rows = [r for r in rows if r["calls"]]
+    rows.sort(key=lambda r: r[sort_by] or 0, reverse=True)
+    return rows
+
+def export_json():
+    return json.dumps({"generated_at": time.time(), "probes": report()}, indent=2)
+
+def reset():
+    """Clear the current scope's probes."""
+    for probe in _scope_probes(current_scope()):
+        probe.reset()
+
+def forget_scope(scope):
+    """Drop a finished scope's probes (e.g. when its session closes)."""
+    with _probes_lock:
+        for key in [k for k in _probes if k[0] == scope]:
+            del _probes[key]
@@ -0,0 +1,109 @@
+import threading
+import time
+
+# ===========================
+# WRITE-BEHIND PERSISTENCE
+# ===========================
+# Saving serializes the whole table and pushes it to client storage, so
+# writers only request() a save. Requests within PERSIST_DELAY of the first
+# one collapse into a single persist, which runs on a worker thread.
+# flush() persists immediately if anything is pending (e.g. on shutdown).
+
+PERSIST_DELAY = 1.0 # Seconds to collect further requests before saving
+
+class PersistScheduler:
+    def __init__(self, save_func, delay=PERSIST_DELAY):
+        """save_func: writes everything out, returns the number of bytes written."""
+        self.save_func = save_func
+        self.delay = delay
+
+        self.requests = 0
+        self.persists = 0
+        self.last_duration = None
+        self.last_bytes = None
+        self.last_at = None
+
+        self._cond = threading.Condition()
+        self._persist_lock = threading.Lock()
+        self._due = None # perf_counter deadline of the pending save
+        self._closed = False
+        self._thread = None
+
+    @property
+    def pending(self):
+        return self._due is not None
+
+    def request(self):
+        """Ask for a save; returns immediately."""
+        with self._cond:
+            self.requests += 1
+            if self._due is None:
+                self._due = time.perf_counter() + self.delay
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="persist-worker", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self):
+        """Persist now if a save is pending, and wait for one already running. Returns True if it saved."""
+        with self._cond:
+            pending = self._due is not None
+            self._due = None
+        if pending:
+            self._persist()
+        else:
+            with self._persist_lock:
+                pass
+        return pending
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "persists": self.persists,
+            "pending": self.pending,
+            "last_ms": round(self.last_duration * 1000, 1) if self.last_duration is not None else None,
+            "last_bytes": self.last_bytes,
+            "last_at": self.last_at,
+        }
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._due is None:
+                    if self._closed:
+                        return
+                    # Idle: let the thread exit, request() restarts it
+                    if not self._cond.wait(timeout=5) and self._due is None:
+                        return
+                wait = self._due - time.perf_counter()
+                if wait > 0 and not self._closed:
+                    self._cond.wait(wait)
+                    continue
+                self._due = None
+            self._persist()
+
+    def _persist(self):
+        with self._persist_lock:
+            start = time.perf_counter()
+            try:
+                written = self.save_func()
+            except Exception as e:
+                print(f"Persist error: {e}")
+                return
+            self.last_duration = time.perf_counter() - start
+            self.last_bytes = written
+            self.last_at = time.time()
+            self.persists += 1
+
+def format_stats(stats):
+    """One-line summary for the UI."""
+    if stats["last_ms"] is None:
+        return "Storage: not saved yet"
+    return (f"Storage: last save {stats['last_ms']} ms, {stats['last_bytes'] / 1024:.1f} KB • "
+            f"{stats['persists']} saves for {stats['requests']} requests")
@@ -0,0 +1,72 @@
+# ===========================
+# DIRTY-FLAG REFRESH SCHEDULER
+# ===========================
+# Components declare which data slices they read. Writers mark slices dirty,
+# and only the components that are visible right now get rebuilt; the rest
+# rebuild when they are shown again.
+
+# Data slices
+RECENT_RUNS = "recent_runs"
+TOWERS = "towers"
+HEIGHTS = "heights"
+SESSIONS = "sessions"
+
+ALL_SLICES = frozenset({RECENT_RUNS, TOWERS, HEIGHTS, SESSIONS})
+
+class RefreshScheduler:
+    def __init__(self, on_error=None):
+        self._components = {} # name -> (slices, refresh_func, is_visible_func)
+        self._dirty = set()
+        self.on_error = on_error
+
+    def register(self, name, slices, refresh_func, is_visible=None):
+        """
+        refresh_func: rebuilds the component from the database.
+        is_visible: returns True if the component is on screen right now.
+        """
+        self._components[name] = (frozenset(slices), refresh_func, is_visible or (lambda: True))
+        self._dirty.add(name)
+
+    def mark_dirty(self, slices=ALL_SLICES):
+        """Flag every component reading any of `slices`, then rebuild the visible ones."""
+        slices = frozenset(slices)
+        for name, (deps, _, _) in self._components.items():
+            if deps & slices:
+                self._dirty.add(name)
+        return self.flush()
+
+    def mark_clean(self, name):
+        """The component was just rebuilt by other means (e.g. first construction)."""
+        self._dirty.discard(name)
+
+    def is_dirty(self, name):
+        return name in self._dirty
+
+    def flush(self):
+        """Rebuild dirty components that are currently visible. Returns their names."""
+        refreshed = []
+        for name in list(self._dirty):
+            _, refresh_func, is_visible = self._components[name]
+            if is_visible():
+                self._run(name, refresh_func)
+                refreshed.append(name)
+        return refreshed
+
+    def on_visible(self, name):
+        """Call when a component is shown (e.g. its tab was selected)."""
+        if name in self._dirty and name in self._components:
+            self._run(name, self._components[name][1])
+            return True
+        return False
+
+    def _run(self, name, refresh_func):
+        self._dirty.discard(name)
+        try:
+            refresh_func()
+        except Exception as e:
+            # Leave it dirty so the next show retries
+            self._dirty.add(name)
+            if self.on_error:
+                self.on_error(name, e)
+            else:
+                print(f"Refresh error ({name}): {e}")
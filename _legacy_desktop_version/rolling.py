@@ -0,0 +1,205 @@
+import heapq
+import math
+from collections import deque
+
+# ===========================
+# ROLLING WINDOW STATISTICS (no flet imports)
+# ===========================
+# Each roller keeps a fixed-size window over a time-ordered stream.
+# push() is O(1) or O(log w) and returns the stat for the current window,
+# or None until the window is full.
+
+DEFAULT_WINDOW = 50
+
+class RollingMean:
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+
+    def push(self, val):
+        self.values.append(val)
+        self.total += val
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+        if len(self.values) < self.window:
+            return None
+        return self.total / self.window
+
+class RollingRate(RollingMean):
+    """Share of truthy values in the window, as a percentage (e.g. success rate)."""
+    def push(self, flag):
+        mean = super().push(1.0 if flag else 0.0)
+        return None if mean is None else mean * 100
+
+class RollingMin:
+    """Window minimum via a monotonic deque (amortized O(1))."""
+    def __init__(self, window):
+        self.window = window
+        self.count = 0
+        self.candidates = deque() # (index, value), values increasing
+
+    def push(self, val):
+        i = self.count
+        self.count += 1
+        while self.candidates and self.candidates[-1][1] >= val:
+            self.candidates.pop()
+        self.candidates.append((i, val))
+        if self.candidates[0][0] <= i - self.window:
+            self.candidates.popleft()
+        if self.count < self.window:
+            return None
+        return self.candidates[0][1]
+
+class RollingQuantile:
+    """
+    Window quantile (nearest-rank) via two heaps with lazy deletion, O(log w).
+    `low` holds the k smallest entries of the window, k = ceil(q * size),
+    so the answer is always the top of `low`.
+    """
+    def __init__(self, window, q):
+        self.window = window
+        self.q = q
+        self.count = 0
+        self.entries = deque() # (value, index) in arrival order
+        self.low = []  # max-heap of (-value, -index)
+        self.high = [] # min-heap of (value, index)
+        self.low_size = 0
+        self.high_size = 0
+        self.expired = set()
+
+    def push(self, val):
+        entry = (val, self.count)
+        self.count += 1
+        self.entries.append(entry)
+
+        if self.low_size and entry <= self._low_top():
+            heapq.heappush(self.low, (-entry[0], -entry[1]))
+            self.low_size += 1
+        else:
+            heapq.heappush(self.high, entry)
+            self.high_size += 1
+
+        if len(self.entries) > self.window:
+            self._expire(self.entries.popleft())
+
+        self._rebalance()
+        if len(self.entries) < self.window:
+            return None
+        return self._low_top()[0]
+
+    def _low_top(self):
+        self._prune()
+        return (-self.low[0][0], -self.low[0][1])
+
+    def _expire(self, entry):
+        # Decide which heap holds it before marking it, or pruning would hide it
+        in_low = self.low_size and entry <= self._low_top()
+        self.expired.add(entry[1])
+        if in_low:
+            self.low_size -= 1
+        else:
+            self.high_size -= 1
+        self._prune()
+
+    def _prune(self):
+        while self.low and -self.low[0][1] in self.expired:
+            self.expired.discard(-heapq.heappop(self.low)[1])
+        while self.high and self.high[0][1] in self.expired:
+            self.expired.discard(heapq.heappop(self.high)[1])
+
+    def _rebalance(self):
+        target = max(1, math.ceil(self.q * len(self.entries)))
+        while self.low_size > target:
+            self._prune()
+            v, i = heapq.heappop(self.low)
+            heapq.heappush(self.high, (-v, -i))
+            self.low_size -= 1
+            self.high_size += 1
+        while self.low_size < target and self.high_size:
+            self._prune()
+            v, i = heapq.heappop(self.high)
+            heapq.heappush(self.low, (-v, -i))
+            self.high_size -= 1
+            self.low_size += 1
+        self._prune()
+
+# Overlay name -> roller factory. Order is the order shown in the UI.
+OVERLAYS = {
+    "Mean": lambda w: RollingMean(w),
+    "Median": lambda w: RollingQuantile(w, 0.5),
+    "P90": lambda w: RollingQuantile(w, 0.9),
+    "Best": lambda w: RollingMin(w),
+}
+
+# Rolling success rate over every attempt (fails included), rather than a
+# stat of the plotted values. Drawn against its own 0-100% axis.
+RATE = "Rate"
+
+def rolling_series(values, window, stat):
+    """
+    Run an overlay stat over a time-ordered sequence.
+    Returns (x, value) points, x being the index of the window's last value,
+    so they line up with ungrouped chart coords.
+    """
+    if stat not in OVERLAYS or window < 1:
+        return []
+    roller = OVERLAYS[stat](window)
+    points = []
+    for i, val in enumerate(values):
+        result = roller.push(val)
+        if result is not None:
+            points.append((i, result))
+    return points
+
+def rate_series(attempts, plotted, window):
+    """
+    Rolling success rate (%) over time-ordered (key, is_success) attempts,
+    sampled at the charted runs. `plotted` holds the charted runs' keys in
+    chart order; returns (x, rate) points with x the index into `plotted`.
+    """
+    if window < 1:
+        return []
+    roller = RollingRate(window)
+    rate_at = {}
+    for key, flag in attempts:
+        rate_at[key] = roller.push(flag)
+    return [(i, rate_at[key]) for i, key in enumerate(plotted) if rate_at.get(key) is not None]
+
+def rate_scale(values):
+    """(lo, hi) of the plotted values; a rate of 0% maps to lo and 100% to hi."""
+    if not values:
+        return 0.0, 100.0
+    lo, hi = min(values), max(values)
+    return (lo, hi) if hi > lo else (lo, lo + 1)
+
+def scale_rates(points, lo, hi):
+    """Map (x, rate %) points onto the [lo, hi] value range of the chart."""
+    return [(x, lo + rate / 100 * (hi - lo)) for x, rate in points]
+
+def rate_ticks(lo, hi, step=25):
+    """(value, percent) positions for labelling the rate axis."""
+    return [(lo + pct / 100 * (hi - lo), pct) for pct in range(0, 101, step)]
+
+def window_comparison(values, window, stat="Mean"):
+    """
+    Stat of the last `window` values vs. the `window` before them.
+    Returns (latest, previous); either may be None if there is not enough data.
+    """
+    if stat == RATE:
+        make = lambda: RollingRate(window)
+    elif stat in OVERLAYS:
+        make = lambda: OVERLAYS[stat](window)
+    else:
+        return None, None
+
+    def last_full(seq):
+        result = None
+        roller = make()
+        for val in seq:
+            result = roller.push(val)
+        return result
+
+    latest = last_full(values[-window:])
+    previous = last_full(values[-2 * window:-window]) if len(values) >= 2 * window else None
+    return latest, previous
@@ -0,0 +1,294 @@
+import re
+import threading
+import time
+from collections import deque
+
+# ===========================
+# SQL TRACE + SLOW-QUERY LOG (no flet imports)
+# ===========================
+# database._get_conn() hands out a TracedConnection while tracing is on.
+# Each statement is timed from execute() through its fetch calls; the
+# sqlite3 trace callback supplies the statement with its parameters bound.
+# Statements at or above `slow_ms` get their EXPLAIN QUERY PLAN captured
+# (once per distinct statement) so table scans and temp B-trees show up.
+# One tracer serves every session and the import writer thread: the trace
+# callback runs on the thread executing the statement, so the expanded SQL
+# is handed over in thread-local state, and the logs are updated under a lock.
+
+DEFAULT_SLOW_MS = 20.0
+LOG_SIZE = 2000 # Recent statements kept
+SLOW_LOG_SIZE = 200
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize(sql):
+    return _WHITESPACE.sub(" ", sql).strip()
+
+class Statement:
+    __slots__ = ("sql", "expanded", "params", "seconds", "rows", "at", "slow")
+
+    def __init__(self, sql, expanded, params):
+        self.sql = sql
+        self.expanded = expanded
+        self.params = params
+        self.seconds = 0.0
+        self.rows = 0
+        self.at = time.time()
+        self.slow = False
+
+    def to_dict(self):
+        return {
+            "sql": self.sql, "expanded": self.expanded, "ms": round(self.seconds * 1000, 3),
+            "rows": self.rows, "at": self.at, "slow": self.slow,
+        }
+
+class SqlTracer:
+    def __init__(self, slow_ms=DEFAULT_SLOW_MS):
+        self.slow_ms = slow_ms
+        self.log = deque(maxlen=LOG_SIZE)
+        self.slow_log = deque(maxlen=SLOW_LOG_SIZE)
+        self.totals = {} # normalized sql -> [count, seconds, max_seconds, slow_count, rows]
+        self.plans = {}  # normalized sql -> [plan detail lines]
+        self._wrapped = {} # id(conn) -> TracedConnection
+        self._local = threading.local() # last_expanded, explaining (per executing thread)
+        self._lock = threading.Lock()
+
+    def wrap(self, conn):
+        """TracedConnection for `conn`, hooking its trace callback the first time."""
+        with self._lock:
+            wrapped = self._wrapped.get(id(conn))
+            if wrapped is None or wrapped.raw is not conn:
+                conn.set_trace_callback(self._on_trace)
+                wrapped = self._wrapped[id(conn)] = TracedConnection(conn, self)
+            return wrapped
+
+    def forget(self, conn):
+        """Stop tracking a connection that is about to close."""
+        with self._lock:
+            self._wrapped.pop(id(conn), None)
+
+    def detach(self):
+        with self._lock:
+            wrapped_conns = list(self._wrapped.values())
+            self._wrapped.clear()
+        for wrapped in wrapped_conns:
+            try:
+                wrapped.raw.set_trace_callback(None)
+            except Exception:
+                pass # Already closed
+
+    def reset(self):
+        with self._lock:
+            self.log.clear()
+            self.slow_log.clear()
+            self.totals.clear()
+            self.plans.clear()
+
+    def _on_trace(self, expanded):
+        # Runs on the thread executing the statement
+        if not getattr(self._local, "explaining", False):
+            self._local.last_expanded = expanded
+
+    # --- Recording (called by _TracedCursor) ---
+    def begin(self, sql, params):
+        entry = Statement(normalize(sql), getattr(self._local, "last_expanded", None), params)
+        self._local.last_expanded = None
+        with self._lock:
+            self.log.append(entry)
+        return entry
+
+    def add(self, conn, entry, seconds, rows=0):
+        # An entry belongs to one cursor, so only the shared logs need the lock
+        entry.seconds += seconds
+        entry.rows += rows
+        if not entry.slow and entry.seconds * 1000 >= self.slow_ms:
+            entry.slow = True
+            with self._lock:
+                self.slow_log.append(entry)
+                explain = entry.sql not in self.plans
+            if explain:
+                # Run outside the lock: the plan query needs the connection
+                plan = self._explain(conn, entry)
+                with self._lock:
+                    self.plans.setdefault(entry.sql, plan)
+
+    def close(self, entry):
+        """Fold a finished statement into the per-SQL totals."""
+        with self._lock:
+            totals = self.totals.get(entry.sql)
+            if totals is None:
+                totals = self.totals[entry.sql] = [0, 0.0, 0.0, 0, 0]
+            totals[0] += 1
+            totals[1] += entry.seconds
+            totals[2] = max(totals[2], entry.seconds)
+            totals[3] += 1 if entry.slow else 0
+            totals[4] += entry.rows
+
+    def _explain(self, conn, entry):
+        verb = entry.sql.split(" ", 1)[0].upper()
+        if verb not in ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT"):
+            return None
+        self._local.explaining = True
+        try:
+            rows = conn.execute("EXPLAIN QUERY PLAN " + entry.sql, entry.params).fetchall()
+        except Exception as e:
+            return [f"(plan unavailable: {e})"]
+        finally:
+            self._local.explaining = False
+        # rows: (id, parent, notused, detail); indent children under parents
+        depth = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            lines.append("  " * depth[node_id] + detail)
+        return lines
+
+    # --- Reports ---
+    def summary(self, limit=None):
+        """Per-statement totals, most total time first."""
+        with self._lock:
+            totals = [(sql, tuple(t), self.plans.get(sql)) for sql, t in self.totals.items()]
+        rows = []
+        for sql, (count, seconds, max_s, slow, n_rows), plan in totals:
+            rows.append({
+                "sql": sql, "count": count,
+                "total_ms": round(seconds * 1000, 3),
+                "mean_ms": round(seconds / count * 1000, 3),
+                "max_ms": round(max_s * 1000, 3),
+                "slow": slow, "rows": n_rows,
+                "plan": plan,
+                "scans": has_scan(plan),
+            })
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def report(self, limit=None):
+        summary = self.summary(limit)
+        with self._lock:
+            statements = sum(t[0] for t in self.totals.values())
+            slow = [dict(s.to_dict(), plan=self.plans.get(s.sql)) for s in self.slow_log]
+        return {
+            "slow_ms": self.slow_ms,
+            "statements": statements,
+            "summary": summary,
+            "slow": slow,
+        }
+
+def has_scan(plan):
+    """True if a captured plan walks a whole table or sorts through a temp B-tree."""
+    if not plan:
+        return False
+    return any(line.strip().startswith("SCAN") or "TEMP B-TREE" in line for line in plan)
+
+class _TracedCursor:
+    def __init__(self, cursor, tracer, conn):
+        self._cursor = cursor
+        self._tracer = tracer
+        self._conn = conn
+        self._entry = None
+
+    def _finish(self):
+        if self._entry is not None:
+            self._tracer.close(self._entry)
+            self._entry = None
+
+    def execute(self, sql, params=()):
+        self._finish()
+        start = time.perf_counter()
+        self._cursor.execute(sql, params)
+        elapsed = time.perf_counter() - start
+        self._entry = self._tracer.begin(sql, params)
+        self._tracer.add(self._conn, self._entry, elapsed)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._finish()
+        start = time.perf_counter()
+        self._cursor.executemany(sql, seq_of_params)
+        elapsed = time.perf_counter() - start
+        entry = self._tracer.begin(sql, ())
+        self._tracer.add(self._conn, entry, elapsed, max(self._cursor.rowcount, 0))
+        self._tracer.close(entry)
+        return self
+
+    def _timed_fetch(self, fetch, *args):
+        start = time.perf_counter()
+        result = fetch(*args)
+        if self._entry is not None:
+            if isinstance(result, list):
+                n = len(result)
+                exhausted = fetch == self._cursor.fetchall or n < args[0]
+            else:
+                n = 0 if result is None else 1
+                exhausted = result is None
+            self._tracer.add(self._conn, self._entry, time.perf_counter() - start, n)
+            if exhausted:
+                self._finish()
+        return result
+
+    def fetchone(self):
+        return self._timed_fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed_fetch(self._cursor.fetchmany, size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._timed_fetch(self._cursor.fetchall)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __del__(self):
+        # Statements whose rows were never fully fetched still count
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class TracedConnection:
+    """Drop-in stand-in for the sqlite3 connection that times every statement."""
+    def __init__(self, conn, tracer):
+        self.raw = conn
+        self._tracer = tracer
+
+    def cursor(self):
+        return _TracedCursor(self.raw.cursor(), self._tracer, self.raw)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def __enter__(self):
+        self.raw.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self.raw.__exit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+def format_report(report, out_limit=15):
+    """Plain-text version of SqlTracer.report() for the CLI."""
+    lines = [f"{report['statements']} statements traced, slow threshold {report['slow_ms']} ms", ""]
+    lines.append(f"{'count':>7} {'total ms':>10} {'max ms':>9} {'slow':>5}  statement")
+    for r in report["summary"][:out_limit]:
+        flag = " [SCAN]" if r["scans"] else ""
+        lines.append(f"{r['count']:>7} {r['total_ms']:>10.2f} {r['max_ms']:>9.2f} {r['slow']:>5}  "
+                     f"{r['sql'][:100]}{flag}")
+    plans = [r for r in report["summary"] if r["plan"]]
+    if plans:
+        lines += ["", "Query plans of slow statements:"]
+        for r in plans:
+            lines.append(f"- {r['sql'][:120]}")
+            lines.extend("    " + p for p in r["plan"])
+    return "\n".join(lines)
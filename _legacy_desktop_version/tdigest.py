@@ -0,0 +1,134 @@
+import math
+
+# ===========================
+# T-DIGEST QUANTILE SKETCH (no flet imports)
+# ===========================
+# Merging t-digest (Dunning): values are summarized by a few hundred weighted
+# centroids, small near the tails and larger around the median, so extreme
+# quantiles stay accurate. Digests are mergeable: combining the digests of
+# two groups gives (approximately) the digest of their union. Memory and
+# quantile() cost depend on the compression, not on how many values went in.
+
+DEFAULT_COMPRESSION = 100
+BUFFER_FACTOR = 5 # Unmerged values kept before compressing, per unit of compression
+
+class TDigest:
+    __slots__ = ("compression", "means", "weights", "total", "min", "max", "_buffer")
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = []
+        self.weights = []
+        self.total = 0
+        self.min = None
+        self.max = None
+        self._buffer = []
+
+    def __len__(self):
+        return self.total + len(self._buffer)
+
+    def add(self, value, weight=1):
+        self._buffer.append((value, weight))
+        if len(self._buffer) >= BUFFER_FACTOR * self.compression:
+            self._compress()
+
+    def merge(self, other):
+        """Fold another digest into this one."""
+        other._compress()
+        if other.total:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+            self._buffer.extend(zip(other.means, other.weights))
+            self._compress()
+        return self
+
+    def quantile(self, q):
+        """Estimated q-quantile (0..1), or None if empty."""
+        self._compress()
+        n = len(self.means)
+        if n == 0:
+            return None
+        if n == 1:
+            return self.means[0]
+        means, weights = self.means, self.weights
+        index = q * self.total
+        # Tails: interpolate between the extreme value and the outer centroid
+        if index < weights[0] / 2:
+            return self.min + (means[0] - self.min) * index / (weights[0] / 2)
+        if index > self.total - weights[-1] / 2:
+            tail = self.total - index
+            return self.max - (self.max - means[-1]) * tail / (weights[-1] / 2)
+        seen = weights[0] / 2
+        for i in range(n - 1):
+            gap = (weights[i] + weights[i + 1]) / 2
+            if seen + gap >= index:
+                t = (index - seen) / gap
+                return means[i] + (means[i + 1] - means[i]) * t
+            seen += gap
+        return means[-1]
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in items)
+        lo, hi = items[0][0], items[-1][0]
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+
+        # k1 scale function: a centroid may span at most one unit of
+        # k(q) = compression / (2 pi) * asin(2q - 1)
+        scale = self.compression / (2 * math.pi)
+        means = []
+        weights = []
+        cur_mean, cur_weight = items[0]
+        done = 0 # Weight of the centroids already emitted
+        limit = total * _q_limit(0.0, scale)
+        for mean, weight in items[1:]:
+            if done + cur_weight + weight <= limit:
+                cur_weight += weight
+                cur_mean += (mean - cur_mean) * weight / cur_weight
+            else:
+                means.append(cur_mean)
+                weights.append(cur_weight)
+                done += cur_weight
+                limit = total * _q_limit(done / total, scale)
+                cur_mean, cur_weight = mean, weight
+        means.append(cur_mean)
+        weights.append(cur_weight)
+        self.means = means
+        self.weights = weights
+        self.total = total
+
+    def to_dict(self):
+        self._compress()
+        return {"c": self.compression, "m": self.means, "w": self.weights, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data.get("c", DEFAULT_COMPRESSION))
+        digest.means = list(data["m"])
+        digest.weights = list(data["w"])
+        digest.total = sum(digest.weights)
+        digest.min = data.get("min")
+        digest.max = data.get("max")
+        return digest
+
+def _q_limit(q, scale):
+    """Largest quantile a centroid starting at q may reach (one k-unit further)."""
+    k = scale * math.asin(max(-1.0, min(1.0, 2 * q - 1))) + 1
+    if k >= scale * math.pi / 2:
+        return 1.0
+    return (math.sin(k / scale) + 1) / 2
+
+def merged(digests):
+    """A new digest combining several (None entries are skipped)."""
+    out = None
+    for d in digests:
+        if d is None:
+            continue
+        if out is None:
+            out = TDigest(d.compression)
+        out.merge(d)
+    return out
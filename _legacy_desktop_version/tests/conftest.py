@@ -0,0 +1,20 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+# Modules live at the app root and import each other by bare name
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database
+
+@pytest.fixture
+def db():
+    """A fresh in-memory session database, bound for the test and closed after it."""
+    key = f"test-{uuid.uuid4().hex}"
+    with database.session(key):
+        database.init_db()
+        yield database
+        database.close_session(key)
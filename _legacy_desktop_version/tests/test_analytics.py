@@ -0,0 +1,73 @@
+import random
+
+import analytics
+
+def _series(n, seed=1):
+    rng = random.Random(seed)
+    return [(i, rng.gauss(40, 8)) for i in range(n)]
+
+def test_downsample_returns_input_within_budget():
+    coords = _series(50)
+    assert analytics.downsample(coords, 60) == coords
+
+def test_downsample_fits_budget_and_keeps_anchors():
+    coords = _series(5000)
+    ys = [y for _, y in coords]
+    pinned = [17, 2500, 4321]
+    out = analytics.downsample(coords, 200, keep=pinned)
+
+    # LTTB picks `budget` points; extremes and pinned points may add a few
+    assert 200 <= len(out) <= 200 + 2 + len(pinned)
+    assert out[0] == coords[0] and out[-1] == coords[-1]
+    assert coords[ys.index(min(ys))] in out
+    assert coords[ys.index(max(ys))] in out
+    for i in pinned:
+        assert coords[i] in out
+    # Points stay in order and come from the input
+    xs = [x for x, _ in out]
+    assert xs == sorted(set(xs))
+    assert all(coords[x] == (x, y) for x, y in out)
+
+def test_lttb_picks_one_point_per_bucket():
+    coords = _series(1000)
+    indices = analytics._lttb_indices(coords, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 999
+    assert indices == sorted(set(indices))
+
+def test_downsample_keeps_a_spike():
+    coords = [(i, 10.0) for i in range(2000)]
+    coords[1234] = (1234, 500.0)
+    assert (1234, 500.0) in analytics.downsample(coords, 100)
+
+def test_best_so_far_indices():
+    coords = list(enumerate([50, 40, 45, 40, 30, 35, 29]))
+    assert analytics.best_so_far_indices(coords) == [0, 1, 4, 6]
+
+def test_point_budget():
+    assert analytics.point_budget(900) == 300
+    assert analytics.point_budget(30) == analytics.MIN_POINT_BUDGET
+    assert analytics.point_budget(None) == analytics.DEFAULT_CHART_WIDTH // analytics.PX_PER_POINT
+
+def test_group_chunks_means_and_positions():
+    values = [1, 2, 3, 4, 5, 6, 7]
+    assert analytics.group_chunks(values) == list(enumerate(values))
+    assert analytics.group_chunks(values, 3) == [(0, 2.0), (3, 5.0), (6, 7.0)]
+
+def test_trend_line_matches_least_squares():
+    coords = _series(300, seed=4)
+    n = len(coords)
+    mean_x = sum(x for x, _ in coords) / n
+    mean_y = sum(y for _, y in coords) / n
+    slope = (sum((x - mean_x) * (y - mean_y) for x, y in coords) /
+             sum((x - mean_x) ** 2 for x, _ in coords))
+    intercept = mean_y - slope * mean_x
+
+    (x0, y0), (x1, y1) = analytics.trend_line(coords)
+    assert (x0, x1) == (0, n - 1)
+    assert abs(y0 - intercept) < 1e-6
+    assert abs(y1 - (intercept + slope * (n - 1))) < 1e-6
+
+def test_trend_line_undefined():
+    assert analytics.trend_line([(0, 1.0)]) is None
+    assert analytics.trend_line([(2, 1.0), (2, 3.0)]) is None
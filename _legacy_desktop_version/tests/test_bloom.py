@@ -0,0 +1,53 @@
+import bloom
+import database
+
+def _keys(n, seed):
+    return [database._hash_key(f"run-{seed}-{i}") for i in range(n)]
+
+def test_no_false_negatives():
+    keys = _keys(20000, seed=1)
+    f = bloom.BloomFilter(capacity=len(keys))
+    for k in keys:
+        f.add(k)
+    assert all(f.might_contain(k) for k in keys)
+    assert f.count == len(keys)
+    assert not f.has_room(1)
+
+def test_false_positive_rate_at_capacity():
+    f = bloom.BloomFilter(capacity=20000)
+    for k in _keys(20000, seed=2):
+        f.add(k)
+    others = _keys(50000, seed=3)
+    rate = sum(f.might_contain(k) for k in others) / len(others)
+    # ~0.25% expected at 16 bits per key and 4 probes
+    assert rate < 0.01
+
+def test_signed_and_unsigned_keys_agree():
+    f = bloom.BloomFilter(capacity=1024)
+    f.add(-5)
+    assert f.might_contain(-5)
+    assert f.might_contain(-5 & ((1 << 64) - 1))
+
+def _run(i, session="2024-05-01-1.log"):
+    return {
+        'timestamp': f"2024-05-01 12:{i // 60:02d}:{i % 60:02d}", 'time': round(20.37 + i % 30, 2),
+        'expl': "4+1", 'tower': "Cage", 'type': "Back", 'height': 85,
+        'is_success': True, 'session_id': session,
+    }
+
+def test_fingerprints_dedup_across_batches_and_rebuilds(db):
+    runs = [_run(i) for i in range(500)]
+    assert db.save_runs(runs[:300]) == 300
+    # Duplicates inside a batch and against stored rows are skipped
+    assert db.save_runs(runs[250:400] + runs[390:400]) == 100
+    # Filter rebuilt from the table (e.g. after a reload) still finds stored runs
+    db._current().bloom = None
+    assert db.save_runs(runs) == 100
+    assert db.get_row_count() == 500
+    assert not db.save_run(runs[0])
+
+def test_run_fingerprint_is_stable_across_time_units():
+    data = _run(7)
+    same = dict(data, time=None, time_ms=round(data['time'] * 1000))
+    assert database.run_fingerprint(data) == database.run_fingerprint(same)
+    assert database.run_fingerprint(data) != database.run_fingerprint(_run(7, session="other.log"))
@@ -0,0 +1,82 @@
+import gzip
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import engine
+from benchmarks import synth_logs
+
+FILENAME = "2024-05-01-1.log.gz"
+_STAMP = re.compile(r"^\[\d\d:\d\d:\d\d\]")
+
+def _session_log(seed, runs=900):
+    """
+    A synthetic session crossing midnight, with split start / end lines and
+    some pearl-less successes that a world load interrupts after the dragon
+    kill, so a few ranges end with attempt state open.
+    """
+    rng = random.Random(seed)
+    out = []
+    stamp = "[00:00:00]"
+    loaded = "[Render thread/INFO]: Loaded 7 advancements"
+    interrupt = False
+    for line in synth_logs.make_log(rng, runs=runs, noise_per_run=60).splitlines():
+        stamp = _STAMP.match(line).group(0)
+        if "Pearled to" in line:
+            interrupt = rng.random() < 0.2
+            if interrupt:
+                line = re.sub(r"\(\d+\.\d+ Blocks\)", "(5.00 Blocks)", line)
+        out.append(line)
+        if interrupt and "Dragon Killed!" in line:
+            out.append(f"{stamp} {loaded}")
+        elif "Standing Height" in line or "was slain" in line:
+            roll = rng.random()
+            if roll < 0.03:
+                out.append(f"{stamp} [Render thread/INFO]: [CHAT] split start")
+            elif roll < 0.05:
+                out.append(f"{stamp} [Render thread/INFO]: [CHAT] split start Block {rng.randint(1, 9)}")
+            elif roll < 0.07:
+                out.append(f"{stamp} [Render thread/INFO]: [CHAT] split end")
+    return gzip.compress(("\n".join(out) + "\n").encode())
+
+@pytest.fixture
+def parallel(monkeypatch):
+    # Chunk even small files so the ranges are many and short
+    monkeypatch.setattr(engine, "PARALLEL_MIN_BYTES", 0)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        yield pool
+
+@pytest.mark.parametrize("chunk_bytes", [4096, 16384, 262144])
+def test_chunked_matches_serial(parallel, chunk_bytes):
+    content = _session_log(seed=chunk_bytes)
+    serial = engine.parse_file_content(FILENAME, content)
+    chunked = engine.parse_file_chunked(FILENAME, content, parallel, chunk_bytes=chunk_bytes)
+    assert len(serial) > 500
+    assert chunked == serial
+
+def test_covers_rollover_splits_and_open_ranges():
+    content = _session_log(seed=7)
+    raw = engine.scan_content(FILENAME, content)
+    runs = engine.parse_file_content(FILENAME, content)
+    # The fixture really exercises what stitching has to carry
+    base = engine._file_date(FILENAME)
+    assert runs[-1]['epoch'] >= engine.database.day_epoch(base) + 86400
+    assert {r['split_tag'] for r in runs} > {None}
+    assert any(tag.startswith("Session ") for tag in filter(None, (r['split_tag'] for r in runs)))
+    bounds = engine.chunk_bounds(raw, 4096)
+    assert len(bounds) > 50
+    results = [engine.parse_chunk(FILENAME, base, raw[s:e]) for s, e in bounds]
+    assert any(res["open"] is not None for res in results)
+    assert engine.stitch_chunks(FILENAME, base, raw, bounds, results) == runs
+
+def test_instance_and_small_files(parallel):
+    content = _session_log(seed=3, runs=60)
+    serial = engine.parse_file_content(FILENAME, content, instance="Wall 2")
+    assert engine.parse_file_chunked(FILENAME, content, parallel, chunk_bytes=1024, instance="Wall 2") == serial
+    assert {r['session_id'] for r in serial} == {f"Wall 2/{FILENAME}"}
+    # No executor: parsed in-process
+    assert engine.parse_file_chunked(FILENAME, content, instance="Wall 2") == serial
+    idle = gzip.compress(synth_logs.make_log(random.Random(1), runs=5, practice=False).encode())
+    assert engine.parse_file_chunked(FILENAME, idle, parallel) is None
@@ -0,0 +1,71 @@
+import random
+import statistics
+
+import pytest
+
+import analytics
+
+def _run(rng, i):
+    success = rng.random() < 0.7
+    return {
+        'timestamp': f"2024-06-{1 + i % 20:02d} 10:{i // 60 % 60:02d}:{i % 60:02d}",
+        'time': round(rng.uniform(15, 90), 2) if success else 0.0,
+        'expl': f"{rng.randint(3, 6)}+{rng.randint(0, 2)}",
+        'tower': rng.choice(["Tall Boy", "Small Cage"]), 'type': rng.choice(["Front", "Back"]),
+        'height': rng.choice([83, 86]),
+        'is_success': success, 'fail_reason': None if success else "Death",
+        'session_id': f"file{i % 5}", 'split_tag': rng.choice([None, "Block A"]),
+    }
+
+def test_welford_add_remove_merge():
+    rng = random.Random(1)
+    values = [rng.gauss(40, 8) for _ in range(500)]
+    acc = analytics.Welford(values)
+    assert acc.mean == pytest.approx(statistics.mean(values))
+    assert acc.std() == pytest.approx(statistics.stdev(values))
+    for v in values[:300]:
+        acc.remove(v)
+    assert acc.n == 200
+    assert acc.std() == pytest.approx(statistics.stdev(values[300:]))
+    merged = analytics.Welford(values[300:400]).merge(analytics.Welford(values[400:]))
+    assert merged.mean == pytest.approx(statistics.mean(values[300:]))
+    assert merged.variance() == pytest.approx(statistics.variance(values[300:]))
+    assert analytics.Welford([1.0]).std() is None
+
+def _expected(db, where, params=()):
+    rows = db._get_conn().execute(
+        f"SELECT time_ms, total_explosives FROM attempts WHERE is_success = 1 AND {where}", params
+    ).fetchall()
+    times = [t / 1000 for t, _ in rows if t]
+    expls = [e for _, e in rows if e is not None]
+    return times, expls
+
+def _check(db, kind, keys, where, params=()):
+    times, expls = _expected(db, where, params)
+    got = db.get_consistency(kind, keys)
+    assert got['avg_time'] == pytest.approx(statistics.mean(times))
+    assert got['std_time'] == pytest.approx(statistics.stdev(times))
+    assert got['avg_expl'] == pytest.approx(statistics.mean(expls))
+    assert got['std_expl'] == pytest.approx(statistics.stdev(expls))
+
+def test_consistency_follows_inserts_and_deletes(db):
+    rng = random.Random(2)
+    db.save_runs([_run(rng, i) for i in range(300)])
+    conn = db._get_conn()
+    tower_ids = [r[0] for r in conn.execute("SELECT DISTINCT tower_id FROM attempts ORDER BY tower_id")]
+    type_ids = [r[0] for r in conn.execute("SELECT DISTINCT type_id FROM attempts")]
+    _check(db, "tower", tower_ids[:1], "tower_id = ?", tower_ids[:1])  # Builds the moments
+
+    db.save_runs([_run(rng, i) for i in range(300, 600)])  # Folded in incrementally
+    ids = [r[0] for r in conn.execute("SELECT id FROM attempts")]
+    rng.shuffle(ids)
+    assert db.delete_runs(ids[:250]) == 250
+
+    _check(db, "tower", tower_ids, "1")
+    _check(db, "height_tower_type", [(86, tower_ids[0], t) for t in type_ids],
+           "height = 86 AND tower_id = ?", tower_ids[:1])
+    _check(db, "file", ["file3"], "session_id = 'file3'")
+    _check(db, "split", ["Block A"], "split_tag = 'Block A'")
+    assert db.get_consistency("tower", [-1]) == {
+        'avg_time': None, 'std_time': None, 'avg_expl': None, 'std_expl': None,
+    }
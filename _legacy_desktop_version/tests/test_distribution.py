@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+import distribution
+
+def test_quantile_interpolates():
+    assert distribution.quantile([], 0.5) is None
+    assert distribution.quantile([1, 2, 3, 4], 0.5) == 2.5
+    assert distribution.quantile([7], 0.9) == 7
+
+def test_merge_within_one_bin():
+    rng = random.Random(1)
+    groups = [[rng.lognormvariate(3.5, 0.4) for _ in range(rng.randint(50, 400))] for _ in range(6)]
+    width = distribution.BIN_WIDTHS["time"]
+    merged = distribution.merge([None] + [distribution.summarize(g, width) for g in groups])
+    exact = distribution.summarize([v for g in groups for v in g], width)
+    assert merged["hist"] == exact["hist"]
+    assert (merged["count"], merged["min"], merged["max"]) == (exact["count"], exact["min"], exact["max"])
+    for q in distribution.QUANTILES:
+        assert merged["quantiles"][q] == pytest.approx(exact["quantiles"][q], abs=width)
+
+def test_bars_keep_every_value():
+    values = [3, 4, 4, 5, 9]
+    points = distribution.bars(distribution.summarize(values, 1))
+    # Empty bins between values are drawn
+    assert points == [(3, 4, 1), (4, 5, 2), (5, 6, 1), (6, 7, 0), (7, 8, 0), (8, 9, 0), (9, 10, 1)]
+    assert distribution.bars(distribution.summarize([], 1)) == []
+
+def test_bars_clip_long_tails():
+    rng = random.Random(2)
+    values = [rng.gauss(40, 5) for _ in range(2000)] + [900.0, 2500.0, -300.0]
+    summary = distribution.summarize(values, 2.0)
+    points = distribution.bars(summary)
+    assert len(points) <= distribution.MAX_BARS
+    assert sum(c for _, _, c in points) == len(values)
+    under, over = points[0], points[-1]
+    assert under[0] is None and under[2] >= 1
+    assert over[1] is None and over[2] >= 2
+    # Inner bars tile the range without gaps
+    inner = points[1:-1]
+    assert under[1] == inner[0][0] and inner[-1][1] == over[0]
+    assert all(a[1] == b[0] for a, b in zip(inner, inner[1:]))
+
+def test_bars_merge_wide_ranges():
+    values = list(range(0, 1000))
+    points = distribution.bars(distribution.summarize(values, 1), max_bars=40)
+    assert len(points) <= 40
+    assert sum(c for _, _, c in points) == 1000
@@ -0,0 +1,77 @@
+import random
+
+import engine
+from benchmarks import synth_logs
+
+def _instance_logs(seed, count=4, runs=80):
+    rng = random.Random(seed)
+    return {f"Wall {i + 1}": synth_logs.make_log(rng, runs=runs, noise_per_run=5) for i in range(count)}
+
+def _key(run):
+    return (run['epoch'], run['instance'], run['time_ms'])
+
+def test_instance_id():
+    assert engine.instance_id("/mc/instances/Wall 3/.minecraft/logs") == "Wall 3"
+    assert engine.instance_id("/mc/instances/Wall 3/minecraft/logs") == "Wall 3"
+    assert engine.instance_id("/mc/Solo/logs") == "Solo"
+
+def test_instance_stream_orders_files():
+    logs = _instance_logs(1, count=1)
+    runs = engine.parse_text("2024-05-01-1.log.gz", logs["Wall 1"], "Wall 1")
+    files = [runs[40:], [], runs[:40]]
+    assert engine.instance_stream(files) == runs
+
+def test_merge_matches_sort():
+    streams = [engine.parse_text("latest.log", text, name) for name, text in _instance_logs(2).items()]
+    merged = list(engine.merge_instance_runs(streams))
+    assert len(merged) == sum(len(s) for s in streams)
+    epochs = [r['epoch'] for r in merged]
+    assert epochs == sorted(epochs)
+    assert sorted(map(_key, merged)) == sorted(_key(r) for s in streams for r in s)
+    # Ties keep stream order
+    ties = [[{'epoch': 5, 'n': i}] for i in range(3)]
+    assert [r['n'] for r in engine.merge_instance_runs(ties)] == [0, 1, 2]
+
+def test_live_merger_releases_in_order():
+    logs = _instance_logs(3)
+    serial = list(engine.merge_instance_runs(
+        engine.parse_text("2024-05-01-1.log.gz", text, name) for name, text in logs.items()
+    ))
+    saved = []
+    merger = engine.InstanceMerger(lambda run: saved.append(run) or True)
+    for name in logs:
+        merger.add_instance(name, "2024-05-01-1.log.gz")
+    assert merger.watermark() is None  # Nothing read yet
+
+    # Instances tail their logs at different speeds
+    rng = random.Random(3)
+    lines = {name: text.splitlines() for name, text in logs.items()}
+    pos = dict.fromkeys(logs, 0)
+    while any(pos[name] < len(lines[name]) for name in logs):
+        for name in logs:
+            step = rng.randint(0, 40)
+            merger.feed(name, lines[name][pos[name]:pos[name] + step])
+            pos[name] += step
+        limit = merger.watermark()
+        merger.drain()
+        # Nothing released past the slowest instance, and nothing it could still precede
+        assert all(r['epoch'] <= limit for r in saved) if limit is not None else not saved
+        assert all(epoch > limit for epoch, _, _ in merger.pending) if limit is not None else True
+    merger.drain(final=True)
+    assert not merger.pending
+    assert [r['epoch'] for r in saved] == sorted(r['epoch'] for r in saved)
+    assert sorted(map(_key, saved)) == sorted(map(_key, serial))
+
+def test_idle_instance_drains_with_now():
+    logs = _instance_logs(4, count=2, runs=20)
+    merger = engine.InstanceMerger(lambda run: True)
+    merger.add_instance("Wall 1", "2024-05-01-1.log.gz")
+    merger.add_instance("Wall 2", "2024-05-01-1.log.gz")
+    merger.feed("Wall 1", logs["Wall 1"].splitlines())
+    # Wall 2 has printed nothing: its log can't precede anything until time passes
+    assert merger.watermark() is None
+    assert merger.drain() == 0
+    last = max(epoch for epoch, _, _ in merger.pending)
+    waiting = len(merger.pending)
+    assert merger.drain(now=last + engine.InstanceMerger.LIVE_SLACK_SECONDS) == waiting
+    assert not merger.pending
@@ -0,0 +1,74 @@
+import math
+import random
+
+import pytest
+
+import rolling
+
+def _values(n, seed=3, ties=False):
+    rng = random.Random(seed)
+    if ties:
+        return [rng.randint(3, 8) for _ in range(n)]
+    return [rng.uniform(15, 90) for _ in range(n)]
+
+def _nearest_rank(window, q):
+    ordered = sorted(window)
+    return ordered[max(1, math.ceil(q * len(ordered))) - 1]
+
+def _brute(values, window, stat):
+    out = []
+    for i in range(window - 1, len(values)):
+        w = values[i - window + 1:i + 1]
+        out.append((i, stat(w)))
+    return out
+
+@pytest.mark.parametrize("window", [1, 2, 7, 50])
+@pytest.mark.parametrize("ties", [False, True])
+def test_rolling_mean_and_best(window, ties):
+    values = _values(400, ties=ties)
+    mean = rolling.rolling_series(values, window, "Mean")
+    expected = _brute(values, window, lambda w: sum(w) / len(w))
+    assert [i for i, _ in mean] == [i for i, _ in expected]
+    assert all(abs(a - b) < 1e-9 for (_, a), (_, b) in zip(mean, expected))
+    assert rolling.rolling_series(values, window, "Best") == _brute(values, window, min)
+
+@pytest.mark.parametrize("window", [1, 2, 5, 50, 51])
+@pytest.mark.parametrize("q, stat", [(0.5, "Median"), (0.9, "P90")])
+@pytest.mark.parametrize("ties", [False, True])
+def test_rolling_quantile_matches_nearest_rank(window, q, stat, ties):
+    values = _values(600, seed=window, ties=ties)
+    assert rolling.rolling_series(values, window, stat) == _brute(values, window, lambda w: _nearest_rank(w, q))
+
+def test_rolling_series_unknown_stat_or_window():
+    assert rolling.rolling_series([1, 2, 3], 2, "None") == []
+    assert rolling.rolling_series([1, 2, 3], 0, "Mean") == []
+
+def test_rate_series_samples_rate_at_plotted_runs():
+    rng = random.Random(9)
+    attempts = [(i, rng.random() < 0.4) for i in range(300)]
+    plotted = [key for key, ok in attempts if ok]
+    window = 20
+    points = rolling.rate_series(attempts, plotted, window)
+
+    position = {key: i for i, (key, _) in enumerate(attempts)}
+    expected = []
+    for x, key in enumerate(plotted):
+        i = position[key]
+        if i >= window - 1:
+            w = attempts[i - window + 1:i + 1]
+            expected.append((x, 100 * sum(ok for _, ok in w) / window))
+    assert [x for x, _ in points] == [x for x, _ in expected]
+    assert all(abs(a - b) < 1e-9 for (_, a), (_, b) in zip(points, expected))
+
+def test_scale_rates_maps_onto_value_range():
+    lo, hi = rolling.rate_scale([4, 6, 5])
+    assert (lo, hi) == (4, 6)
+    assert rolling.scale_rates([(0, 0.0), (1, 50.0), (2, 100.0)], lo, hi) == [(0, 4.0), (1, 5.0), (2, 6.0)]
+    assert rolling.rate_scale([5, 5]) == (5, 6)
+
+def test_window_comparison():
+    values = [1] * 10 + [3] * 10
+    assert rolling.window_comparison(values, 10) == (3, 1)
+    assert rolling.window_comparison(values[:15], 10) == (pytest.approx(2.0), None)
+    flags = [False] * 10 + [True, False] * 5
+    assert rolling.window_comparison(flags, 10, rolling.RATE) == (50, 0)
@@ -0,0 +1,102 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+BASE = datetime(2024, 3, 1)
+
+def _run(rng, i, seconds):
+    success = rng.random() < 0.6
+    return {
+        'timestamp': (BASE + timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S"),
+        'time': round(rng.uniform(5, 120), 2),
+        'expl': f"{rng.randint(3, 6)}+{rng.randint(0, 2)}",
+        'tower': "Tall Boy", 'type': "Front", 'height': 86,
+        'is_success': success, 'fail_reason': None if success else "Death",
+        'session_id': f"s{i}",
+    }
+
+def _raw_rollup(db):
+    """Per-day aggregate straight from attempts, in the rollup's dict layout."""
+    conn = db._get_conn()
+    rows = conn.execute(
+        "SELECT epoch, time_ms, is_success, total_explosives FROM attempts ORDER BY epoch, time_ms"
+    ).fetchall()
+    gap_ms = db.SESSION_GAP_SECONDS * 1000
+    days = {}
+    for epoch, time_ms, ok, expl in rows:
+        day = epoch - epoch % db.DAY_SECONDS
+        d = days.setdefault(day, {'runs': 0, 'successes': 0, 'best_time': None, 'best_expl': None, 'chunks': []})
+        d['runs'] += 1
+        if ok:
+            d['successes'] += 1
+            if time_ms and (d['best_time'] is None or time_ms / 1000 < d['best_time']):
+                d['best_time'] = time_ms / 1000
+            if d['best_expl'] is None or expl < d['best_expl']:
+                d['best_expl'] = expl
+        start, end = epoch * 1000, epoch * 1000 + (time_ms or 0)
+        if d['chunks'] and start - d['chunks'][-1][1] <= gap_ms:
+            d['chunks'][-1][1] = max(d['chunks'][-1][1], end)
+        else:
+            d['chunks'].append([start, end])
+    return [
+        {
+            'day': db.format_timestamp(day, "%Y-%m-%d"), 'epoch': day, 'runs': d['runs'],
+            'successes': d['successes'], 'best_time': d['best_time'], 'best_expl': d['best_expl'],
+            'active_time': sum(e - s for s, e in d['chunks']) / 1000,
+        }
+        for day, d in sorted(days.items())
+    ]
+
+def _assert_matches_raw(db):
+    got = db.get_daily_rollup()
+    expected = _raw_rollup(db)
+    assert [d['epoch'] for d in got] == [d['epoch'] for d in expected]
+    for g, e in zip(got, expected):
+        assert g == dict(e, active_time=pytest.approx(e['active_time']))
+
+def test_live_appends(db):
+    rng = random.Random(1)
+    seconds = sorted(rng.uniform(0, 6 * 86400) for _ in range(1500))
+    for i, s in enumerate(seconds):
+        db.save_run(_run(rng, i, s))
+    _assert_matches_raw(db)
+
+def test_out_of_order_backfill(db):
+    rng = random.Random(2)
+    seconds = [rng.uniform(0, 10 * 86400) for _ in range(3000)]
+    runs = [_run(rng, i, s) for i, s in enumerate(seconds)]
+    for i in range(0, len(runs), 97):
+        db.save_runs(runs[i:i + 97])
+        if i % (97 * 8) == 0:
+            _assert_matches_raw(db)
+    _assert_matches_raw(db)
+
+def test_deletes_rebuild_their_days(db):
+    rng = random.Random(3)
+    db.save_runs([_run(rng, i, rng.uniform(0, 5 * 86400)) for i in range(2000)])
+    conn = db._get_conn()
+    ids = [r[0] for r in conn.execute("SELECT id FROM attempts")]
+    rng.shuffle(ids)
+    assert db.delete_runs(ids[:700]) == 700
+    _assert_matches_raw(db)
+
+    # A day that loses every run loses its row
+    first_day = db.get_daily_rollup()[0]['epoch']
+    day_ids = [r[0] for r in conn.execute(
+        "SELECT id FROM attempts WHERE epoch >= ? AND epoch < ?", (first_day, first_day + db.DAY_SECONDS)
+    )]
+    db.delete_runs(day_ids)
+    assert first_day not in [d['epoch'] for d in db.get_daily_rollup()]
+    _assert_matches_raw(db)
+
+def test_range_summary_totals(db):
+    rng = random.Random(4)
+    db.save_runs([_run(rng, i, rng.uniform(0, 8 * 86400)) for i in range(800)])
+    days = _raw_rollup(db)
+    summary = db.get_range_summary("2024-03-02", "2024-03-05")
+    inside = [d for d in days if "2024-03-02" <= d['day'] < "2024-03-05"]
+    assert summary['days'] == len(inside)
+    assert summary['runs'] == sum(d['runs'] for d in inside)
+    assert summary['best_expl'] == min(d['best_expl'] for d in inside if d['best_expl'] is not None)
+    assert len(db.get_runs_between("2024-03-02", "2024-03-05")) == summary['runs']
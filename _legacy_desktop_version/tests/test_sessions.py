@@ -0,0 +1,81 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+def _runs(seed=2, n=600):
+    rng = random.Random(seed)
+    start = datetime(2024, 5, 1, 18, 0, 0)
+    runs = []
+    t = 0.0
+    for i in range(n):
+        # Mostly short gaps, sometimes a break longer than the session gap
+        t += rng.choice([rng.uniform(5, 90)] * 9 + [rng.uniform(1000, 5000)])
+        fail = rng.random() < 0.4
+        runs.append({
+            'timestamp': (start + timedelta(seconds=int(t))).strftime("%Y-%m-%d %H:%M:%S"),
+            'time': round(rng.uniform(10, 300), 2),
+            'expl': "4+1",
+            'tower': "Small Boy",
+            'type': "Front",
+            'height': 84,
+            'is_success': not fail,
+            'fail_reason': rng.choice(["Death", "World Load"]) if fail else None,
+            'session_id': f"2024-05-0{1 + i // 200}-1.log",
+            'split_tag': f"split-{i // 150}",
+        })
+    return runs
+
+def _brute_active(db, runs, key, gap, hide_world_loads=False):
+    """Merge each session's [start, end] spans in time order; chunks split on gaps over `gap`."""
+    spans = {}
+    for r in runs:
+        if hide_world_loads and r['fail_reason'] == "World Load":
+            continue
+        start = db.parse_timestamp(r['timestamp'])
+        spans.setdefault(r[key], []).append((start, start + db.to_ms(r['time']) / 1000))
+    result = {}
+    for sid, items in spans.items():
+        items.sort()
+        total = 0.0
+        chunk_start, chunk_end = items[0]
+        for s, e in items[1:]:
+            if s - chunk_end > gap:
+                total += chunk_end - chunk_start
+                chunk_start, chunk_end = s, e
+            else:
+                chunk_end = max(chunk_end, e)
+        result[sid] = total + chunk_end - chunk_start
+    return result
+
+@pytest.mark.parametrize("session_type, key", [("file", "session_id"), ("split", "split_tag")])
+@pytest.mark.parametrize("hide_world_loads", [False, True])
+def test_active_times_match_python_merge(db, session_type, key, hide_world_loads):
+    runs = _runs()
+    db.save_runs(runs)
+    got = db.get_session_active_times(session_type, hide_world_loads)
+    expected = _brute_active(db, runs, key, db.SESSION_GAP_SECONDS, hide_world_loads)
+    assert got.keys() == expected.keys()
+    for sid in expected:
+        assert got[sid] == pytest.approx(expected[sid], abs=1e-6)
+
+def test_active_time_cache_follows_new_runs(db):
+    runs = _runs(n=300)
+    db.save_runs(runs[:200])
+    first = db.get_session_active_time(runs[0]['session_id'], 'file')
+    assert db.get_session_active_times('file') is db.get_session_active_times('file')
+
+    db.save_runs(runs[200:])
+    expected = _brute_active(db, runs, 'session_id', db.SESSION_GAP_SECONDS)
+    assert db.get_session_active_time(runs[0]['session_id'], 'file') == pytest.approx(first)
+    assert db.get_session_active_time(runs[-1]['session_id'], 'file') == pytest.approx(expected[runs[-1]['session_id']])
+
+def test_session_index_lists_files_and_splits(db):
+    runs = _runs(n=300)
+    db.save_runs(runs)
+    index = db.get_session_index()
+    files = {s['id']: s for s in index if s['type'] == 'file'}
+    assert sum(s['count'] for s in files.values()) == len(runs)
+    expected = _brute_active(db, runs, 'session_id', db.SESSION_GAP_SECONDS)
+    for sid, s in files.items():
+        assert s['active_time'] == pytest.approx(expected[sid])
@@ -0,0 +1,103 @@
+import bisect
+import random
+
+import pytest
+
+import tdigest
+
+QS = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+def _rank_error(ordered, value, q):
+    """How far (as a fraction of n) the estimate's rank is from q."""
+    n = len(ordered)
+    lo = bisect.bisect_left(ordered, value) / n
+    hi = bisect.bisect_right(ordered, value) / n
+    return 0.0 if lo <= q <= hi else min(abs(lo - q), abs(hi - q))
+
+def _samples(seed, n=20000):
+    rng = random.Random(seed)
+    return {
+        "uniform": [rng.uniform(10, 200) for _ in range(n)],
+        "lognormal": [rng.lognormvariate(3.5, 0.6) for _ in range(n)],
+        "bimodal": [rng.gauss(30, 3) if rng.random() < 0.7 else rng.gauss(90, 10) for _ in range(n)],
+    }
+
+@pytest.mark.parametrize("name", ["uniform", "lognormal", "bimodal"])
+def test_quantiles_close_to_exact(name):
+    values = _samples(1)[name]
+    digest = tdigest.TDigest()
+    for v in values:
+        digest.add(v)
+    ordered = sorted(values)
+    for q in QS:
+        # Tails are tighter than the middle
+        tolerance = 0.002 if q in (0.01, 0.99) else 0.01
+        assert _rank_error(ordered, digest.quantile(q), q) <= tolerance, q
+    assert digest.quantile(0) == ordered[0]
+    assert digest.quantile(1) == ordered[-1]
+    assert len(digest.means) < 10 * digest.compression
+
+def test_merge_matches_single_digest():
+    values = _samples(2)["lognormal"]
+    parts = [tdigest.TDigest() for _ in range(7)]
+    for i, v in enumerate(values):
+        parts[i % 7].add(v)
+    combined = tdigest.merged([None] + parts)
+    ordered = sorted(values)
+    assert len(combined) == len(values)
+    for q in QS:
+        assert _rank_error(ordered, combined.quantile(q), q) <= 0.01, q
+    assert combined.min == ordered[0] and combined.max == ordered[-1]
+
+def test_small_and_empty():
+    digest = tdigest.TDigest()
+    assert digest.quantile(0.5) is None
+    digest.add(42.0)
+    assert digest.quantile(0.1) == digest.quantile(0.9) == 42.0
+    assert tdigest.merged([None, None]) is None
+
+def test_storage_round_trip():
+    digest = tdigest.TDigest()
+    for v in _samples(3)["bimodal"]:
+        digest.add(v)
+    restored = tdigest.TDigest.from_dict(digest.to_dict())
+    assert len(restored) == len(digest)
+    for q in QS:
+        assert restored.quantile(q) == digest.quantile(q)
+
+def _run(rng, i, tower, run_type):
+    return {
+        'timestamp': f"2024-05-{1 + i % 28:02d} 12:{i // 60 % 60:02d}:{i % 60:02d}",
+        'time': round(rng.lognormvariate(3.5, 0.5), 2),
+        'expl': "5+1", 'tower': tower, 'type': run_type, 'height': 86,
+        'is_success': True, 'fail_reason': None, 'session_id': f"s{i}",
+    }
+
+def test_database_quantiles_follow_inserts(db):
+    rng = random.Random(4)
+    towers = ["Tall Boy", "Small Cage", "T-Wrecks"]
+    types = ["Front", "Back"]
+    runs = [_run(rng, i, rng.choice(towers), rng.choice(types)) for i in range(6000)]
+    db.save_runs(runs[:1000])
+    db.get_time_quantiles("tower", [])  # Build the sketches, then grow them incrementally
+    for i in range(1000, len(runs), 500):
+        db.save_runs(runs[i:i + 500])
+
+    conn = db._get_conn()
+    tower_ids = [r[0] for r in conn.execute("SELECT DISTINCT tower_id FROM attempts")]
+    for tower_id in tower_ids:
+        ordered = sorted(r[0] / 1000 for r in conn.execute(
+            "SELECT time_ms FROM attempts WHERE tower_id = ?", (tower_id,)))
+        got = db.get_time_quantiles("tower", [tower_id], qs=(0.1, 0.5, 0.9))
+        for q, value in got.items():
+            assert _rank_error(ordered, value, q) <= 0.02, (tower_id, q)
+
+    # Union of (tower, type) groups
+    keys = [tuple(r) for r in conn.execute("SELECT DISTINCT tower_id, type_id FROM attempts")][:3]
+    ordered = sorted(
+        r[0] / 1000 for key in keys
+        for r in conn.execute("SELECT time_ms FROM attempts WHERE tower_id = ? AND type_id = ?", key)
+    )
+    for q, value in db.get_time_quantiles("tower_type", keys).items():
+        assert _rank_error(ordered, value, q) <= 0.02, q
+    assert db.get_time_quantiles("height", [999]) == {0.5: None, 0.9: None}